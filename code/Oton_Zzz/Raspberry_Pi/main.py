@@ -56,6 +56,8 @@ def main():
 使用例:
   python3 main.py                      # メインプログラム + ダッシュボードを起動
   python3 main.py --calibrate          # キャリブレーションのみ実行
+  python3 main.py --calibrate-open a.mp4 --calibrate-closed b.mp4
+                                       # 録画データからキャリブレーション
   python3 main.py --test               # システムテストのみ実行
   python3 main.py --setup              # 初回セットアップのみ実行
         """
@@ -67,6 +69,20 @@ def main():
         help='キャリブレーションを実行'
     )
 
+    parser.add_argument(
+        '--calibrate-open',
+        nargs='+',
+        metavar='FILE',
+        help='開眼状態の録画（動画またはスコアファイル）からキャリブレーション'
+    )
+
+    parser.add_argument(
+        '--calibrate-closed',
+        nargs='+',
+        metavar='FILE',
+        help='閉眼状態の録画（動画またはスコアファイル）からキャリブレーション'
+    )
+
     parser.add_argument(
         '--test',
         action='store_true',
@@ -94,6 +110,10 @@ def main():
 
     args = parser.parse_args()
 
+    # 相対パスはカレントディレクトリ移動前に解決
+    calibrate_open = [os.path.abspath(p) for p in (args.calibrate_open or [])]
+    calibrate_closed = [os.path.abspath(p) for p in (args.calibrate_closed or [])]
+
     # カレントディレクトリを取得
     script_dir = os.path.dirname(os.path.abspath(__file__))
     os.chdir(script_dir)
@@ -118,6 +138,19 @@ def main():
             print("\n\n✓ キャリブレーションを終了しました")
         return
 
+    # 録画データからのキャリブレーション
+    if calibrate_open or calibrate_closed:
+        # 目を開けた録画と閉じた録画の両方がないとしきい値を決められない
+        if not (calibrate_open and calibrate_closed):
+            missing = '--calibrate-closed' if calibrate_open else '--calibrate-open'
+            print(f"✗ 録画データからのキャリブレーションには --calibrate-open と --calibrate-closed の両方が必要です"
+                  f"（{missing} の録画ファイルを指定してください）")
+            return
+        print("録画データからキャリブレーションを実行します...\n")
+        subprocess.run([sys.executable, 'src/offline_calibration.py',
+                        '--open', *calibrate_open, '--closed', *calibrate_closed, '--apply'])
+        return
+
     # システムテストのみ
     if args.test:
         print("システムテストを実行します...\n")
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+古いイベントのアーカイブモジュール
+保存期間を過ぎたlogs・shadow_eventsの行を月ごとのgzip圧縮NDJSON（data/archive/logs-YYYY-MM.ndjson.gz）に
+書き出し、テレビOFF中（待機中）にバックグラウンドでデータベースから削除・空き領域の解放を行う
+書き出したアーカイブは read_archive() で読み戻せる（tools/db_admin.py archive-query）
+"""
+
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+
+
+# アーカイブの対象（idとtimestamp列を持つテーブル）
+ARCHIVE_TABLES = ('logs', 'shadow_events')
+
+
+def archive_path(archive_dir, table, month):
+    """
+    アーカイブファイルのパス
+
+    Args:
+        archive_dir: アーカイブのディレクトリ
+        table: テーブル名
+        month: 'YYYY-MM'
+
+    Returns:
+        str: パス
+    """
+    return os.path.join(archive_dir, f'{table}-{month}.ndjson.gz')
+
+
+def list_archives(archive_dir, table):
+    """
+    テーブルのアーカイブファイルを古い月から順に列挙
+
+    Returns:
+        list: (月 'YYYY-MM', パス) のリスト
+    """
+    prefix = f'{table}-'
+    archives = []
+    for path in sorted(glob.glob(os.path.join(archive_dir, f'{table}-*.ndjson.gz'))):
+        month = os.path.basename(path)[len(prefix):-len('.ndjson.gz')]
+        archives.append((month, path))
+    return archives
+
+
+def append_rows(archive_dir, table, columns, rows):
+    """
+    行を月ごとのアーカイブファイルに追記（ディスクへの書き込みが終わってから戻る）
+
+    gzipの追記（複数メンバー）なので既存のファイルを読み直さない。削除の前に中断した行は再実行時に
+    二重に追記されることがあるが、read_archive() がidで重複を除く
+
+    Args:
+        archive_dir: アーカイブのディレクトリ
+        table: テーブル名
+        columns: 列名のリスト（timestamp列を含む）
+        rows: 行のリスト
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    ts_index = columns.index('timestamp')
+
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(row[ts_index][:7], []).append(row)
+
+    for month, month_rows in by_month.items():
+        with open(archive_path(archive_dir, table, month), 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as f:
+                for row in month_rows:
+                    f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False).encode('utf-8') + b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def read_archive(archive_dir, table, start=None, end=None):
+    """
+    アーカイブの行を古い順に読み出す（1行ずつ返すので、何年分あってもメモリは一定）
+
+    Args:
+        archive_dir: アーカイブのディレクトリ
+        table: テーブル名
+        start: この時刻以降（ISO形式の文字列、'YYYY-MM-DD' も可。省略時は最初から）
+        end: この時刻より前（省略時は最後まで）
+
+    Yields:
+        dict: 1行分（列名 -> 値）
+    """
+    for month, path in list_archives(archive_dir, table):
+        if (start is not None and month < start[:7]) or (end is not None and month > end[:7]):
+            continue
+        seen = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                if row['id'] in seen:
+                    continue
+                seen.add(row['id'])
+                if start is not None and row['timestamp'] < start:
+                    continue
+                if end is not None and row['timestamp'] >= end:
+                    continue
+                yield row
+
+
+class ArchiveMaintenance:
+    """テレビOFF中にアーカイブと空き領域の解放をバックグラウンドで行うクラス"""
+
+    def __init__(self, db_manager, archive_dir='data/archive', archive_after_months=12,
+                 vacuum_pages=1000, interval=86400.0):
+        """
+        初期化
+
+        Args:
+            db_manager: 対象のDatabaseManager
+            archive_dir: アーカイブの書き出し先
+            archive_after_months: これより古い月の行をアーカイブして削除（Noneでアーカイブしない）
+            vacuum_pages: 1回のトランザクションで解放するページ数（少しずつ解放して書き込みを長く止めない）
+            interval: メンテナンスの最短間隔（秒）
+        """
+        self.db_manager = db_manager
+        self.archive_dir = archive_dir
+        self.archive_after_months = archive_after_months
+        self.vacuum_pages = vacuum_pages
+        self.interval = interval
+        self.last_run = None
+        self.worker_thread = None
+        self._stop_event = threading.Event()
+
+    def run_if_idle(self):
+        """
+        前回から interval 秒以上経っていればメンテナンスを開始（テレビOFF中のメインループから呼ぶ。すぐに戻る）
+
+        Returns:
+            bool: 開始したかどうか
+        """
+        if self.worker_thread is not None and self.worker_thread.is_alive():
+            return False
+        if self.last_run is not None and time.monotonic() - self.last_run < self.interval:
+            return False
+        self.last_run = time.monotonic()
+        self._stop_event.clear()
+        self.worker_thread = threading.Thread(target=self._run, daemon=True)
+        self.worker_thread.start()
+        return True
+
+    def stop(self, timeout=5.0):
+        """
+        実行中のメンテナンスを区切りのよいところで止める（テレビON時・終了時に呼ぶ）
+
+        Args:
+            timeout: 停止を待つ最大時間（秒）
+        """
+        self._stop_event.set()
+        if self.worker_thread is not None:
+            self.worker_thread.join(timeout=timeout)
+
+    def _run(self):
+        """日別のテレビON時間の集計 → アーカイブ → 空き領域の解放 → WALの切り詰め"""
+        start = time.monotonic()
+        try:
+            # アーカイブでログを削除する前に、終わった日のテレビON時間を集計しておく
+            self.db_manager.refresh_daily_energy()
+
+            archived = {}
+            if self.archive_after_months is not None:
+                archived = self.db_manager.archive_old_events(self.archive_dir, self.archive_after_months,
+                                                              should_stop=self._stop_event.is_set)
+
+            freed = 0
+            while not self._stop_event.is_set():
+                pages = self.db_manager.incremental_vacuum(self.vacuum_pages)
+                if pages == 0:
+                    break
+                freed += pages
+            self.db_manager.checkpoint()
+
+            if any(archived.values()) or freed:
+                counts = '、'.join(f"{table} {count}件" for table, count in archived.items() if count)
+                print(f"🗄️  データベースを整理しました（アーカイブ: {counts or 'なし'}、解放: {freed}ページ、"
+                      f"{time.monotonic() - start:.1f}秒）")
+        except Exception as e:
+            print(f"✗ データベースの整理に失敗しました: {e}")
+        finally:
+            self.db_manager.close()
@@ -16,6 +16,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from config import ConfigManager
 from detector import SleepDetector
 from voice import VoiceController
+from threshold_adapter import compute_recommended_threshold
+from streaming_stats import RunningStats
 
 
 class AutoCalibration:
@@ -26,6 +28,8 @@ class AutoCalibration:
         self.config_mgr = ConfigManager()
         self.voice = VoiceController()
         self.cap = None
+        self.last_report = None
+        self.step_reports = []
 
         # カメラを開く
         self.cap = cv2.VideoCapture(0)
@@ -57,12 +61,22 @@ class AutoCalibration:
         # デバイス安定化のため待機
         time.sleep(1.0)
 
-    def run_test(self, duration_seconds=30, test_name="テスト"):
+    def run_test(self, duration_seconds=30, test_name="テスト", min_duration=3.0,
+                 min_samples=60, target_ci=0.01):
         """
         テスト実行（カメラは既に開いている前提）
+        推論レートいっぱいでサンプルを集め、スコア平均の信頼区間が
+        target_ci 以下に収束した時点で早期終了する
+
+        Args:
+            duration_seconds: 最大測定時間（秒）
+            test_name: 画面に表示するテスト名
+            min_duration: 早期終了を許可する最小測定時間（秒）
+            min_samples: 早期終了に必要な最小サンプル数
+            target_ci: 収束とみなす平均の95%信頼区間の半幅
 
         Returns:
-            list: まばたきスコアのリスト
+            list: まばたきスコアのリスト（測定結果のサマリは self.last_report に保存）
         """
         BaseOptions = mp.tasks.BaseOptions
         FaceLandmarker = mp.tasks.vision.FaceLandmarker
@@ -78,29 +92,41 @@ class AutoCalibration:
             final_confirmation_time=params.get('final_confirmation_time', 5.0)
         )
 
+        # VIDEOモード（同期推論）: 1フレームにつき必ず1つの結果が得られる
         options = FaceLandmarkerOptions(
             base_options=BaseOptions(model_asset_path=detector.model_path),
-            running_mode=VisionRunningMode.LIVE_STREAM,
+            running_mode=VisionRunningMode.VIDEO,
             num_faces=1,
-            output_face_blendshapes=True,
-            result_callback=detector.result_callback
+            output_face_blendshapes=True
         )
 
         # 統計データ
         blink_scores = []
-        gauge_values = []
+        score_stats = RunningStats()
+        frame_count = 0
+        converged = False
+        elapsed = 0.0
+        last_timestamp_ms = -1
 
         try:
             with FaceLandmarker.create_from_options(options) as landmarker:
                 start_time = time.time()
                 test_start = time.time()
                 last_voice_time = 0
+                last_display_time = 0
 
                 while True:
                     elapsed = time.time() - test_start
                     if elapsed >= duration_seconds:
                         break
 
+                    # 分布が収束したら早期終了
+                    if (elapsed >= min_duration
+                            and score_stats.count >= min_samples
+                            and score_stats.ci_half_width() <= target_ci):
+                        converged = True
+                        break
+
                     ret, frame = self.cap.read()
                     if not ret:
                         break
@@ -116,11 +142,15 @@ class AutoCalibration:
                         time.sleep(0.05)
                         continue
 
-                    # MediaPipe処理
+                    # MediaPipe処理（同期）
                     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                     mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-                    timestamp_ms = int((time.time() - start_time) * 1000)
-                    landmarker.detect_async(mp_image, timestamp_ms)
+                    # VIDEOモードはタイムスタンプが単調増加である必要がある
+                    timestamp_ms = max(int((time.time() - start_time) * 1000), last_timestamp_ms + 1)
+                    last_timestamp_ms = timestamp_ms
+                    result = landmarker.detect_for_video(mp_image, timestamp_ms)
+                    detector.result_callback(result, mp_image, timestamp_ms)
+                    frame_count += 1
 
                     gauge_value, is_stage1, is_stage2, status = detector.process_result()
 
@@ -130,7 +160,7 @@ class AutoCalibration:
                     # 統計データ収集
                     if avg > 0:
                         blink_scores.append(avg)
-                    gauge_values.append(gauge_value)
+                        score_stats.add(avg)
 
                     # 10秒ごとに進捗を音声通知（非同期）
                     if elapsed - last_voice_time >= 10.0:
@@ -142,6 +172,11 @@ class AutoCalibration:
                             self.voice.speak('calib_remaining_10')
                         last_voice_time = elapsed
 
+                    # 画面描画は約10fpsに間引く（推論レートを落とさないため）
+                    if elapsed - last_display_time < 0.1:
+                        continue
+                    last_display_time = elapsed
+
                     # ========== OpenCVディスプレイ表示（情報表示のみ） ==========
                     color = (0, 255, 0)
                     if "Confirmed" in status:
@@ -153,13 +188,16 @@ class AutoCalibration:
                     elif "No Face" in status:
                         color = (128, 128, 128)
 
+                    ci = score_stats.ci_half_width()
+                    ci_text = f"{ci:.3f}" if ci != float('inf') else "-"
+
                     # テスト名と進捗を表示
                     cv2.putText(frame, f"Test: {test_name}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
                     cv2.putText(frame, f"Status: {status}", (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
                     cv2.putText(frame, f"Blink: L={left:.2f} R={right:.2f} Avg={avg:.2f}", (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                    cv2.putText(frame, f"Threshold: {detector.BLINK_THRESHOLD:.2f}", (10, 140), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+                    cv2.putText(frame, f"Samples: {score_stats.count}  CI: {ci_text} (target {target_ci:.3f})", (10, 140), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
                     cv2.putText(frame, f"Gauge: {gauge_value:.1f} / {detector.GAUGE_MAX:.1f}", (10, 180), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
-                    cv2.putText(frame, f"Time: {elapsed:.1f}s / {duration_seconds}s", (10, 220), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2)
+                    cv2.putText(frame, f"Time: {elapsed:.1f}s / max {duration_seconds}s", (10, 220), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2)
 
                     # ゲージバー
                     gauge_percentage = gauge_value / detector.GAUGE_MAX if detector.GAUGE_MAX > 0 else 0
@@ -180,12 +218,26 @@ class AutoCalibration:
                     # ========================================================
 
                     cv2.waitKey(1)
-                    time.sleep(0.05)
 
         except KeyboardInterrupt:
             self.voice.speak('error')
             return []
 
+        self.last_report = {
+            'test_name': test_name,
+            'samples': score_stats.count,
+            'frames': frame_count,
+            'duration': round(elapsed, 2),
+            'sample_rate': round(score_stats.count / elapsed, 1) if elapsed > 0 else 0.0,
+            'mean': score_stats.mean,
+            'ci_half_width': score_stats.ci_half_width(),
+            'converged': converged
+        }
+        end_reason = "収束により早期終了" if converged else "最大時間に到達"
+        print(f"\n[{test_name}] {end_reason}: {score_stats.count}サンプル / {frame_count}フレーム "
+              f"({elapsed:.1f}秒, {self.last_report['sample_rate']}サンプル/秒, "
+              f"信頼区間±{score_stats.ci_half_width():.4f})")
+
         return blink_scores
 
     def run_auto_calibration(self):
@@ -205,7 +257,9 @@ class AutoCalibration:
             time.sleep(0.1)
         time.sleep(3)
 
-        blink_scores_normal = self.run_test(duration_seconds=30, test_name="Step 1: Normal Viewing")
+        blink_scores_normal = self.run_test(duration_seconds=30, test_name="Step 1: Normal Viewing",
+                                            min_duration=5.0)
+        self.step_reports.append(self.last_report)
 
         if not blink_scores_normal:
             self.voice.speak('error')
@@ -228,7 +282,9 @@ class AutoCalibration:
             time.sleep(0.1)
         time.sleep(3)
 
-        blink_scores_closed = self.run_test(duration_seconds=10, test_name="Step 2: Eyes Closed")
+        blink_scores_closed = self.run_test(duration_seconds=10, test_name="Step 2: Eyes Closed",
+                                            min_duration=3.0)
+        self.step_reports.append(self.last_report)
 
         if not blink_scores_closed:
             self.voice.speak('error')
@@ -244,18 +300,16 @@ class AutoCalibration:
         time.sleep(2)
 
         # 最適な閾値を計算
-        # 開いている時の平均と閉じている時の平均の中間値を推奨
-        recommended_threshold = (avg_normal + avg_closed) / 2.0
-
-        # 安全マージンを加える（中間値の80%）
-        recommended_threshold *= 0.8
-
-        # 推奨範囲内に収める
-        recommended_threshold = max(0.3, min(0.7, recommended_threshold))
+        # 開いている時の平均と閉じている時の平均の中間値に安全マージンを加えて推奨
+        recommended_threshold = compute_recommended_threshold(avg_normal, avg_closed)
 
         print(f"\n推奨閾値: {recommended_threshold:.3f}")
         print(f"  開眼時平均: {avg_normal:.3f}")
         print(f"  閉眼時平均: {avg_closed:.3f}")
+        for report in self.step_reports:
+            if report:
+                print(f"  {report['test_name']}: {report['samples']}サンプル "
+                      f"({report['duration']}秒, {'収束' if report['converged'] else '最大時間'})")
 
         # 設定を更新
         current_threshold = self.config_mgr.get_sleep_detection_params().get('blink_threshold', 0.5)
@@ -269,7 +323,9 @@ class AutoCalibration:
         while self.voice._is_speaking:
             time.sleep(0.1)
 
-        self.config_mgr.update_sleep_detection_params(blink_threshold=recommended_threshold)
+        # 閾値のオンライン適応は calibrated_blink_threshold を基準にドリフトを制限する
+        self.config_mgr.update_sleep_detection_params(blink_threshold=recommended_threshold,
+                                                      calibrated_blink_threshold=recommended_threshold)
 
         # 設定を保存
         self.voice.speak('calib_save')
@@ -77,6 +77,34 @@ class ConfigManager:
 
         return self.save()
 
+    def get_adaptive_threshold_params(self):
+        """閾値オンライン適応のパラメータを取得"""
+        return self.config.get('adaptive_threshold', {})
+
+    def get_drowsiness_metrics_params(self):
+        """眠気指標のパラメータを取得"""
+        return self.config.get('drowsiness_metrics', {})
+
+    def get_shadow_detector_configs(self):
+        """シャドー検出器の設定リストを取得"""
+        return self.config.get('shadow_detectors', [])
+
+    def get_ir_actuation_params(self):
+        """テレビ操作（バックエンド・Stage2のマクロ）のパラメータを取得"""
+        return self.config.get('ir_actuation', {})
+
+    def get_database_params(self):
+        """ログ書き込み（データベース）のパラメータを取得"""
+        return self.config.get('database', {})
+
+    def get_telemetry_params(self):
+        """テレメトリー（1秒ごとの記録と保存期間）のパラメータを取得"""
+        return self.config.get('telemetry', {})
+
+    def get_energy_params(self):
+        """電気代の計算（テレビの消費電力・電気料金）のパラメータを取得"""
+        return self.config.get('energy', {})
+
     def get_system_params(self):
         """システムパラメータを取得"""
         return self.config.get('system', {})
@@ -95,6 +123,10 @@ class ConfigManager:
         for key, value in self.get_sleep_detection_params().items():
             print(f"  {key}: {value}")
 
+        print("\n【閾値オンライン適応】")
+        for key, value in self.get_adaptive_threshold_params().items():
+            print(f"  {key}: {value}")
+
         print("\n【システムパラメータ】")
         for key, value in self.get_system_params().items():
             print(f"  {key}: {value}")
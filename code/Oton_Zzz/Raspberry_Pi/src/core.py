@@ -26,9 +26,17 @@ from voice import VoiceController
 from tv_state import TVStateManager
 from detector import IRController, SleepDetector
 from ir_rx import IRMonitor
+from ir_codes import IRCodeIndex
+from ir_tx import IRSender
+from tv_actuator import create_actuator, LircActuator
 from state import SystemStateManager
 from db import DatabaseManager
+from archive import ArchiveMaintenance
 from config import ConfigManager
+from threshold_adapter import ThresholdAdapter
+from shadow import ShadowEvaluator
+from metrics import DrowsinessMetrics, write_snapshot
+from telemetry import TelemetrySampler
 
 
 def main():
@@ -70,6 +78,21 @@ def main():
     # データベース管理
     print("📝 データベース管理を初期化しています...")
     db_manager = DatabaseManager()
+    # ログはバックグラウンドでまとめて書き込む（SDカードの書き込み待ちで映像処理を止めない）
+    database_params = config_mgr.get_database_params()
+    db_manager.start_writer(
+        flush_interval=database_params.get('flush_interval', 1.0),
+        batch_size=database_params.get('batch_size', 50),
+        queue_size=database_params.get('queue_size', 1000)
+    )
+    # 古いログのアーカイブと空き領域の解放（テレビOFF中にバックグラウンドで実行）
+    maintenance = ArchiveMaintenance(
+        db_manager,
+        archive_dir=database_params.get('archive_dir', 'data/archive'),
+        archive_after_months=database_params.get('archive_after_months', 12),
+        vacuum_pages=database_params.get('vacuum_pages', 1000),
+        interval=database_params.get('maintenance_interval', 86400.0)
+    )
 
     # テレビの初期状態に合わせてシステム状態を設定
     if tv_state.is_on:
@@ -82,17 +105,21 @@ def main():
         ir_controller = IRController(tx_device='/dev/lirc0', rx_device='/dev/lirc1')
     except Exception as e:
         print(f"✗ IR Controllerの初期化に失敗しました: {e}")
+        db_manager.stop_writer()
         if led_enabled:
             led.cleanup()
         return
 
     # IR監視マネージャーの初期化
     print("👀 IRリモコン監視を初期化しています...")
-    ir_monitor = IRMonitor(rx_device='/dev/lirc1', tv_state_manager=tv_state)
+    # 電源ボタン以外の信号でテレビ状態が切り替わらないよう、登録済みボタンと照合する
+    ir_code_index = IRCodeIndex()
+    ir_monitor = IRMonitor(rx_device='/dev/lirc1', tv_state_manager=tv_state,
+                           code_index=ir_code_index, power_button="TV")
     ir_monitor.start()
 
     # テレビのリモコン信号を登録（既に登録済みでなければ）
-    if "TV" not in ir_controller.recorded_codes:
+    if not ir_controller.has_code("TV"):
         print("\n" + "="*60)
         print("初回起動: リモコン信号の登録が必要です")
         print("="*60)
@@ -101,23 +128,99 @@ def main():
             print("✗ リモコン登録に失敗しました。プログラムを終了します。")
             ir_monitor.stop()
             ir_controller.cleanup()
+            db_manager.stop_writer()
             if led_enabled:
                 led.cleanup()
             return
     else:
         print(f"✓ 【TV】のリモコン信号は既に登録済みです")
+    ir_code_index.load(ir_controller.recorded_codes)
+
+    # IR送信ワーカー（Stage2の送信でメインループを止めない）
+    ir_sender = IRSender(ir_controller, ir_monitor)
+    ir_sender.start()
+
+    # Stage2で送信するマクロ（未設定ならテレビの電源ボタンのみ）
+    ir_actuation_params = config_mgr.get_ir_actuation_params()
+    stage2_macro = ir_actuation_params.get('stage2_macro')
+    macro_max_duration = ir_actuation_params.get('macro_max_duration', 3.0)
+    if stage2_macro and stage2_macro not in ir_controller.code_store.macros:
+        print(f"⚠️  マクロ「{stage2_macro}」が config/ir_codes.json にないため、テレビの電源ボタンのみ送信します")
+        stage2_macro = None
+
+    # テレビ操作のバックエンド（lirc: ラズパイのIR LED / serial: M5StickC経由）
+    try:
+        tv_actuator = create_actuator(ir_actuation_params, ir_sender=ir_sender, ir_monitor=ir_monitor,
+                                      stage2_macro=stage2_macro, macro_max_duration=macro_max_duration)
+        tv_actuator.start()
+    except Exception as e:
+        print(f"⚠️  テレビ操作（{ir_actuation_params.get('backend', 'lirc')}）を開始できません: {e}")
+        print("   ラズパイのIR LEDから送信します")
+        tv_actuator = LircActuator(ir_sender, stage2_macro=stage2_macro, macro_max_duration=macro_max_duration,
+                                   ack_timeout=ir_actuation_params.get('ack_timeout', 3.0))
+        tv_actuator.start()
+    print(f"✓ テレビ操作: {tv_actuator.name}")
+
+    def report_power_off(result):
+        """電源OFFの完了をログに出す（テレビ操作のワーカースレッドから呼ばれる）"""
+        if result.success:
+            print(f"[{time.ctime()}] ✓ テレビの電源OFFが完了しました（{result.detail}、{result.latency * 1000:.0f}ms）")
 
     print("\n" + "="*60)
     print("Oton-Zzzシステムを開始します...")
     print("="*60 + "\n")
 
+    # 閾値オンライン適応（設定で有効な場合のみ）
+    adaptive_params = config_mgr.get_adaptive_threshold_params()
+    threshold_adapter = None
+    if adaptive_params.get('enabled', False):
+        # ドリフトの基準はキャリブレーションで決めた値（自動調整で書き換わる blink_threshold ではない）
+        # 基準を記録していない設定ファイルでは、現在の閾値を基準として記録しておく
+        calibrated_threshold = sleep_params.get('calibrated_blink_threshold')
+        if calibrated_threshold is None:
+            calibrated_threshold = sleep_params.get('blink_threshold', 0.5)
+            config_mgr.update_sleep_detection_params(calibrated_blink_threshold=calibrated_threshold)
+        threshold_adapter = ThresholdAdapter(
+            initial_threshold=sleep_params.get('blink_threshold', 0.5),
+            base_threshold=calibrated_threshold,
+            config_mgr=config_mgr,
+            mode=adaptive_params.get('mode', 'propose'),
+            max_step=adaptive_params.get('max_step', 0.02),
+            max_drift=adaptive_params.get('max_drift', 0.15),
+            min_samples=adaptive_params.get('min_samples', 300),
+            update_interval=adaptive_params.get('update_interval', 60.0),
+            persist_interval=adaptive_params.get('persist_interval', 600.0)
+        )
+
+    # 眠気指標（PERCLOS・まばたき頻度など）
+    metrics_params = config_mgr.get_drowsiness_metrics_params()
+    drowsiness_metrics = DrowsinessMetrics(
+        window_seconds=metrics_params.get('window_seconds', 60.0),
+        max_blink_duration=metrics_params.get('max_blink_duration', 0.5)
+    )
+    metrics_snapshot_interval = metrics_params.get('snapshot_interval', 2.0)
+
+    # テレメトリー（ゲージ・まばたきスコア・FPS・推論時間の1秒ごとの記録。書き込みはバックグラウンド）
+    telemetry_params = config_mgr.get_telemetry_params()
+    telemetry = None
+    if telemetry_params.get('enabled', True):
+        telemetry = TelemetrySampler(
+            db_manager,
+            retention_days=telemetry_params.get('retention_days'),
+            prune_interval=telemetry_params.get('prune_interval', 3600.0)
+        )
+
     # 睡眠検出器の初期化（設定ファイルから読み込み）
     detector = SleepDetector(
         blink_threshold=sleep_params.get('blink_threshold', 0.5),
         gauge_max=sleep_params.get('gauge_max', 5.0),
         gauge_increase_rate=sleep_params.get('gauge_increase_rate', 1.0),
         gauge_decrease_rate=sleep_params.get('gauge_decrease_rate', 1.5),
-        final_confirmation_time=sleep_params.get('final_confirmation_time', 5.0)
+        final_confirmation_time=sleep_params.get('final_confirmation_time', 5.0),
+        threshold_adapter=threshold_adapter,
+        metrics=drowsiness_metrics,
+        perclos_threshold=metrics_params.get('perclos_threshold'),
+        perclos_gain=metrics_params.get('perclos_gain', 1.5)
     )
 
     print(f"  - まばたき閾値: {detector.BLINK_THRESHOLD}")
@@ -125,6 +228,11 @@ def main():
     print(f"  - 増加速度: {detector.GAUGE_INCREASE_RATE}")
     print(f"  - 減少速度: {detector.GAUGE_DECREASE_RATE}")
     print(f"  - 最終確認時間: {detector.FINAL_CONFIRMATION_TIME}秒")
+    if threshold_adapter:
+        print(f"  - 閾値オンライン適応: {threshold_adapter.mode}")
+
+    # シャドー検出器（本番と同じ入力で別設定を並走させ、遷移時刻のみ記録）
+    shadows = ShadowEvaluator(config_mgr.get_shadow_detector_configs(), sleep_params, db_manager)
 
     # 音声再生中フラグ（MediaPipe処理スキップ用）
     voice._is_speaking = False
@@ -146,8 +254,11 @@ def main():
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
         print("✗ カメラを開けませんでした")
+        tv_actuator.stop()
+        ir_sender.stop()
         ir_monitor.stop()
         ir_controller.cleanup()
+        db_manager.stop_writer()
         if led_enabled:
             led.cleanup()
         return
@@ -157,6 +268,9 @@ def main():
     warning_spoken = False
     notified_stage2 = False
     skip_detection_until = 0  # テレビON後の検出スキップ期間
+    last_metrics_write = 0    # 眠気指標を最後に書き出した時刻
+    last_result_count = 0     # テレメトリーに推論時間を記録済みの検出結果の数
+    stage1_time = None        # Stage1を検出した時刻（寝落ちログのduration用）
 
     try:
         with FaceLandmarker.create_from_options(options) as landmarker:
@@ -176,10 +290,15 @@ def main():
             start_time = time.time()
 
             while True:
+                # リモコン信号チェック
+                # ACTIVE中はカメラの読み込みでループが進むので待たずに確認し、
+                # SLEEP中はリモコン操作が届くまで待機する（届いた時点ですぐに起きる。0.1秒ごとに画面の更新とキー入力を確認）
+                if system_state.is_active():
+                    ir_signal = ir_monitor.has_signal()
+                else:
+                    ir_signal = ir_monitor.wait_signal(timeout=0.1)
                 current_time = time.time()
 
-                # リモコン信号チェック
-                ir_signal = ir_monitor.has_signal()
                 if ir_signal:
                     # テレビ状態が変更された
                     tv_is_on = ir_signal['new_state']
@@ -188,11 +307,15 @@ def main():
                         # テレビON → システムACTIVE
                         system_state.set_active()
 
+                        # データベースの整理中なら区切りのよいところで止める（待たない）
+                        maintenance.stop(timeout=0)
+
                         # 通知フラグをリセット
                         notified_stage1 = False
                         warning_spoken = False
                         notified_stage2 = False
                         detector.reset()
+                        shadows.reset()
 
                         # テレビON後5秒間は検出をスキップ（警告誤検知防止）
                         skip_detection_until = current_time + 5.0
@@ -213,6 +336,7 @@ def main():
                         warning_spoken = False
                         notified_stage2 = False
                         detector.reset()
+                        shadows.reset()
 
                         # LED設定
                         if led_enabled:
@@ -237,6 +361,7 @@ def main():
                             break
                         # スキップ期間中はlast_update_timeを更新して、終了後のdelta_time急増を防ぐ
                         detector.last_update_time = time.time()
+                        shadows.sync_time(detector.last_update_time)
                         continue
 
                     # 音声再生中は画像処理をスキップ（バッファ蓄積防止）
@@ -249,6 +374,7 @@ def main():
                             break
                         # 音声再生中もlast_update_timeを更新
                         detector.last_update_time = time.time()
+                        shadows.sync_time(detector.last_update_time)
                         continue
 
                     frame = cv2.flip(frame, 1)
@@ -257,15 +383,36 @@ def main():
                     timestamp_ms = int((time.time() - start_time) * 1000)
                     landmarker.detect_async(mp_image, timestamp_ms)
 
-                    gauge_value, is_stage1, is_stage2, status = detector.process_result()
+                    detection = detector.process_result()
+                    gauge_value, is_stage1, is_stage2, status = detection
+
+                    # テレメトリーはメモリ上で1秒ごとにまとめ、1秒に1回だけ書き込みキューに入れる
+                    if telemetry is not None:
+                        inference_ms = None
+                        if detector.result_count != last_result_count and detector.latest_result_time is not None:
+                            last_result_count = detector.result_count
+                            inference_ms = (detector.latest_result_time - start_time) * 1000 - detector.latest_result_timestamp_ms
+                        telemetry.record(current_time, gauge_value, detector.last_face_detected,
+                                         detector.last_avg_blink, drowsiness_metrics.perclos, inference_ms)
+
+                    # シャドー検出器にも同じ入力を流す（ゲージ計算のみ）
+                    if shadows:
+                        shadows.step(detector, detection)
+
+                    # 眠気指標をダッシュボード用に定期的に書き出す
+                    if current_time - last_metrics_write >= metrics_snapshot_interval:
+                        write_snapshot(drowsiness_metrics.snapshot(current_time))
+                        last_metrics_write = current_time
 
                     # --- Stage1: 警告開始 ---
                     if is_stage1 and not notified_stage1:
+                        stage1_time = current_time
                         print(f"[{time.ctime()}] ⚠️  STAGE 1 DETECTED! 5秒後にOFF")
                         if led_enabled:
                             led.warning()  # 黄LED点滅
                         # 5秒なので簡潔な警告
                         voice.speak('warning')
+                        tv_actuator.alert()
                         notified_stage1 = True
                         warning_spoken = True
 
@@ -279,22 +426,14 @@ def main():
                                 led.power_off()  # 赤LED
                             voice.speak_shutdown()
 
-                            # IR監視を一時停止（自分の送信信号を受信しないように）
-                            ir_monitor.pause()
-                            time.sleep(0.5)
-
-                            # テレビのIR信号を送信
-                            ir_controller.send_ir_signal("TV")
+                            # テレビの電源OFFを送信（ワーカースレッドで送信し、自分の信号はIR監視側で無視）
+                            # lircでマクロが設定されていれば、テレビ以外の家電もまとめて操作する
+                            tv_actuator.power_off(on_done=report_power_off)
                             tv_state.turn_off()  # テレビ状態をOFFに
 
-                            # 送信信号が消えるまで待機
-                            time.sleep(2.0)
-
-                            # IR監視を再開
-                            ir_monitor.resume()
-
-                            # ログ記録
-                            db_manager.log_event('SLEEP_DETECTED', duration=detector.FINAL_CONFIRMATION_TIME, note="自動OFF")
+                            # ログ記録（durationは実際にStage1からOFFまでにかかった時間）
+                            sleep_duration = current_time - stage1_time if stage1_time is not None else detector.FINAL_CONFIRMATION_TIME
+                            db_manager.log_event('SLEEP_DETECTED', duration=round(sleep_duration, 2), note="自動OFF")
 
                             # システムをSLEEP状態に
                             system_state.set_sleep()
@@ -312,6 +451,7 @@ def main():
 
                         if notified_stage1 and not notified_stage2:
                             voice.speak_cancel()
+                            tv_actuator.awake()
 
                         if led_enabled:
                             led.power_on()  # 緑LEDに戻す
@@ -352,7 +492,10 @@ def main():
                     cv2.imshow("Oton-Zzz Phase 1 (TV Sync)", frame)
 
                 else:
-                    # SLEEP状態：待機画面を表示
+                    # SLEEP状態：テレビOFF中にデータベースを整理（前回から間隔が空いていれば開始するだけ）
+                    maintenance.run_if_idle()
+
+                    # 待機画面を表示
                     import numpy as np
                     frame = np.zeros((480, 640, 3), dtype=np.uint8)
 
@@ -370,11 +513,21 @@ def main():
         print("\n\n⚠️  キーボード割り込みを検出しました")
 
     finally:
+        # 適応した閾値（または提案値）を保存
+        if threshold_adapter:
+            threshold_adapter.persist()
+
         # クリーンアップ
         cap.release()
         cv2.destroyAllWindows()
+        tv_actuator.stop()
+        ir_sender.stop()
         ir_monitor.stop()
         ir_controller.cleanup()
+        maintenance.stop()
+        if telemetry is not None:
+            telemetry.flush()
+        db_manager.stop_writer()
         if led_enabled:
             led.cleanup()
         print("\n✓ プログラムを正常に終了しました")
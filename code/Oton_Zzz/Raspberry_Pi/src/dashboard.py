@@ -4,22 +4,34 @@ Oton-Zzz Webダッシュボード
 Flaskを使用して睡眠ログと統計を表示
 """
 
-from flask import Flask, render_template
+from flask import Flask, Response, render_template, jsonify, request, abort
 from datetime import datetime, timezone, timedelta
 import sys
 import os
+import time
 
 # srcディレクトリをパスに追加
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from db import DatabaseManager
+from db import CachedReader, DatabaseManager, EXPORT_TABLES
+from export import EXPORT_FORMATS, export
+from metrics import read_snapshot
+from config import ConfigManager
 
 # カレントディレクトリをプロジェクトルートに設定
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 os.chdir(project_root)
 
 app = Flask(__name__, template_folder='../templates', static_folder='../static')
-db_manager = DatabaseManager()
+config_mgr = ConfigManager()
+# 読み込み専用の接続で読み、データが変わっていなければ集計はメモリから返す（コアの書き込みと競合しない）
+# 電気代はconfig.jsonのテレビの消費電力・電気料金で計算する
+# 環境変数 DASHBOARD_DB で別のデータベース（tools/bench_dashboard.py の合成データなど）を表示できる
+db_reader = CachedReader(os.environ.get('DASHBOARD_DB', 'data/oton_zzz.db'),
+                         energy_params=config_mgr.get_energy_params())
+# テレメトリーの階層を選ぶ際に、コアと同じ保存期間を使う
+telemetry_retention = config_mgr.get_telemetry_params().get('retention_days')
+archive_dir = config_mgr.get_database_params().get('archive_dir', 'data/archive')
 
 @app.template_filter('to_jst')
 def to_jst_filter(iso_str):
@@ -41,10 +53,64 @@ def to_jst_filter(iso_str):
 @app.route('/')
 def index():
     """ダッシュボードのトップページ"""
-    stats = db_manager.get_weekly_stats()
-    daily_stats = db_manager.get_daily_stats()
-    logs = db_manager.get_recent_logs(20)
-    return render_template('index.html', stats=stats, logs=logs, daily_stats=daily_stats)
+    stats = db_reader.call('get_weekly_stats')
+    daily_stats = db_reader.call('get_daily_stats')
+    logs = db_reader.call('get_recent_logs', 20)
+    metrics = read_snapshot()
+    return render_template('index.html', stats=stats, logs=logs, daily_stats=daily_stats, metrics=metrics)
+
+@app.route('/api/metrics')
+def api_metrics():
+    """現在の眠気指標（コアが動作中でなければnull）"""
+    return jsonify(read_snapshot())
+
+@app.route('/api/telemetry')
+def api_telemetry():
+    """
+    テレメトリーの推移（期間に合わせて1秒・1分・1時間の階層から返す）
+
+    クエリ: seconds=直近何秒分か（既定3600） または start・end=エポック秒
+    """
+    end = request.args.get('end', type=float) or time.time()
+    start = request.args.get('start', type=float)
+    if start is None:
+        start = end - request.args.get('seconds', 3600, type=float)
+    max_points = request.args.get('max_points', 4000, type=int)
+    # 範囲が時刻で変わるのでキャッシュしない
+    return jsonify(db_reader.call('get_telemetry', start, end, max_points=max_points,
+                                  retention_days=telemetry_retention, cache=False))
+
+@app.route('/api/export/<table>')
+def api_export(table):
+    """
+    ログ・テレメトリーの書き出し（少しずつ送るので、何年分でもメモリは一定）
+
+    クエリ: format=csv/ndjson（既定csv）, from・to=ISO形式の日時（例: 2024-01-01）, gzip=1で圧縮, archive=1でアーカイブ済みの行も含める
+    """
+    fmt = request.args.get('format', 'csv')
+    if table not in EXPORT_TABLES or fmt not in EXPORT_FORMATS:
+        abort(404)
+    try:
+        start = datetime.fromisoformat(request.args['from']) if 'from' in request.args else None
+        end = datetime.fromisoformat(request.args['to']) if 'to' in request.args else None
+    except ValueError:
+        abort(400)
+    compress = request.args.get('gzip') == '1'
+    include_archive = request.args.get('archive') == '1'
+
+    def generate():
+        # 書き出しは時間がかかるので、ページ表示用の接続とは別の読み込み専用の接続を使う
+        reader = DatabaseManager(db_reader.db.db_path, read_only=True)
+        try:
+            yield from export(reader, table, fmt=fmt, start=start, end=end, compress=compress,
+                              archive_dir=archive_dir if include_archive else None)
+        finally:
+            reader.close()
+
+    filename = f"{table}.{fmt}" + ('.gz' if compress else '')
+    mimetype = 'application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    return Response(generate(), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 if __name__ == '__main__':
     # ポート番号を環境変数から取得（デフォルト: 5000）
@@ -4,32 +4,670 @@
 睡眠ログとテレビ操作履歴をSQLiteで管理
 """
 
+import fcntl
+import shutil
 import sqlite3
 import os
+import threading
+import time
 from datetime import datetime, timedelta
+from queue import Queue, Empty, Full
+from urllib.parse import quote
+
+from archive import ARCHIVE_TABLES, append_rows
+
+
+# スキーマのバージョン（PRAGMA user_version）。DatabaseManager._migrations() の順に適用する
+SCHEMA_VERSION = 7
+
+# PRAGMA auto_vacuum の値（0=NONE, 1=FULL, 2=INCREMENTAL）
+AUTO_VACUUM_INCREMENTAL = 2
+
+# 既存行の変換を1回のトランザクションで処理する行数（他のプロセスの書き込みを長く止めない）
+MIGRATION_CHUNK_ROWS = 5000
+
+# 接続ごとのステートメントキャッシュ数（同じSQL文字列は接続内で準備済みのものを再利用する）
+STATEMENT_CACHE_SIZE = 64
+
+# よく使うSQL（同じ文字列を使うことでステートメントキャッシュに当たる）
+SQL_INSERT_LOG = '''
+INSERT INTO logs (timestamp, ts_ms, event_type, duration, note)
+VALUES (?, ?, ?, ?, ?)
+'''
+
+SQL_INSERT_SHADOW_EVENT = '''
+INSERT INTO shadow_events (timestamp, shadow_name, event_type, gauge, note)
+VALUES (?, ?, ?, ?, ?)
+'''
+
+# 日別集計（daily_rollup）からの集計。dayはローカル日付の 'YYYY-MM-DD'
+SQL_ROLLUP_SUMMARY = '''
+SELECT COALESCE(SUM(count), 0), COALESCE(SUM(duration), 0) FROM daily_rollup
+WHERE event_type = ? AND day >= ?
+'''
+
+SQL_ROLLUP_DAILY = '''
+SELECT day, count, duration FROM daily_rollup
+WHERE event_type = ? AND day >= ?
+ORDER BY day
+'''
+
+SQL_ROLLUP_MONTHLY = '''
+SELECT substr(day, 1, 7) AS month, SUM(count), SUM(duration) FROM daily_rollup
+WHERE event_type = ? AND day >= ?
+GROUP BY month
+ORDER BY month
+'''
+
+# logsの指定範囲（id）を日別に集計して再集計用の一時テーブルに足し込む
+SQL_ROLLUP_ACCUMULATE = '''
+INSERT INTO temp.rollup_rebuild (day, event_type, count, duration)
+SELECT substr(timestamp, 1, 10), event_type, COUNT(*), COALESCE(SUM(duration), 0) FROM logs
+WHERE id > ? AND id <= ?
+GROUP BY 1, 2
+ON CONFLICT(day, event_type) DO UPDATE SET
+    count = count + excluded.count,
+    duration = duration + excluded.duration
+'''
+
+SQL_SHADOW_SUMMARY = '''
+SELECT shadow_name, event_type, COUNT(*) FROM shadow_events
+WHERE event_type != 'CONFIG' AND timestamp > ?
+GROUP BY shadow_name, event_type
+'''
+
+SQL_RECENT_LOGS = '''
+SELECT * FROM logs ORDER BY id DESC LIMIT ?
+'''
+
+# テレメトリーの階層（名前, テーブル, 1行あたりの秒数）。細かい順
+TELEMETRY_TIERS = (
+    ('1s', 'telemetry_1s', 1),
+    ('1m', 'telemetry_1m', 60),
+    ('1h', 'telemetry_1h', 3600)
+)
+
+# 階層ごとの既定の保存期間（日、Noneは削除しない）
+TELEMETRY_RETENTION_DAYS = {'1s': 7, '1m': 90, '1h': 730}
+
+# 同じ秒のサンプルが重なった場合は最初のものを残す（無視した行はトリガーも動かないので集計が二重にならない）
+SQL_INSERT_TELEMETRY = '''
+INSERT OR IGNORE INTO telemetry_1s (ts, gauge, blink, face_ratio, fps, inference_ms, perclos)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+# 1秒のサンプルを1分・1時間の集計に足し込むトリガー（{table}・{seconds}を階層ごとに埋める）
+# 平均は合計とサンプル数で持ち、読み出し時に割る（blink・inference_msはNULLのサンプルを数えない）
+SQL_TELEMETRY_ROLLUP_TRIGGER = '''
+CREATE TRIGGER IF NOT EXISTS trg_{table} AFTER INSERT ON telemetry_1s
+BEGIN
+    INSERT INTO {table} (ts, samples, gauge_sum, gauge_max, blink_sum, blink_samples, face_ratio_sum,
+                         fps_sum, fps_min, inference_sum, inference_samples, inference_max, perclos_sum, perclos_max)
+    VALUES (NEW.ts - NEW.ts % {seconds}, 1, NEW.gauge, NEW.gauge, COALESCE(NEW.blink, 0), NEW.blink IS NOT NULL,
+            NEW.face_ratio, NEW.fps, NEW.fps, COALESCE(NEW.inference_ms, 0), NEW.inference_ms IS NOT NULL,
+            NEW.inference_ms, NEW.perclos, NEW.perclos)
+    ON CONFLICT(ts) DO UPDATE SET
+        samples = samples + 1,
+        gauge_sum = gauge_sum + excluded.gauge_sum,
+        gauge_max = MAX(gauge_max, excluded.gauge_max),
+        blink_sum = blink_sum + excluded.blink_sum,
+        blink_samples = blink_samples + excluded.blink_samples,
+        face_ratio_sum = face_ratio_sum + excluded.face_ratio_sum,
+        fps_sum = fps_sum + excluded.fps_sum,
+        fps_min = MIN(fps_min, excluded.fps_min),
+        inference_sum = inference_sum + excluded.inference_sum,
+        inference_samples = inference_samples + excluded.inference_samples,
+        inference_max = MAX(COALESCE(inference_max, excluded.inference_max), COALESCE(excluded.inference_max, inference_max)),
+        perclos_sum = perclos_sum + excluded.perclos_sum,
+        perclos_max = MAX(perclos_max, excluded.perclos_max);
+END
+'''
+
+# 階層ごとの読み出し（列の並びは get_telemetry() の TELEMETRY_FIELDS と同じ）
+SQL_TELEMETRY_RAW = '''
+SELECT ts, gauge, gauge, blink, face_ratio, fps, fps, inference_ms, inference_ms, perclos, perclos
+FROM telemetry_1s WHERE ts >= ? AND ts < ? ORDER BY ts
+'''
+
+SQL_TELEMETRY_ROLLUP = '''
+SELECT ts, gauge_sum / samples, gauge_max, blink_sum / NULLIF(blink_samples, 0), face_ratio_sum / samples,
+       fps_sum / samples, fps_min, inference_sum / NULLIF(inference_samples, 0), inference_max,
+       perclos_sum / samples, perclos_max
+FROM {table} WHERE ts >= ? AND ts < ? ORDER BY ts
+'''
+
+TELEMETRY_FIELDS = ('ts', 'gauge', 'gauge_max', 'blink', 'face_ratio', 'fps', 'fps_min',
+                    'inference_ms', 'inference_max_ms', 'perclos', 'perclos_max')
+
+SQL_PRUNE_TELEMETRY = '''
+DELETE FROM {table} WHERE ts < ?
+'''
+
+# 電気代の計算に使う既定値（config.json の energy で上書き）
+# tv_wattage: テレビの消費電力（W）, cost_per_kwh: 1kWhあたりの電気料金（円）
+# assumed_hours_after_sleep: 自動OFFがなかった場合に寝落ち後もテレビがついていたと仮定する時間（節約額の推定用）
+DEFAULT_ENERGY_PARAMS = {'tv_wattage': 100.0, 'cost_per_kwh': 31.0, 'assumed_hours_after_sleep': 4.0}
+
+# これより長いテレビONの区間はOFFを取りこぼしたとみなして打ち切る（ミリ秒）
+MAX_TV_SESSION_MS = 12 * 3600 * 1000
+
+# テレビのON/OFFを変えるイベントを時刻順に並べ、TV_ONごとに次のイベント（OFF）までを1区間にする
+# v2の索引 (event_type, ts_ms, duration) だけで読めるので、logsの行数によらず期間内のイベントしか読まない
+SQL_TV_INTERVALS = '''
+WITH power AS (
+    SELECT ts_ms, event_type,
+           LEAD(ts_ms) OVER w AS next_ts,
+           LEAD(event_type) OVER w AS next_type
+    FROM logs
+    WHERE ts_ms >= ? AND ts_ms < ? AND event_type IN ('TV_ON', 'TV_OFF', 'SLEEP_DETECTED')
+    WINDOW w AS (ORDER BY ts_ms)
+)
+SELECT ts_ms, COALESCE(next_ts, ?), next_type FROM power
+WHERE event_type = 'TV_ON'
+'''
+
+SQL_ENERGY_DAILY = '''
+SELECT day, on_seconds, sessions FROM daily_energy WHERE day >= ? AND day < ?
+'''
+
+# ダッシュボードのキャッシュを捨てるかの判定に使う値（テレメトリーの書き込みでは変わらない）
+# stats_versionは集計の作り直し（rebuild_daily_rollup / rebuild_daily_energy）で増える
+SQL_EVENT_VERSION = '''
+SELECT (SELECT MAX(id) FROM logs), (SELECT MAX(day) FROM daily_energy), (SELECT version FROM stats_version)
+'''
+
+# 書き出し（エクスポート）できるテーブル -> 並び順の列, 期間で絞り込む列
+# timestampはローカル時刻のISO文字列、tsはエポック秒
+EXPORT_TABLES = {
+    'logs': ('id', 'timestamp'),
+    'shadow_events': ('id', 'timestamp'),
+    'telemetry_1s': ('ts', 'ts'),
+    'telemetry_1m': ('ts', 'ts'),
+    'telemetry_1h': ('ts', 'ts')
+}
+
+# 書き出しで1回に読み出す行数
+EXPORT_CHUNK_ROWS = 1000
+
+
+def first_day_of_month(today, months_back=0):
+    """
+    Nか月前の月の1日を取得
+
+    Args:
+        today: 基準の日付
+        months_back: 何か月前か（0で今月）
+
+    Returns:
+        str: 'YYYY-MM-01'
+    """
+    year, month = today.year, today.month - months_back
+    while month < 1:
+        year, month = year - 1, month + 12
+    return f"{year:04d}-{month:02d}-01"
+
+
+def to_epoch_ms(dt):
+    """
+    datetimeをエポックミリ秒に変換（タイムゾーンなしはローカル時刻とみなす。timestamp列と同じ解釈）
+
+    Args:
+        dt: datetime
+
+    Returns:
+        int: 1970-01-01 UTCからのミリ秒
+    """
+    return int(dt.timestamp() * 1000)
+
+
+class EventWriter:
+    """イベントの書き込みをまとめて行うバックグラウンドスレッド（SDカードの書き込み待ちで映像処理を止めない）"""
+
+    def __init__(self, db_manager, flush_interval=1.0, batch_size=50, queue_size=1000):
+        """
+        初期化
+
+        Args:
+            db_manager: 書き込み先のDatabaseManager
+            flush_interval: 最初のイベントを受け取ってから書き込むまでの最大時間（秒）
+            batch_size: この件数たまったらflush_intervalを待たずに書き込む
+            queue_size: 書き込み待ちの最大件数（あふれた分は破棄して数える）
+        """
+        self.db_manager = db_manager
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.queue = Queue(maxsize=queue_size)
+        self.worker_thread = None
+        self.is_running = False
+
+        # 計測値
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0       # キューがあふれて破棄した件数
+        self.failed = 0        # 書き込みエラーで失われた件数
+        self.batches = 0
+        self.max_queue_depth = 0
+        self.last_flush_latency = None  # 1回の書き込み（コミットまで）にかかった時間（秒）
+        self.max_flush_latency = 0.0
+
+    def start(self):
+        """書き込みスレッドを開始"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        書き込み待ちのイベントをすべて書き込んでからスレッドを停止
+
+        Args:
+            timeout: 停止を待つ最大時間（秒）
+        """
+        if not self.is_running:
+            return
+        self.is_running = False
+        deadline = time.monotonic() + timeout
+        # 終了の合図は破棄されないよう、空きを待って入れる
+        # （SDカードの書き込みが止まってキューが空かなければ合図は入れられないが、スレッドの終了は待つ）
+        try:
+            self.queue.put(None, timeout=timeout)
+        except Full:
+            pass
+        self.worker_thread.join(timeout=max(0.0, deadline - time.monotonic()))
+
+        # 時間内に終わらなかった場合、キューに残ったイベントは書き込まれないので破棄として数える
+        if self.worker_thread.is_alive():
+            remaining = sum(1 for item in list(self.queue.queue) if isinstance(item, tuple))
+            if remaining:
+                self.dropped += remaining
+                print(f"⚠️  ログの書き込みが終わらないため、書き込み待ちの{remaining}件を破棄しました")
+
+    def submit(self, sql, params):
+        """
+        書き込みを要求（すぐに戻る）
+
+        Args:
+            sql: INSERT文
+            params: パラメータ
+
+        Returns:
+            bool: キューに入れられたかどうか（あふれた場合はFalse）
+        """
+        try:
+            self.queue.put_nowait((sql, params))
+        except Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                print(f"⚠️  ログの書き込みが追いつかないため破棄しました（累計{self.dropped}件）")
+            return False
+        self.submitted += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return True
+
+    def flush(self, timeout=5.0):
+        """
+        書き込み待ちのイベントをすぐに書き込み、完了まで待つ
+
+        Args:
+            timeout: 完了を待つ最大時間（秒）
+
+        Returns:
+            bool: 時間内に書き込みが完了したかどうか
+        """
+        if not self.is_running:
+            return True
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except Full:
+            return False
+        return done.wait(timeout)
+
+    def _worker_loop(self):
+        """イベントをまとめて書き込むループ"""
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except Empty:
+                item = False  # flush_intervalが過ぎた
+
+            if item is None or isinstance(item, threading.Event) or item is False:
+                self._write(batch)
+                batch = []
+                deadline = None
+                if isinstance(item, threading.Event):
+                    item.set()
+                if item is None:
+                    break
+                continue
+
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+                deadline = None
+
+        self.db_manager.close()
+
+    def _write(self, batch):
+        """
+        1回のトランザクションでまとめて書き込む
+
+        Args:
+            batch: (INSERT文, パラメータ) のリスト
+        """
+        if not batch:
+            return
+
+        # 同じINSERT文ごとにexecutemanyする（テーブル内の順序は保たれる）
+        grouped = {}
+        for sql, params in batch:
+            grouped.setdefault(sql, []).append(params)
+
+        start = time.monotonic()
+        try:
+            with self.db_manager._connect() as conn:
+                for sql, rows in grouped.items():
+                    conn.executemany(sql, rows)
+        except sqlite3.Error as e:
+            self.failed += len(batch)
+            print(f"✗ ログの書き込みに失敗しました（{len(batch)}件）: {e}")
+            return
+
+        latency = time.monotonic() - start
+        self.written += len(batch)
+        self.batches += 1
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+
+    def get_metrics(self):
+        """
+        書き込みの計測値を取得
+
+        Returns:
+            dict: 要求・書き込み・破棄・失敗件数、書き込み回数、キューの長さ、書き込みにかかった時間（ミリ秒）
+        """
+        return {
+            'submitted': self.submitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+            'queue_depth': self.queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'last_flush_latency_ms': round(self.last_flush_latency * 1000, 2) if self.last_flush_latency is not None else None,
+            'max_flush_latency_ms': round(self.max_flush_latency * 1000, 2)
+        }
+
+
+class CachedReader:
+    """
+    ダッシュボード用の読み込み（読み込み専用の接続1本を共有し、イベントが増えていなければ結果をメモリから返す）
+
+    PRAGMA data_version はほかの接続（コア）がコミットするたびに変わるが、コアは動作中ほぼ毎秒
+    テレメトリーをコミットするので、それだけではキャッシュを捨てない。data_version が変わったときだけ
+    logsの最大idとdaily_energyの最終日（どちらも索引の端を読むだけ）、集計を作り直した回数を確かめ、
+    イベントが増えたか日別の集計が進んだ・作り直された場合にキャッシュを捨てる。
+    テレビがついている間の今日のON時間は「今」までで計算するので、LIVE_METHODS の結果は
+    LIVE_SECONDS 秒ごとに計算し直す。
+    読み込み専用の接続なので、コアの書き込みを待たせることもない
+    """
+
+    # 今日のON区間を現在時刻まで数えるメソッド
+    LIVE_METHODS = ('get_weekly_stats', 'get_energy_stats')
+    LIVE_SECONDS = 60
+
+    def __init__(self, db_path='data/oton_zzz.db', busy_timeout=5.0, energy_params=None):
+        """
+        初期化
+
+        Args:
+            db_path: データベースファイルのパス（存在しない場合・スキーマが古い場合は最初の1回だけ書き込み可能で開いて作る）
+            busy_timeout: 他のプロセスが書き込み中のときに待つ最大時間（秒）
+            energy_params: 電気代の計算設定（DatabaseManagerと同じ）
+        """
+        if not os.path.exists(db_path) or self._schema_version(db_path) < SCHEMA_VERSION:
+            DatabaseManager(db_path, busy_timeout).close()
+        self.db = DatabaseManager(db_path, busy_timeout, read_only=True, energy_params=energy_params)
+        self.lock = threading.Lock()
+        self._cache = {}
+        self._data_version = None
+        self._event_version = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _schema_version(db_path):
+        """読み込み専用で開いてスキーマのバージョンを確認"""
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}?mode=ro", uri=True)
+        try:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+        finally:
+            conn.close()
+
+    def call(self, method, *args, cache=True, **kwargs):
+        """
+        DatabaseManagerのメソッドを呼ぶ（同じ引数・同じデータ・同じ日付なら前回の結果を返す）
+
+        Args:
+            method: メソッド名（例: 'get_weekly_stats'）
+            cache: Falseなら常に実行する（時刻で範囲が変わるテレメトリーなど）
+
+        Returns:
+            メソッドの戻り値
+        """
+        with self.lock:
+            if not cache:
+                return getattr(self.db, method)(*args, **kwargs)
+
+            conn = self.db._connect()
+            data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version != self._data_version:
+                self._data_version = data_version
+                event_version = conn.execute(SQL_EVENT_VERSION).fetchone()
+                if event_version != self._event_version:
+                    self._cache.clear()
+                    self._event_version = event_version
+
+            # 週間・日別の集計は「今日」を基準にするので、日付が変わったら計算し直す
+            key = (method, args, tuple(sorted(kwargs.items())), datetime.now().date())
+            if method in self.LIVE_METHODS:
+                key += (int(time.time() // self.LIVE_SECONDS),)
+            if key in self._cache:
+                self.hits += 1
+                return self._cache[key]
+
+            self.misses += 1
+            result = getattr(self.db, method)(*args, **kwargs)
+            self._cache[key] = result
+            return result
+
+    def get_metrics(self):
+        """
+        キャッシュの計測値を取得
+
+        Returns:
+            dict: ヒット数・ミス数・キャッシュしている結果の数
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'cached': len(self._cache)}
 
 
 class DatabaseManager:
     """データベース管理クラス"""
 
-    def __init__(self, db_path='data/oton_zzz.db'):
+    def __init__(self, db_path='data/oton_zzz.db', busy_timeout=5.0, read_only=False, energy_params=None):
         """
         初期化
 
+        接続はスレッドごとに1本だけ開き、以降の呼び出しで使い回す
+        データベースはWALモードで使うので、コアの書き込みとダッシュボードの読み込みは互いを待たない
+
         Args:
             db_path: データベースファイルのパス
+            busy_timeout: 他のプロセスが書き込み中のときに待つ最大時間（秒）
+            read_only: 読み込み専用（mode=ro）で開く。マイグレーションは行わず、接続はスレッド間で1本を共有する
+                       （呼び出し側で排他すること。CachedReaderを参照）
+            energy_params: 電気代の計算設定（DEFAULT_ENERGY_PARAMSを部分的に上書き。config.json の energy）
         """
         self.db_path = db_path
-        self._init_db()
+        self.busy_timeout = busy_timeout
+        self.read_only = read_only
+        self._local = threading.local()
+        self._shared_conn = None
+        self.writer = None  # start_writer()で開始すると、ログの記録はバックグラウンドでまとめて書き込む
+        if not read_only:
+            self._init_db()
+
+        # テレビを1時間つけたときの電気代（円）
+        self.energy_params = dict(DEFAULT_ENERGY_PARAMS, **(energy_params or {}))
+        self.cost_per_hour = self.energy_params['tv_wattage'] / 1000.0 * self.energy_params['cost_per_kwh']
+
+    def _connect(self):
+        """
+        このスレッドの接続を取得（初回のみ開く）
+
+        Returns:
+            sqlite3.Connection: 接続
+        """
+        if self.read_only:
+            if self._shared_conn is None:
+                uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+                self._shared_conn = sqlite3.connect(uri, uri=True, timeout=self.busy_timeout,
+                                                    cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+            return self._shared_conn
+
+        conn = getattr(self._local, 'conn', None)
+        # fork後の子プロセスは親の接続を使わない
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
 
-        # 電気代計算用定数 (1kWhあたり31円、テレビ100Wと仮定)
-        self.COST_PER_KWH = 31.0
-        self.TV_WATTAGE = 100.0
-        self.COST_PER_HOUR = (self.TV_WATTAGE / 1000.0) * self.COST_PER_KWH
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute('PRAGMA synchronous=NORMAL')  # WALではコミットごとのfsyncを省いても壊れない
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """このスレッドの接続を閉じる"""
+        if self._shared_conn is not None:
+            self._shared_conn.close()
+            self._shared_conn = None
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def start_writer(self, flush_interval=1.0, batch_size=50, queue_size=1000):
+        """
+        ログの書き込みをバックグラウンドスレッドに移す（以降のlog_event・log_shadow_eventはすぐに戻る）
+
+        Args:
+            flush_interval: 最初のイベントを受け取ってから書き込むまでの最大時間（秒）
+            batch_size: この件数たまったらすぐに書き込む
+            queue_size: 書き込み待ちの最大件数
+        """
+        if self.writer is not None:
+            return
+        self.writer = EventWriter(self, flush_interval=flush_interval, batch_size=batch_size, queue_size=queue_size)
+        self.writer.start()
+
+    def stop_writer(self, timeout=5.0):
+        """書き込み待ちのログをすべて書き込んでからバックグラウンドスレッドを停止（終了時に呼ぶ）"""
+        if self.writer is None:
+            return
+        writer = self.writer
+        writer.stop(timeout=timeout)
+        self.writer = None
+        metrics = writer.get_metrics()
+        print(f"✓ ログを書き込みました（{metrics['written']}件、破棄 {metrics['dropped']}件、失敗 {metrics['failed']}件）")
+
+    def flush(self, timeout=5.0):
+        """書き込み待ちのログをすぐに書き込む（バックグラウンド書き込みを使っていなければ何もしない）"""
+        if self.writer is None:
+            return True
+        return self.writer.flush(timeout=timeout)
+
+    def _insert(self, sql, params):
+        """INSERT（またはDELETE）を実行（バックグラウンド書き込み中ならキューに入れるだけ）"""
+        if self.writer is not None:
+            self.writer.submit(sql, params)
+            return
+        with self._connect() as conn:
+            conn.execute(sql, params)
 
     def _init_db(self):
         """データベースとテーブルの初期化"""
-        conn = sqlite3.connect(self.db_path)
+        self.migrate()
+
+    def _migrations(self):
+        """スキーマのバージョンごとのマイグレーション（n番目を適用するとuser_versionがnになる）"""
+        return [
+            self._migrate_v1_create_tables,
+            self._migrate_v2_epoch_ms,
+            self._migrate_v3_daily_rollup,
+            self._migrate_v4_telemetry,
+            self._migrate_v5_incremental_vacuum,
+            self._migrate_v6_tv_energy,
+            self._migrate_v7_stats_version
+        ]
+
+    def migrate(self):
+        """
+        未適用のマイグレーションを順に適用（PRAGMA user_versionで適用済みのバージョンを管理）
+
+        各マイグレーションは途中で止まっても再実行できるように作る
+        コアとダッシュボードが同時に起動した場合に備え、db_path + '.migrate' の排他ロックを取ってから
+        user_versionを読む（後から来たプロセスは先のプロセスの適用が終わるまで待ち、適用済みの分は飛ばす）
+
+        Returns:
+            int: 適用後のスキーマのバージョン
+        """
+        with open(self.db_path + '.migrate', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                return self._migrate_locked()
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _migrate_locked(self):
+        """migrate()の本体（プロセス間の排他ロックを取った状態で呼ぶ）"""
+        conn = self._connect()
+
+        # 新しいデータベースでは、ファイルに何か書く前なら auto_vacuum を作り直しなしで設定できる（v5を参照）
+        # すでにテーブルのあるデータベースでは何も変わらない
+        if conn.execute('PRAGMA user_version').fetchone()[0] == 0:
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+
+        # WALモードはデータベースファイルに保存されるので、以降に開く接続（別プロセスも）はすべてWALになる
+        conn.execute('PRAGMA journal_mode=WAL')
+
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise Exception(f"データベース {self.db_path} のバージョン（{version}）がこのプログラム（{SCHEMA_VERSION}）より新しいです")
+
+        for target, migration in enumerate(self._migrations(), start=1):
+            if version >= target:
+                continue
+            if version > 0:
+                print(f"🔧 データベースを更新しています（v{version} → v{target}）...")
+            start = time.monotonic()
+            migration(conn)
+            conn.execute(f'PRAGMA user_version={target}')
+            if version > 0:
+                print(f"✓ データベースを更新しました（v{target}、{time.monotonic() - start:.1f}秒）")
+            version = target
+        return version
+
+    def _migrate_v1_create_tables(self, conn):
+        """v1: ログテーブルとシャドー検出器の遷移ログ"""
         cursor = conn.cursor()
 
         # ログテーブル作成
@@ -45,8 +683,292 @@ class DatabaseManager:
         )
         ''')
 
+        # シャドー検出器の遷移ログ
+        # shadow_name: シャドー設定名（本番検出器は 'live'）
+        # event_type: 'CONFIG', 'STAGE1', 'STAGE2', 'RECOVERED'
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shadow_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            shadow_name TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            gauge REAL DEFAULT 0,
+            note TEXT
+        )
+        ''')
+
         conn.commit()
-        conn.close()
+
+    def _migrate_v2_epoch_ms(self, conn):
+        """
+        v2: logsにエポックミリ秒の列（ts_ms）と (event_type, ts_ms) の索引を追加
+
+        索引にdurationも含め、集計クエリが表を読まずに索引だけで終わるようにする
+        既存行はMIGRATION_CHUNK_ROWS行ずつ別のトランザクションで変換し、書き込みを長く止めない
+        """
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(logs)')}
+        if 'ts_ms' not in columns:
+            with conn:
+                conn.execute('ALTER TABLE logs ADD COLUMN ts_ms INTEGER')
+
+        # timestampはローカル時刻のISO文字列なので、'utc'修飾子でUTCに直してからエポックミリ秒にする
+        max_id = conn.execute('SELECT MAX(id) FROM logs').fetchone()[0] or 0
+        for start_id in range(0, max_id, MIGRATION_CHUNK_ROWS):
+            with conn:
+                conn.execute('''
+                UPDATE logs
+                SET ts_ms = CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)
+                WHERE id > ? AND id <= ? AND ts_ms IS NULL
+                ''', (start_id, start_id + MIGRATION_CHUNK_ROWS))
+
+        with conn:
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_logs_event_ts ON logs (event_type, ts_ms, duration)')
+
+    def _migrate_v3_daily_rollup(self, conn):
+        """
+        v3: 日別・イベント種類別の件数と合計時間（daily_rollup）を追加
+
+        logsへの挿入ごとにトリガーで足し込むので、集計はlogsの行数によらず日数分の行を読むだけで済む
+        古いログを削除（アーカイブ）しても日別集計は残る
+        """
+        with conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS daily_rollup (
+                day TEXT NOT NULL,
+                event_type TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                duration REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, event_type)
+            ) WITHOUT ROWID
+            ''')
+
+            # timestampはローカル時刻のISO文字列なので、先頭10文字がローカル日付
+            conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_logs_daily_rollup AFTER INSERT ON logs
+            BEGIN
+                INSERT INTO daily_rollup (day, event_type, count, duration)
+                VALUES (substr(NEW.timestamp, 1, 10), NEW.event_type, 1, COALESCE(NEW.duration, 0))
+                ON CONFLICT(day, event_type) DO UPDATE SET
+                    count = count + 1,
+                    duration = duration + excluded.duration;
+            END
+            ''')
+
+        self.rebuild_daily_rollup()
+
+    def _migrate_v4_telemetry(self, conn):
+        """
+        v4: テレメトリーの3階層（1秒のサンプル、1分・1時間の集計）を追加
+
+        tsはエポック秒（集計は区間の先頭）で、INTEGER PRIMARY KEYなので範囲の読み出し・削除は行番号の範囲で済む
+        1分・1時間の集計は1秒のサンプルの挿入ごとにトリガーで足し込むので、1秒のサンプルを削除しても残る
+        """
+        with conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS telemetry_1s (
+                ts INTEGER PRIMARY KEY,
+                gauge REAL NOT NULL,
+                blink REAL,
+                face_ratio REAL NOT NULL,
+                fps REAL NOT NULL,
+                inference_ms REAL,
+                perclos REAL NOT NULL
+            )
+            ''')
+
+            for _, table, seconds in TELEMETRY_TIERS[1:]:
+                conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    ts INTEGER PRIMARY KEY,
+                    samples INTEGER NOT NULL,
+                    gauge_sum REAL NOT NULL,
+                    gauge_max REAL NOT NULL,
+                    blink_sum REAL NOT NULL,
+                    blink_samples INTEGER NOT NULL,
+                    face_ratio_sum REAL NOT NULL,
+                    fps_sum REAL NOT NULL,
+                    fps_min REAL NOT NULL,
+                    inference_sum REAL NOT NULL,
+                    inference_samples INTEGER NOT NULL,
+                    inference_max REAL,
+                    perclos_sum REAL NOT NULL,
+                    perclos_max REAL NOT NULL
+                )
+                ''')
+                conn.execute(SQL_TELEMETRY_ROLLUP_TRIGGER.format(table=table, seconds=seconds))
+
+    def _migrate_v5_incremental_vacuum(self, conn):
+        """
+        v5: auto_vacuum=INCREMENTAL（削除で空いたページを incremental_vacuum() で少しずつ返せるようにする）
+
+        新しいデータベースはマイグレーションの前（ファイルに何も書かれていないうち）に設定済み。既存のデータベースの切り替えにはVACUUMでの作り直し
+        （その間はデータベース全体を排他ロックし、ファイルの約2倍の空き容量が必要）が要るので、起動時には行わない。
+        tools/db_admin.py enable-incremental-vacuum で enable_incremental_vacuum() を明示的に実行する
+        （切り替えるまでは削除で空いたページはファイル内で再利用されるだけで、ファイルは小さくならない）
+        """
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            print("ℹ️  削除で空いた領域をファイルから解放するには python tools/db_admin.py enable-incremental-vacuum を"
+                  "実行してください（コア・ダッシュボードを止めてから）")
+
+    def _migrate_v6_tv_energy(self, conn):
+        """
+        v6: 日別のテレビON時間（daily_energy）を追加
+
+        ON区間は SQL_TV_INTERVALS でv2の索引から求め、refresh_daily_energy() で終わった日の分を埋める
+        （古いログをアーカイブしても残る）
+        """
+        with conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS daily_energy (
+                day TEXT PRIMARY KEY,
+                on_seconds REAL NOT NULL,
+                sessions INTEGER NOT NULL
+            ) WITHOUT ROWID
+            ''')
+
+    def _migrate_v7_stats_version(self, conn):
+        """v7: 集計を作り直した回数（ダッシュボードのキャッシュを捨てる目印）"""
+        with conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS stats_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)')
+            conn.execute('INSERT OR IGNORE INTO stats_version (id, version) VALUES (1, 0)')
+
+    def _bump_stats_version(self, conn):
+        """集計を作り直したことを記録（v7より前のマイグレーション中はテーブルがないので何もしない）"""
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_version'").fetchone():
+            conn.execute('UPDATE stats_version SET version = version + 1')
+
+    def rebuild_daily_rollup(self):
+        """
+        logsから日別集計を作り直す（マイグレーション時と tools/db_admin.py rebuild-rollup から使用）
+
+        logsをMIGRATION_CHUNK_ROWS行ずつ一時テーブルに集計し、最後の短いトランザクションで
+        残りの行の集計とdaily_rollupの置き換えを行う（集計中に追加されたログも漏れない）
+        logsに行が残っていない日（アーカイブ済み）の集計はそのまま残す
+
+        Returns:
+            int: 集計した日数
+        """
+        conn = self._connect()
+        conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS rollup_rebuild (
+            day TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            duration REAL NOT NULL,
+            PRIMARY KEY (day, event_type)
+        )
+        ''')
+        with conn:
+            conn.execute('DELETE FROM temp.rollup_rebuild')
+
+        max_id = conn.execute('SELECT MAX(id) FROM logs').fetchone()[0] or 0
+        last_id = 0
+        while last_id + MIGRATION_CHUNK_ROWS < max_id:
+            with conn:
+                conn.execute(SQL_ROLLUP_ACCUMULATE, (last_id, last_id + MIGRATION_CHUNK_ROWS))
+            last_id += MIGRATION_CHUNK_ROWS
+
+        # 残りの行の集計と置き換えは、ほかの書き込みが割り込まないよう1つのトランザクションで行う
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(SQL_ROLLUP_ACCUMULATE, (last_id, 2 ** 63 - 1))
+            conn.execute('DELETE FROM daily_rollup WHERE day IN (SELECT day FROM temp.rollup_rebuild)')
+            conn.execute('''
+            INSERT INTO daily_rollup (day, event_type, count, duration)
+            SELECT day, event_type, count, duration FROM temp.rollup_rebuild
+            ''')
+            days = conn.execute('SELECT COUNT(DISTINCT day) FROM temp.rollup_rebuild').fetchone()[0]
+            conn.execute('DELETE FROM temp.rollup_rebuild')
+            self._bump_stats_version(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return days
+
+    def archive_old_events(self, archive_dir, months, chunk_rows=MIGRATION_CHUNK_ROWS, should_stop=None):
+        """
+        Nか月より前の月のlogs・shadow_eventsを月ごとのアーカイブファイルに書き出してから削除
+
+        idの順にchunk_rows行ずつ、書き出し（fsyncまで）→ その範囲の削除（1回の短いトランザクション）を繰り返す
+        日別集計（daily_rollup）は削除しないので、日別・週間・月別の集計は変わらない
+
+        Args:
+            archive_dir: アーカイブの書き出し先
+            months: 今月を含めて何か月分を残すか（これより前の月の行をアーカイブ）
+            chunk_rows: 1回に書き出して削除する行数
+            should_stop: Trueを返すと区切りのよいところで中断する関数（省略可）
+
+        Returns:
+            dict: テーブルごとのアーカイブした行数
+        """
+        conn = self._connect()
+        cutoff = first_day_of_month(datetime.now().date(), months - 1)
+
+        archived = {}
+        for table in ARCHIVE_TABLES:
+            archived[table] = 0
+            last_id = 0
+            while should_stop is None or not should_stop():
+                cursor = conn.execute(f'SELECT * FROM {table} WHERE id > ? AND timestamp < ? ORDER BY id LIMIT ?',
+                                      (last_id, cutoff, chunk_rows))
+                columns = [description[0] for description in cursor.description]
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                append_rows(archive_dir, table, columns, rows)
+                # 範囲内でtimestampが条件に合う行は、今書き出した行と同じ
+                with conn:
+                    conn.execute(f'DELETE FROM {table} WHERE id >= ? AND id <= ? AND timestamp < ?',
+                                 (rows[0][0], rows[-1][0], cutoff))
+                archived[table] += len(rows)
+                last_id = rows[-1][0]
+        return archived
+
+    def enable_incremental_vacuum(self):
+        """
+        既存のデータベースを auto_vacuum=INCREMENTAL に切り替える（VACUUMでファイルを作り直す）
+
+        作り直しの間はデータベース全体を排他ロックするので、コア・ダッシュボードを止めてから実行する
+
+        Returns:
+            bool: 切り替えたかどうか（すでにINCREMENTALならFalse）
+
+        Raises:
+            OSError: 作り直しに必要な空き容量（ファイルの約2倍）がない場合
+        """
+        conn = self._connect()
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+            return False
+
+        size = os.path.getsize(self.db_path)
+        free = shutil.disk_usage(os.path.dirname(os.path.abspath(self.db_path))).free
+        if free < size * 2:
+            raise OSError(f"空き容量が足りません（データベース {size / 1024 / 1024:.0f}MB に対して"
+                          f"空き {free / 1024 / 1024:.0f}MB。約2倍が必要です）")
+
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+        return True
+
+    def incremental_vacuum(self, pages=1000):
+        """
+        削除で空いたページを最大pages個だけファイルから解放
+
+        Returns:
+            int: 解放したページ数（0なら空きページは残っていない）
+        """
+        conn = self._connect()
+        before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if before == 0:
+            return 0
+        conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+        return before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+    def checkpoint(self):
+        """WALの内容をデータベースファイルに書き戻し、-walファイルを切り詰める（読み込み中の接続があれば次回に持ち越す）"""
+        self._connect().execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
 
     def log_event(self, event_type, duration=0, note=""):
         """
@@ -57,19 +979,261 @@ class DatabaseManager:
             duration: 経過時間（秒）
             note: 備考
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # 時刻は書き込み時ではなく記録を要求した時点のもの
+        now = datetime.now()
+        self._insert(SQL_INSERT_LOG, (now.isoformat(), to_epoch_ms(now), event_type, duration, note))
+        print(f"📝 ログ記録: {event_type} ({duration}s) - {note}")
 
+    def log_shadow_event(self, shadow_name, event_type, gauge=0, note=""):
+        """
+        シャドー検出器の遷移を記録
+
+        Args:
+            shadow_name: シャドー設定名（本番検出器は 'live'）
+            event_type: イベントの種類
+            gauge: 遷移時のゲージ値
+            note: 備考
+        """
         timestamp = datetime.now().isoformat()
+        self._insert(SQL_INSERT_SHADOW_EVENT, (timestamp, shadow_name, event_type, gauge, note))
 
-        cursor.execute('''
-        INSERT INTO logs (timestamp, event_type, duration, note)
-        VALUES (?, ?, ?, ?)
-        ''', (timestamp, event_type, duration, note))
+    def log_telemetry(self, ts, gauge, blink, face_ratio, fps, inference_ms, perclos):
+        """
+        テレメトリーの1秒分のサンプルを記録（1分・1時間の集計はトリガーで更新される）
 
-        conn.commit()
-        conn.close()
-        print(f"📝 ログ記録: {event_type} ({duration}s) - {note}")
+        Args:
+            ts: エポック秒
+            gauge: 睡眠ゲージの平均
+            blink: まばたきスコアの平均（顔を検出したフレームがなければNone）
+            face_ratio: 顔を検出したフレームの割合
+            fps: この1秒に処理したフレーム数
+            inference_ms: 推論時間の平均（ミリ秒、検出結果が届いていなければNone）
+            perclos: PERCLOSの平均
+        """
+        self._insert(SQL_INSERT_TELEMETRY, (ts, gauge, blink, face_ratio, fps, inference_ms, perclos))
+
+    def prune_telemetry(self, retention_days=None, now=None):
+        """
+        保存期間を過ぎたテレメトリーを階層ごとに削除（バックグラウンド書き込み中はキューに入れるだけ）
+
+        Args:
+            retention_days: 階層ごとの保存期間（日） {'1s': 7, '1m': 90, '1h': 730}（Noneの階層は削除しない）
+            now: 基準のエポック秒（省略時は現在時刻）
+        """
+        retention_days = dict(TELEMETRY_RETENTION_DAYS, **(retention_days or {}))
+        now = time.time() if now is None else now
+        for name, table, seconds in TELEMETRY_TIERS:
+            days = retention_days.get(name)
+            if days is None:
+                continue
+            self._insert(SQL_PRUNE_TELEMETRY.format(table=table), (int(now - days * 86400),))
+
+    def get_telemetry(self, start, end=None, max_points=4000, retention_days=None):
+        """
+        期間内のテレメトリーを取得（期間の長さに合った階層から読む）
+
+        点数がmax_points以下になる最も細かい階層を使う。ただし保存期間を過ぎて削除されている階層は飛ばす
+
+        Args:
+            start: 開始のエポック秒
+            end: 終了のエポック秒（省略時は現在時刻）
+            max_points: 返す点数の上限の目安
+            retention_days: 階層ごとの保存期間（日、prune_telemetry()と同じもの）
+
+        Returns:
+            dict: {'tier': '1s'/'1m'/'1h', 'resolution': 1点あたりの秒数, 'points': [{ts, gauge, gauge_max, ...}]}
+        """
+        retention_days = dict(TELEMETRY_RETENTION_DAYS, **(retention_days or {}))
+        now = time.time()
+        end = now if end is None else end
+
+        name, table, seconds = TELEMETRY_TIERS[-1]
+        for tier in TELEMETRY_TIERS:
+            days = retention_days.get(tier[0])
+            if (end - start) / tier[2] > max_points or (days is not None and start < now - days * 86400):
+                continue
+            name, table, seconds = tier
+            break
+
+        sql = SQL_TELEMETRY_RAW if seconds == 1 else SQL_TELEMETRY_ROLLUP.format(table=table)
+        # 集計は区間の先頭の時刻で持つので、startを含む区間から読む
+        rows = self._connect().execute(sql, (int(start) - int(start) % seconds, int(end) + 1)).fetchall()
+        return {
+            'tier': name,
+            'resolution': seconds,
+            'points': [dict(zip(TELEMETRY_FIELDS, row)) for row in rows]
+        }
+
+    def iter_rows(self, table, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        """
+        テーブルの行を古い順にchunk_rows行ずつ読み出す（カーソルから少しずつ取り出すので、何年分でもメモリは一定）
+
+        Args:
+            table: EXPORT_TABLESのいずれか
+            start: この時刻以降（datetime、省略時は最初から）
+            end: この時刻より前（datetime、省略時は最後まで）
+            chunk_rows: 1回に読み出す行数
+
+        Yields:
+            tuple: (列名のリスト, 行のリスト)（行がなくても列名を返すため、最初の1回は空のリストのことがある）
+        """
+        order_column, time_column = EXPORT_TABLES[table]
+        to_value = (lambda dt: dt.isoformat()) if time_column == 'timestamp' else (lambda dt: int(dt.timestamp()))
+
+        conditions, params = [], []
+        if start is not None:
+            conditions.append(f'{time_column} >= ?')
+            params.append(to_value(start))
+        if end is not None:
+            conditions.append(f'{time_column} < ?')
+            params.append(to_value(end))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        cursor = self._connect().execute(f'SELECT * FROM {table} {where} ORDER BY {order_column}', params)
+        columns = [description[0] for description in cursor.description]
+        try:
+            rows = cursor.fetchmany(chunk_rows)
+            yield columns, rows
+            while rows:
+                rows = cursor.fetchmany(chunk_rows)
+                if rows:
+                    yield columns, rows
+        finally:
+            cursor.close()
+
+    def _tv_on_by_day(self, first_day, end_day):
+        """
+        ログからテレビのON区間を求め、日ごとのON時間と回数に分ける
+
+        TV_ONから次のTV_OFF / SLEEP_DETECTEDまでを1区間とし、日付をまたぐ区間は0時で分ける
+        次のイベントもTV_ONの場合（OFFの取りこぼし）やMAX_TV_SESSION_MSより長い区間は打ち切り、
+        まだOFFになっていない区間は現在時刻までとする
+
+        Args:
+            first_day: 最初の日（date）
+            end_day: この日の前日まで（date）
+
+        Returns:
+            dict: {'YYYY-MM-DD': (ON時間（秒）, ONにした回数)}（ONの時間がない日は含まない）
+        """
+        start_ms = to_epoch_ms(datetime.combine(first_day, datetime.min.time()))
+        end_ms = to_epoch_ms(datetime.combine(end_day, datetime.min.time()))
+        now_ms = to_epoch_ms(datetime.now())
+
+        # 期間の前後にはみ出す区間も分かるよう、1区間の最大長だけ広く読む
+        rows = self._connect().execute(
+            SQL_TV_INTERVALS, (start_ms - MAX_TV_SESSION_MS, end_ms + MAX_TV_SESSION_MS, now_ms)).fetchall()
+
+        by_day = {}
+        for on_ms, off_ms, next_type in rows:
+            if next_type == 'TV_ON' or off_ms - on_ms > MAX_TV_SESSION_MS:
+                off_ms = min(off_ms, on_ms + MAX_TV_SESSION_MS)
+            if start_ms <= on_ms < end_ms:
+                day = datetime.fromtimestamp(on_ms / 1000).date().isoformat()
+                seconds, sessions = by_day.get(day, (0.0, 0))
+                by_day[day] = (seconds, sessions + 1)
+
+            # 0時ごとに分けて、期間内の分だけ足す
+            cursor_ms = max(on_ms, start_ms)
+            off_ms = min(off_ms, end_ms)
+            while cursor_ms < off_ms:
+                day = datetime.fromtimestamp(cursor_ms / 1000).date()
+                midnight_ms = to_epoch_ms(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+                segment_end = min(off_ms, midnight_ms)
+                seconds, sessions = by_day.get(day.isoformat(), (0.0, 0))
+                by_day[day.isoformat()] = (seconds + (segment_end - cursor_ms) / 1000.0, sessions)
+                cursor_ms = segment_end
+        return by_day
+
+    def refresh_daily_energy(self, chunk_days=31):
+        """
+        終わった日（昨日まで）のうち、まだ集計していない日のテレビON時間をdaily_energyに書き込む
+
+        一度書き込んだ日は作り直さない（古いログをアーカイブしても残る）。tools/db_admin.py rebuild-energy で作り直せる
+
+        Args:
+            chunk_days: 1回のクエリ・トランザクションで処理する日数
+
+        Returns:
+            int: 書き込んだ日数
+        """
+        conn = self._connect()
+        today = datetime.now().date()
+
+        last_day = conn.execute('SELECT MAX(day) FROM daily_energy').fetchone()[0]
+        if last_day is not None:
+            first_day = datetime.fromisoformat(last_day).date() + timedelta(days=1)
+        else:
+            first_ms = conn.execute('SELECT MIN(ts_ms) FROM logs').fetchone()[0]
+            if first_ms is None:
+                return 0
+            first_day = datetime.fromtimestamp(first_ms / 1000).date()
+
+        written = 0
+        while first_day < today:
+            end_day = min(first_day + timedelta(days=chunk_days), today)
+            by_day = self._tv_on_by_day(first_day, end_day)
+            rows = []
+            day = first_day
+            while day < end_day:
+                seconds, sessions = by_day.get(day.isoformat(), (0.0, 0))
+                rows.append((day.isoformat(), seconds, sessions))
+                day += timedelta(days=1)
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO daily_energy (day, on_seconds, sessions) VALUES (?, ?, ?)', rows)
+            written += len(rows)
+            first_day = end_day
+        return written
+
+    def rebuild_daily_energy(self):
+        """日別のテレビON時間をログから作り直す（ログが残っている日のみ。アーカイブ済みの日はそのまま）"""
+        conn = self._connect()
+        first_ms = conn.execute('SELECT MIN(ts_ms) FROM logs').fetchone()[0]
+        if first_ms is not None:
+            first_day = datetime.fromtimestamp(first_ms / 1000).date().isoformat()
+            with conn:
+                conn.execute('DELETE FROM daily_energy WHERE day >= ?', (first_day,))
+                self._bump_stats_version(conn)
+        return self.refresh_daily_energy()
+
+    def get_energy_stats(self, days=7):
+        """
+        過去N日間の日別のテレビON時間と電気代を取得
+
+        終わった日はdaily_energyから読み、まだ書き込まれていない日（今日など）だけログから計算する
+
+        Returns:
+            list: 古い日から順の {'date': 'YYYY-MM-DD', 'on_seconds': ON時間（秒）, 'sessions': ONにした回数,
+                  'kwh': 消費電力量, 'cost': 電気代（円）}
+        """
+        today = datetime.now().date()
+        first_day = today - timedelta(days=days - 1)
+        end_day = today + timedelta(days=1)
+
+        rows = self._connect().execute(SQL_ENERGY_DAILY, (first_day.isoformat(), end_day.isoformat())).fetchall()
+        by_day = {day: (on_seconds, sessions) for day, on_seconds, sessions in rows}
+
+        missing = [first_day + timedelta(days=i) for i in range(days)
+                   if (first_day + timedelta(days=i)).isoformat() not in by_day]
+        if missing:
+            live = self._tv_on_by_day(missing[0], end_day)
+            for day in missing:
+                by_day[day.isoformat()] = live.get(day.isoformat(), (0.0, 0))
+
+        kwh_per_second = self.energy_params['tv_wattage'] / 1000.0 / 3600.0
+        stats = []
+        for i in range(days):
+            day = (first_day + timedelta(days=i)).isoformat()
+            on_seconds, sessions = by_day[day]
+            kwh = on_seconds * kwh_per_second
+            stats.append({
+                'date': day,
+                'on_seconds': round(on_seconds, 1),
+                'sessions': sessions,
+                'kwh': round(kwh, 3),
+                'cost': round(kwh * self.energy_params['cost_per_kwh'], 2)
+            })
+        return stats
 
     def get_weekly_stats(self):
         """
@@ -78,89 +1242,99 @@ class DatabaseManager:
         Returns:
             dict: 統計データ
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # 7日前の日時
-        seven_days_ago = (datetime.now() - timedelta(days=7)).isoformat()
+        # 今日を含む過去7日間（日別グラフと同じ範囲）
+        first_day = (datetime.now().date() - timedelta(days=6)).isoformat()
 
         # 寝落ち回数（自動OFF回数）
-        cursor.execute('''
-        SELECT COUNT(*), SUM(duration) FROM logs
-        WHERE event_type = 'SLEEP_DETECTED' AND timestamp > ?
-        ''', (seven_days_ago,))
-
-        result = cursor.fetchone()
+        result = self._connect().execute(SQL_ROLLUP_SUMMARY, ('SLEEP_DETECTED', first_day)).fetchone()
         sleep_count = result[0] if result[0] else 0
         wasted_seconds = result[1] if result[1] else 0
 
         # 節約できた時間（推定）
-        # 1回の寝落ちにつき、朝まで（平均4時間）テレビがついていたと仮定して計算
+        # 1回の寝落ちにつき、自動OFFがなければ assumed_hours_after_sleep 時間テレビがついていたと仮定して計算
         # これは「もしOton-Zzzがなかったら」の推定値
-        estimated_saved_hours = sleep_count * 4.0
-        estimated_saved_money = estimated_saved_hours * self.COST_PER_HOUR
+        assumed_hours = self.energy_params['assumed_hours_after_sleep']
+        estimated_saved_hours = sleep_count * assumed_hours
+        estimated_saved_money = estimated_saved_hours * self.cost_per_hour
 
         # 実際に無駄になった電気代（Stage1〜OFFまでの時間）
         wasted_hours = wasted_seconds / 3600.0
-        wasted_money = wasted_hours * self.COST_PER_HOUR
+        wasted_money = wasted_hours * self.cost_per_hour
 
-        conn.close()
+        # 実際にテレビがついていた時間と電気代（ON/OFFのログから計算）
+        energy = self.get_energy_stats(7)
+        tv_on_seconds = sum(day['on_seconds'] for day in energy)
 
         return {
             'sleep_count': sleep_count,
             'wasted_seconds': wasted_seconds,
             'wasted_money': round(wasted_money, 2),
             'estimated_saved_hours': estimated_saved_hours,
-            'estimated_saved_money': round(estimated_saved_money, 2)
+            'estimated_saved_money': round(estimated_saved_money, 2),
+            'assumed_hours_after_sleep': assumed_hours,
+            'tv_on_hours': round(tv_on_seconds / 3600.0, 2),
+            'energy_kwh': round(sum(day['kwh'] for day in energy), 3),
+            'energy_cost': round(sum(day['cost'] for day in energy), 2)
         }
 
     def get_daily_stats(self, days=7):
         """
-        過去N日間の日別統計を取得
-        """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        過去N日間の日別統計を取得（日別集計から1回のクエリで取得し、記録のない日は0で埋める）
 
-        stats = []
+        Returns:
+            list: 古い日から順の {'date': 'MM/DD', 'count': 寝落ち回数, 'duration': 合計時間（秒）}
+        """
         today = datetime.now().date()
+        first_day = today - timedelta(days=days - 1)
 
-        for i in range(days):
-            target_date = today - timedelta(days=i)
-            date_str = target_date.isoformat()
-            next_date_str = (target_date + timedelta(days=1)).isoformat()
-
-            cursor.execute('''
-            SELECT COUNT(*), SUM(duration) FROM logs
-            WHERE event_type = 'SLEEP_DETECTED'
-            AND timestamp >= ? AND timestamp < ?
-            ''', (date_str, next_date_str))
-
-            result = cursor.fetchone()
-            count = result[0] if result[0] else 0
-            duration = result[1] if result[1] else 0
+        rows = self._connect().execute(SQL_ROLLUP_DAILY, ('SLEEP_DETECTED', first_day.isoformat())).fetchall()
+        by_day = {day: (count, duration) for day, count, duration in rows}
 
+        stats = []
+        for i in range(days):
+            target_date = first_day + timedelta(days=i)
+            count, duration = by_day.get(target_date.isoformat(), (0, 0))
             stats.append({
                 'date': target_date.strftime('%m/%d'),
                 'count': count,
                 'duration': duration
             })
 
-        conn.close()
-        return list(reversed(stats))
+        return stats
 
-    def get_recent_logs(self, limit=10):
-        """最新のログを取得"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+    def get_monthly_stats(self, months=12):
+        """
+        過去Nか月の月別統計を取得（日別集計を1回のクエリで月ごとにまとめる）
 
-        cursor.execute('''
-        SELECT * FROM logs ORDER BY id DESC LIMIT ?
-        ''', (limit,))
+        Returns:
+            list: 古い月から順の {'month': 'YYYY-MM', 'count': 寝落ち回数, 'duration': 合計時間（秒）}
+        """
+        first_day = first_day_of_month(datetime.now().date(), months - 1)
+        rows = self._connect().execute(SQL_ROLLUP_MONTHLY, ('SLEEP_DETECTED', first_day)).fetchall()
+        return [{'month': month, 'count': count, 'duration': duration} for month, count, duration in rows]
 
-        logs = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return logs
+    def get_shadow_summary(self, days=7):
+        """
+        過去N日間のシャドー検出器ごとの遷移回数を取得（本番 'live' との比較用）
+
+        Returns:
+            dict: {shadow_name: {'STAGE1': 回数, 'STAGE2': 回数, 'RECOVERED': 回数}}
+        """
+        since = (datetime.now() - timedelta(days=days)).isoformat()
+        rows = self._connect().execute(SQL_SHADOW_SUMMARY, (since,)).fetchall()
+
+        summary = {}
+        for shadow_name, event_type, count in rows:
+            summary.setdefault(shadow_name, {'STAGE1': 0, 'STAGE2': 0, 'RECOVERED': 0})[event_type] = count
+
+        return summary
+
+    def get_recent_logs(self, limit=10):
+        """最新のログを取得"""
+        cursor = self._connect().cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute(SQL_RECENT_LOGS, (limit,))
+        return [dict(row) for row in cursor.fetchall()]
 
 
 if __name__ == '__main__':
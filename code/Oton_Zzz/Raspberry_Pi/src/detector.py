@@ -7,8 +7,6 @@ IR Remote Control + Sleep Detection (ir-ctl版)
 import cv2
 import time
 import mediapipe as mp
-import subprocess
-import json
 import os
 import sys
 import re
@@ -16,11 +14,16 @@ import re
 # main.pyのSleepDetectorをインポート
 sys.path.append(os.path.dirname(__file__))
 
+from ir_codec import compile_code, format_scancode
+from ir_codes import IRCodeStore, button_key
+from ir_learn import LearningSession, format_raw
+from lirc import LircReceiver, LircTransmitter
+
 
 class IRController:
-    """赤外線送受信を管理するクラス (ir-ctl版)"""
+    """赤外線送受信を管理するクラス（/dev/lirc0・/dev/lirc1を直接読み書き）"""
 
-    def __init__(self, tx_device='/dev/lirc0', rx_device='/dev/lirc1', config_file='config/ir_codes.json'):
+    def __init__(self, tx_device='/dev/lirc0', rx_device='/dev/lirc1', config_file='config/ir_codes.json', transmitter=None):
         """
         初期化
 
@@ -28,22 +31,18 @@ class IRController:
             tx_device: 送信用LIRCデバイスファイル（デフォルト: /dev/lirc0）
             rx_device: 受信用LIRCデバイスファイル（デフォルト: /dev/lirc1）
             config_file: IR信号を保存するJSONファイル
+            transmitter: 送信に使うオブジェクト（省略時はtx_deviceのLircTransmitter。テスト用にFakeTransmitterなどを渡せる）
         """
         self.tx_device = tx_device
         self.rx_device = rx_device
         self.config_file = config_file
-        self.recorded_codes = {}
-
-        # ir-ctlコマンドの存在確認
-        try:
-            result = subprocess.run(['which', 'ir-ctl'],
-                                  capture_output=True, text=True, check=True)
-            print(f"✓ ir-ctlコマンドが見つかりました: {result.stdout.strip()}")
-        except subprocess.CalledProcessError:
-            raise Exception("ir-ctlコマンドが見つかりません")
+        self.code_store = IRCodeStore(config_file)
+        self.recorded_codes = {}  # "家電名:ボタン名" -> コード
+        self.compiled_codes = {}  # "家電名:ボタン名" -> 送信用にコンパイル済みのPulseTrain
+        self.last_send_latency = None
 
         # デバイスファイルの存在確認
-        if not os.path.exists(self.tx_device):
+        if transmitter is None and not os.path.exists(self.tx_device):
             raise Exception(f"送信デバイス {self.tx_device} が見つかりません。\n"
                           f"/boot/firmware/config.txtで dtoverlay=gpio-ir-tx が設定されているか確認してください。")
 
@@ -56,28 +55,82 @@ class IRController:
 
         print(f"✓ IR送信デバイスを確認しました: {self.tx_device}")
 
+        # 送信デバイスは起動時に1回だけ開き、以降は開きっぱなしにする
+        self.transmitter = transmitter if transmitter is not None else LircTransmitter(self.tx_device)
+        self.transmitter.open()
+
         # 保存されているコードを読み込み
         self.load_codes()
 
     def load_codes(self):
-        """保存済みのIRコードを読み込み"""
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    self.recorded_codes = json.load(f)
-                print(f"✓ 保存済みのIRコードを読み込みました: {list(self.recorded_codes.keys())}")
-            except Exception as e:
-                print(f"✗ IRコードの読み込みに失敗: {e}")
-                self.recorded_codes = {}
-        else:
-            print("✓ 新規のIRコード設定ファイルを作成します")
-            self.recorded_codes = {}
+        """保存済みのIRコードを読み込み（旧形式のファイルは新形式に移行して保存し直す）"""
+        try:
+            if self.code_store.load():
+                print(f"✓ 保存済みのIRコードを読み込みました: {[key for key, _ in self.code_store.items()]}")
+                if self.code_store.migrated:
+                    print("✓ IRコードを家電・ボタンごとの形式に移行しました")
+                    self.save_codes()
+            else:
+                print("✓ 新規のIRコード設定ファイルを作成します")
+        except Exception as e:
+            print(f"✗ IRコードの読み込みに失敗: {e}")
+            self.code_store.appliances = {}
+            self.code_store.macros = {}
+
+        # 送信時に変換しなくて済むよう、読み込み時にパルス列へコンパイルしておく
+        self.recorded_codes = dict(self.code_store.items())
+        self.compiled_codes = {}
+        for key in self.recorded_codes:
+            self._compile(key)
+
+    def has_code(self, name):
+        """
+        ボタンが登録済みかどうか
+
+        Args:
+            name: "家電名:ボタン名"（家電名のみなら電源ボタン）
+
+        Returns:
+            bool: 登録済みかどうか
+        """
+        return button_key(name) in self.recorded_codes
+
+    def _compile(self, key):
+        """
+        登録済みのIRコードを送信用のパルス列にコンパイル
+
+        Args:
+            key: "家電名:ボタン名"
+
+        Returns:
+            bool: 成功したかどうか
+        """
+        try:
+            self.compiled_codes[key] = compile_code(self.recorded_codes[key])
+            return True
+        except Exception as e:
+            self.compiled_codes.pop(key, None)
+            print(f"✗ 【{key}】のIRコードを変換できません: {e}")
+            return False
+
+    def _register(self, name, code_data):
+        """
+        IRコードを登録してコンパイル・保存
+
+        Args:
+            name: "家電名:ボタン名"（家電名のみなら電源ボタン）
+            code_data: コード
+        """
+        key = button_key(name)
+        self.code_store.set(key, code_data)
+        self.recorded_codes[key] = code_data
+        self._compile(key)
+        self.save_codes()
 
     def save_codes(self):
         """IRコードをファイルに保存"""
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.recorded_codes, f, indent=2)
+            self.code_store.save()
             print(f"✓ IRコードを保存しました: {self.config_file}")
         except Exception as e:
             print(f"✗ IRコードの保存に失敗: {e}")
@@ -106,58 +159,39 @@ class IRController:
             print(f"✗ 無効なNECコード: {nec_code}")
             return False
 
-        self.recorded_codes[device_name] = {
+        self._register(device_name, {
             'format': 'nec',
             'scancode': nec_code
-        }
-        self.save_codes()
+        })
         print(f"\n✓ 【{device_name}】のNECコードを登録しました！")
         print(f"  スキャンコード: {nec_code}")
         return True
 
-    def record_ir_signal(self, device_name, num_samples=3, timeout=5):
+    def record_ir_signal(self, device_name, num_samples=3, timeout=5, receiver=None):
         """
-        赤外線信号を記録 (ir-ctl -r を使用)
+        赤外線信号を記録（受信デバイスを開いたまま複数回の押下を受信し、平均化したテンプレートを保存）
         ※受信機が利用できない場合は手動登録を促す
 
         Args:
             device_name: デバイス名（例: "TV"）
             num_samples: 記録する回数（デフォルト: 3回）
-            timeout: タイムアウト時間（秒）
+            timeout: 各回のタイムアウト時間（秒）
+            receiver: 受信に使うLircReceiver（省略時はrx_deviceを開く。テスト用にFakeLircDeviceの受信側などを渡せる）
 
         Returns:
             bool: 成功したかどうか
         """
-        # まず、受信機が使えるか確認
-        if self.rx_device is None:
-            # 受信デバイスがない場合は手動登録モードへ
-            print(f"\n{'='*60}")
-            print(f"⚠️  IR受信機能が利用できません")
-            print(f"{'='*60}")
-            print("このデバイスは送信専用のようです。")
-            print("\n【手動登録モード】")
-            print("M5StickCなどで事前に解析したNECコードを入力してください。")
-            print("例: 0x20DF10EF\n")
-
+        owns_receiver = receiver is None
+        if owns_receiver and self.rx_device is not None:
+            receiver = LircReceiver(self.rx_device)
             try:
-                nec_code = input(f"【{device_name}】のNECコードを入力 (Enterでスキップ): ").strip()
-                if nec_code:
-                    return self.record_ir_signal_manual(device_name, nec_code)
-                else:
-                    print("✗ 登録をスキップしました")
-                    return False
-            except (KeyboardInterrupt, EOFError):
-                print("\n✗ 登録をキャンセルしました")
-                return False
-
-        # 受信デバイスの機能を確認
-        result = subprocess.run(
-            ['ir-ctl', '-d', self.rx_device, '--features'],
-            capture_output=True,
-            text=True
-        )
+                receiver.open()
+            except Exception as e:
+                print(f"⚠️  受信デバイスを開けません: {e}")
+                receiver = None
 
-        if 'Device cannot receive' in result.stdout:
+        if receiver is None:
+            # 受信できない場合は手動登録モードへ
             print(f"\n{'='*60}")
             print(f"⚠️  IR受信機能が利用できません")
             print(f"{'='*60}")
@@ -181,166 +215,159 @@ class IRController:
         print(f"\n{'='*60}")
         print(f"【{device_name}】のリモコン信号を登録します")
         print(f"{'='*60}")
-        print(f"リモコンのボタンを{num_samples}回連続で押してください...")
+        print(f"リモコンのボタンを{num_samples}回押してください（長押しは1回と数えます）")
         print(f"（各回{timeout}秒以内にボタンを押してください）\n")
 
-        recorded_signals = []
-
-        for i in range(num_samples):
-            print(f"[{i+1}/{num_samples}] リモコンボタンを押してください... ", end='', flush=True)
-
-            # IR信号を受信
-            signal = self._capture_ir_signal(timeout)
-
-            if signal is None:
-                print("✗ タイムアウトまたはエラー")
-                return False
-
-            recorded_signals.append(signal)
-            print("✓ 受信成功")
-            time.sleep(1.0)  # 次の入力まで少し待つ
+        session = LearningSession(receiver, num_samples=num_samples, timeout=timeout)
+        try:
+            presses = session.capture(
+                on_press=lambda count: print(f"[{count}/{num_samples}] ✓ 受信成功")
+            )
+        finally:
+            if owns_receiver:
+                receiver.close()
 
-        # NECフォーマットのスキャンコードを抽出
-        nec_code = self._extract_nec_code(recorded_signals[0])
+        if len(presses) < num_samples:
+            print(f"✗ タイムアウトしました（{len(presses)}/{num_samples}回受信）")
+            return False
 
-        if nec_code:
-            self.recorded_codes[device_name] = {
-                'format': 'nec',
-                'scancode': nec_code,
-                'raw_data': recorded_signals[0]
-            }
-            self.save_codes()
+        template = session.build_template(presses)
+        stats = template.stats
+        print(f"\n📊 テンプレート: {template.used}回分の中央値（外れ値 {template.rejected}回を除外）")
+        print(f"  エッジごとのばらつき: 標準偏差 最大 {stats['max_std_us']}µs / 平均 {stats['mean_std_us']}µs"
+              f"（相対 最大 {stats['max_rel_std'] * 100:.1f}%）")
+        if template.rejected:
+            print(f"⚠️  受信した信号の一部が一致しませんでした。受信機の正面から押し直すと精度が上がります")
+
+        decoded = template.decoded
+        if decoded is not None and decoded.scancode is not None:
+            scancode = format_scancode(decoded.protocol, decoded.scancode)
+            self._register(device_name, {
+                'format': decoded.protocol,
+                'scancode': scancode
+            })
             print(f"\n✓ 【{device_name}】のリモコン信号を登録しました！")
-            print(f"  フォーマット: NEC")
-            print(f"  スキャンコード: {nec_code}")
-            return True
+            print(f"  フォーマット: {decoded.protocol}")
+            print(f"  スキャンコード: {scancode}")
         else:
-            # NECコードが取得できない場合は生データを保存
-            print(f"\n⚠️  NECフォーマットではないようです。生データで保存します。")
-            self.recorded_codes[device_name] = {
+            # 復号できない場合は平均化した生データを保存
+            print(f"\n⚠️  対応しているフォーマットではないようです。生データで保存します。")
+            self._register(device_name, {
                 'format': 'raw',
-                'raw_data': recorded_signals[0]
-            }
-            self.save_codes()
-            return True
+                'raw_data': format_raw(template.durations)
+            })
+        return True
 
-    def _capture_ir_signal(self, timeout):
+    def send_ir_signal(self, device_name):
         """
-        ir-ctl -r でIR信号をキャプチャ
+        登録済みのIR信号を送信
 
         Args:
-            timeout: タイムアウト時間（秒）
+            device_name: "家電名:ボタン名"（家電名のみなら電源ボタン）
 
         Returns:
-            str: IR信号データ（生データ）、失敗時はNone
+            bool: 成功したかどうか
         """
+        key = button_key(device_name)
+        if key not in self.recorded_codes:
+            print(f"✗ 【{key}】のIR信号が登録されていません")
+            return False
+
+        train = self.compiled_codes.get(key)
+        if train is None:
+            print(f"✗ 【{key}】のIR信号を送信できる形式に変換できませんでした")
+            return False
+
+        print(f"📡 【{key}】にIR信号を送信中...", end='', flush=True)
+
         try:
-            # ir-ctl -r -d /dev/lirc1 -1
-            # -1: 1つの信号を受信したら終了
-            result = subprocess.run(
-                ['ir-ctl', '-d', self.rx_device, '-r', '-1'],
-                capture_output=True,
-                text=True,
-                timeout=timeout + 2
-            )
+            # コンパイル済みのパルス列をそのまま書き込む（プロセス起動・一時ファイルなし）
+            start_time = time.perf_counter()
+            self.transmitter.send(train.samples, train.carrier, train.duty_cycle)
+            self.last_send_latency = time.perf_counter() - start_time
 
-            if result.returncode == 0 and result.stdout.strip():
-                return result.stdout.strip()
-            else:
-                return None
+            print(f" ✓ 送信完了 ({self.last_send_latency * 1000:.1f}ms)")
+            return True
 
-        except subprocess.TimeoutExpired:
-            return None
         except Exception as e:
-            print(f"エラー: {e}")
-            return None
+            print(f" ✗ エラー: {e}")
+            return False
 
-    def _extract_nec_code(self, raw_data):
+    def plan_macro(self, macro_name, max_duration=3.0):
         """
-        生データからNECフォーマットのスキャンコードを抽出
+        マクロの送信予定を作成（各フレームの後にプロトコルのフレーム周期に合わせた無信号時間を空ける）
 
         Args:
-            raw_data: ir-ctlの出力データ
+            macro_name: マクロ名
+            max_duration: マクロ全体の最大時間（秒）。収まらないステップは送信しない
 
         Returns:
-            str: スキャンコード（例: "0x20df10ef"）、取得できない場合はNone
+            list: (ボタン名, PulseTrain, マクロ開始からの送信開始時刻（秒）) のリスト
         """
-        try:
-            # ir-ctl --features でデコード機能を使う
-            # または、生データを解析してNECコードを抽出
-            # ここでは簡易的に、NEC形式かどうかをチェック
-
-            # NEC形式の特徴: リーダーコード 9000us + 4500us から始まる
-            if 'pulse 9000' in raw_data and 'space 4500' in raw_data:
-                # NECフォーマットとして解析を試みる
-                # ここではプレースホルダーとして0x00を返す
-                # 実際にはビット列を解析する必要がある
-                return "0x00000000"  # 実装を簡略化
-
-            return None
-
-        except Exception as e:
-            print(f"NEC コード抽出エラー: {e}")
-            return None
-
-    def send_ir_signal(self, device_name):
+        plan = []
+        offset = 0.0
+        for key, repeat, delay in self.code_store.macro_steps(macro_name):
+            train = self.compiled_codes.get(key)
+            if train is None:
+                print(f"⚠️  マクロ「{macro_name}」: 【{key}】のIR信号が登録されていないため飛ばします")
+                continue
+
+            offset += delay
+            for _ in range(repeat):
+                frame_end = offset + sum(train.samples) / 1e6
+                if frame_end > max_duration:
+                    print(f"⚠️  マクロ「{macro_name}」: {max_duration}秒に収まらないため【{key}】以降を送信しません")
+                    return plan
+                plan.append((key, train, offset))
+                offset = frame_end + train.gap_us / 1e6
+        return plan
+
+    def send_macro(self, macro_name, max_duration=3.0, on_transmit=None):
         """
-        登録済みのIR信号を送信
+        マクロ（複数ボタンの連続送信）を実行
+        送信デバイスは開いたまま、予定時刻に合わせて順に書き込む
 
         Args:
-            device_name: デバイス名
+            macro_name: マクロ名
+            max_duration: マクロ全体の最大時間（秒）
+            on_transmit: 各フレームの送信前後に呼ばれる関数 on_transmit(ボタン名, 送信開始時刻, 送信完了時刻)
+                         （送信前は送信完了時刻がNone、時刻はtime.monotonic()）
 
         Returns:
-            bool: 成功したかどうか
+            bool: すべてのフレームを送信できたかどうか
         """
-        if device_name not in self.recorded_codes:
-            print(f"✗ 【{device_name}】のIR信号が登録されていません")
+        try:
+            plan = self.plan_macro(macro_name, max_duration)
+        except KeyError:
+            print(f"✗ マクロ「{macro_name}」が登録されていません")
             return False
 
-        print(f"📡 【{device_name}】にIR信号を送信中...", end='', flush=True)
+        print(f"📡 マクロ「{macro_name}」を送信中... ({len(plan)}フレーム)")
+        success = True
+        session_start = time.monotonic()
+        for key, train, offset in plan:
+            wait = session_start + offset - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            start_time = time.monotonic()
+            if on_transmit is not None:
+                on_transmit(key, start_time, None)
+            try:
+                self.transmitter.send(train.samples, train.carrier, train.duty_cycle)
+            except Exception as e:
+                print(f"✗ 【{key}】の送信エラー: {e}")
+                success = False
+            if on_transmit is not None:
+                on_transmit(key, start_time, time.monotonic())
 
-        try:
-            code_data = self.recorded_codes[device_name]
-
-            if code_data.get('format') == 'nec' and 'scancode' in code_data:
-                # NECフォーマットのスキャンコード送信
-                scancode = code_data['scancode']
-                result = subprocess.run(
-                    ['ir-ctl', '-d', self.tx_device, '-S', f'nec:{scancode}'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-            else:
-                # 生データ送信（--send-raw は使用しない、代わりに一時ファイル経由）
-                import tempfile
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-                    f.write(code_data['raw_data'])
-                    temp_file = f.name
-
-                try:
-                    result = subprocess.run(
-                        ['ir-ctl', '-d', self.tx_device, '--send', temp_file],
-                        capture_output=True,
-                        text=True,
-                        timeout=5
-                    )
-                finally:
-                    os.unlink(temp_file)
-
-            if result.returncode == 0:
-                print(" ✓ 送信完了")
-                return True
-            else:
-                print(f" ✗ エラー: {result.stderr}")
-                return False
-
-        except Exception as e:
-            print(f" ✗ エラー: {e}")
-            return False
+        self.last_send_latency = time.monotonic() - session_start
+        print(f"✓ マクロ「{macro_name}」の送信が完了しました ({self.last_send_latency * 1000:.0f}ms)")
+        return success
 
     def cleanup(self):
         """リソースのクリーンアップ"""
+        self.transmitter.close()
         print("✓ IRコントローラーを終了しました")
 
 
@@ -357,7 +384,11 @@ class SleepDetector:
         gauge_increase_rate=1.0,
         gauge_decrease_rate=1.5,
         final_confirmation_time=3.0,
-        model_path='models/face_landmarker_v2_with_blendshapes.task'
+        model_path='models/face_landmarker_v2_with_blendshapes.task',
+        threshold_adapter=None,
+        metrics=None,
+        perclos_threshold=None,
+        perclos_gain=1.0
     ):
         """
         初期化
@@ -369,8 +400,16 @@ class SleepDetector:
             gauge_decrease_rate: ゲージの減少速度（ポイント/秒）
             final_confirmation_time: Stage1検知後、Stage2まで待つ秒数
             model_path: Face Landmarkerモデルのパス
+            threshold_adapter: ThresholdAdapterのインスタンス（閾値のオンライン適応、任意）
+            metrics: DrowsinessMetricsのインスタンス（眠気指標の計算、任意）
+            perclos_threshold: PERCLOSがこの値以上ならゲージ増加を速める（Noneで無効）
+            perclos_gain: PERCLOSが閾値以上の時のゲージ増加速度の倍率
         """
         self.model_path = model_path
+        self.threshold_adapter = threshold_adapter
+        self.metrics = metrics
+        self.PERCLOS_THRESHOLD = perclos_threshold
+        self.PERCLOS_GAIN = perclos_gain
 
         # --- 判定パラメータ ---
         self.BLINK_THRESHOLD = blink_threshold
@@ -386,15 +425,26 @@ class SleepDetector:
 
         # --- MediaPipe結果保存用 ---
         self.latest_result = None
+        self.result_count = 0          # 受信した結果の数
+        self.latest_result_timestamp_ms = None  # 最新の結果の入力フレームのタイムスタンプ（detect_asyncに渡した値）
+        self.latest_result_time = None          # 最新の結果を受信した時刻（time.time()）
+        self._processed_count = 0      # process_resultで処理済みの結果の数
+        self.last_face_detected = False
+        self.last_avg_blink = 0.0
 
     def reset(self):
         """状態をリセット"""
         self.sleep_gauge = 0.0
         self.final_confirmation_start_time = None
         self.last_update_time = time.time()
+        if self.metrics is not None:
+            self.metrics.reset()
 
     def result_callback(self, result: mp.tasks.vision.FaceLandmarkerResult, output_image: mp.Image, timestamp_ms: int):
         self.latest_result = result
+        self.latest_result_timestamp_ms = timestamp_ms
+        self.latest_result_time = time.time()
+        self.result_count += 1
 
     def get_eye_blink_values(self):
         if (self.latest_result is None or not self.latest_result.face_blendshapes):
@@ -414,6 +464,48 @@ class SleepDetector:
             tuple: (gauge_value, is_stage1_sleep, is_stage2_sleep, status)
         """
         current_time = time.time()
+
+        face_detected = bool(self.latest_result is not None and self.latest_result.face_landmarks)
+
+        # 同じ結果を二重に統計へ入れないよう、新しい結果かどうかを判定
+        is_new_result = self.result_count != self._processed_count
+        self._processed_count = self.result_count
+
+        avg_blink = 0.0
+        if face_detected:
+            _, _, avg_blink = self.get_eye_blink_values()
+
+            # 閾値のオンライン適応（新しい結果のみ取り込む）
+            if self.threshold_adapter is not None and is_new_result:
+                self.threshold_adapter.observe(avg_blink)
+                new_threshold = self.threshold_adapter.poll(current_time)
+                if new_threshold is not None:
+                    self.BLINK_THRESHOLD = new_threshold
+
+        # 眠気指標の更新（新しい結果のみ）
+        if self.metrics is not None and is_new_result:
+            self.metrics.update(current_time, face_detected, avg_blink >= self.BLINK_THRESHOLD)
+
+        # シャドー検出器などが同じ入力を再利用できるよう、圧縮した結果を保持
+        self.last_face_detected = face_detected
+        self.last_avg_blink = avg_blink
+
+        return self.update(face_detected, avg_blink, current_time)
+
+    def update(self, face_detected, avg_blink, current_time=None):
+        """
+        圧縮した検出結果（顔の有無・まばたきスコア）からゲージを更新
+
+        Args:
+            face_detected: 顔が検出されたかどうか
+            avg_blink: 左右平均のまばたきスコア
+            current_time: 現在時刻（省略時はtime.time()）
+
+        Returns:
+            tuple: (gauge_value, is_stage1_sleep, is_stage2_sleep, status)
+        """
+        if current_time is None:
+            current_time = time.time()
         delta_time = current_time - self.last_update_time
         self.last_update_time = current_time
 
@@ -421,17 +513,16 @@ class SleepDetector:
         is_stage1_sleep = False
         is_stage2_sleep = False
 
-        face_detected = self.latest_result is not None and self.latest_result.face_landmarks
-
-        eyes_are_closed = False
-        if face_detected:
-            _, _, avg_blink = self.get_eye_blink_values()
-            if avg_blink >= self.BLINK_THRESHOLD:
-                eyes_are_closed = True
+        eyes_are_closed = face_detected and avg_blink >= self.BLINK_THRESHOLD
 
         if face_detected and eyes_are_closed:
             # --- 目が閉じている場合：ゲージを増加 ---
-            self.sleep_gauge += self.GAUGE_INCREASE_RATE * delta_time
+            increase_rate = self.GAUGE_INCREASE_RATE
+            # 直近のPERCLOSが高い（眠そうな状態が続いている）場合は増加を速める
+            if (self.metrics is not None and self.PERCLOS_THRESHOLD is not None
+                    and self.metrics.perclos >= self.PERCLOS_THRESHOLD):
+                increase_rate *= self.PERCLOS_GAIN
+            self.sleep_gauge += increase_rate * delta_time
             status = "Eyes Closed"
         else:
             # --- 目が開いている、または顔が検出されない場合：ゲージを減少 ---
@@ -487,7 +578,7 @@ def main():
         return
 
     # テレビのリモコン信号を登録（既に登録済みでなければ）
-    if "TV" not in ir_controller.recorded_codes:
+    if not ir_controller.has_code("TV"):
         print("\n" + "="*60)
         print("初回起動: リモコン信号の登録が必要です")
         print("="*60)
@@ -499,9 +590,9 @@ def main():
     else:
         print(f"✓ 【TV】のリモコン信号は既に登録済みです")
         # 登録内容を表示
-        tv_data = ir_controller.recorded_codes["TV"]
-        if tv_data.get('format') == 'nec':
-            print(f"  - フォーマット: NEC")
+        tv_data = ir_controller.recorded_codes[button_key("TV")]
+        if 'scancode' in tv_data:
+            print(f"  - フォーマット: {tv_data.get('format')}")
             print(f"  - スキャンコード: {tv_data.get('scancode')}")
         else:
             print(f"  - フォーマット: 生データ")
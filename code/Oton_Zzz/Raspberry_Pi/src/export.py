@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+ログ・テレメトリーの書き出し（エクスポート）モジュール
+データベースのカーソルから一定行数ずつ読み出し、CSV / NDJSON（必要ならgzip圧縮）のバイト列として
+少しずつ返す。ファイルへの保存（tools/db_admin.py export）でもHTTPの応答（/api/export）でも
+テーブルの大きさによらずメモリの使用量は一定
+"""
+
+import csv
+import io
+import json
+import zlib
+
+from archive import ARCHIVE_TABLES, read_archive
+from db import EXPORT_CHUNK_ROWS, EXPORT_TABLES
+
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+def _archived_chunks(archive_dir, table, columns, start, end, chunk_rows):
+    """アーカイブの行を列の並びをそろえてchunk_rows行ずつ返す"""
+    rows = []
+    for row in read_archive(archive_dir, table,
+                            start=start.isoformat() if start is not None else None,
+                            end=end.isoformat() if end is not None else None):
+        rows.append(tuple(row.get(column) for column in columns))
+        if len(rows) >= chunk_rows:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def iter_chunks(db_manager, table, start=None, end=None, archive_dir=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    書き出す行をchunk_rows行ずつ返す（archive_dirを指定するとアーカイブ済みの行を先に返す）
+
+    Args:
+        db_manager: 読み出し元のDatabaseManager
+        table: テーブル名（db.EXPORT_TABLES）
+        start: この時刻以降（datetime、省略時は最初から）
+        end: この時刻より前（datetime、省略時は最後まで）
+        archive_dir: アーカイブのディレクトリ（logs・shadow_eventsのみ。省略時はデータベースの行だけ）
+        chunk_rows: 1回に読み出す行数
+
+    Yields:
+        tuple: (列名のリスト, 行のリスト)
+    """
+    chunks = db_manager.iter_rows(table, start=start, end=end, chunk_rows=chunk_rows)
+    columns, rows = next(chunks)
+
+    # アーカイブは削除済みの古い行なので、データベースの行より前に出す
+    if archive_dir is not None and table in ARCHIVE_TABLES:
+        for archived in _archived_chunks(archive_dir, table, columns, start, end, chunk_rows):
+            yield columns, archived
+
+    yield columns, rows
+    for columns, rows in chunks:
+        yield columns, rows
+
+
+def format_csv(chunks):
+    """(列名, 行) のチャンクをCSVの文字列にして返す（先頭に見出し行）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    for columns, rows in chunks:
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def format_ndjson(chunks):
+    """(列名, 行) のチャンクを1行1オブジェクトのJSONの文字列にして返す"""
+    for columns, rows in chunks:
+        yield ''.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows)
+
+
+def gzip_stream(texts):
+    """文字列を少しずつgzip圧縮して返す（全体をメモリに持たない）"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31でgzip形式
+    for text in texts:
+        data = compressor.compress(text.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(db_manager, table, fmt='csv', start=None, end=None, compress=False, archive_dir=None,
+           chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    テーブルを書き出すバイト列を少しずつ返す
+
+    Args:
+        db_manager: 読み出し元のDatabaseManager
+        table: テーブル名（db.EXPORT_TABLES）
+        fmt: 'csv' または 'ndjson'
+        start: この時刻以降（datetime、省略時は最初から）
+        end: この時刻より前（datetime、省略時は最後まで）
+        compress: gzip圧縮するかどうか
+        archive_dir: アーカイブのディレクトリ（指定するとアーカイブ済みの行も含める）
+        chunk_rows: 1回に読み出す行数
+
+    Yields:
+        bytes: 書き出す内容
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"書き出せないテーブルです: {table}（{' / '.join(EXPORT_TABLES)}）")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"未対応の形式です: {fmt}（{' / '.join(EXPORT_FORMATS)}）")
+
+    chunks = iter_chunks(db_manager, table, start=start, end=end, archive_dir=archive_dir, chunk_rows=chunk_rows)
+    texts = format_csv(chunks) if fmt == 'csv' else format_ndjson(chunks)
+    if compress:
+        yield from gzip_stream(texts)
+    else:
+        for text in texts:
+            yield text.encode('utf-8')
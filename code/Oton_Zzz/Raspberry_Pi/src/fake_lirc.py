@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+LIRCデバイスの代替（ラズパイ以外での動作確認・ベンチマーク用）
+パイプに/dev/lirc*と同じmode2形式のサンプルを書き込み、LircReceiverにそのまま読ませる
+送信側はFakeTransmitterが書き込んだパルス列を受信側に折り返す（自分の送信信号のエコー）
+"""
+
+import array
+import os
+import random
+import threading
+import time
+
+from lirc import (
+    LircReceiver,
+    LIRC_MODE2_PULSE,
+    LIRC_MODE2_SPACE,
+    LIRC_MODE2_TIMEOUT,
+    LIRC_VALUE_MASK
+)
+
+
+class FakeLircDevice:
+    """パイプでmode2サンプルを流す受信デバイスの代替"""
+
+    def __init__(self, timeout_reports=True, rec_timeout_us=20000, realtime=True):
+        """
+        初期化
+
+        Args:
+            timeout_reports: フレーム終了時にカーネルと同様のタイムアウト通知を送るかどうか
+                             （Falseにすると受信側のアイドルタイムアウトで区切ることになる）
+            rec_timeout_us: 最後のパルスからタイムアウト通知までの時間（マイクロ秒）
+            realtime: Trueなら各エッジの時刻に合わせてサンプルを書き込む（Falseなら一度に書き込む）
+        """
+        self.timeout_reports = timeout_reports
+        self.rec_timeout_us = rec_timeout_us
+        self.realtime = realtime
+        self.read_fd, self.write_fd = os.pipe()
+        self._lock = threading.Lock()
+        self._last_end = None
+        self.frames_played = 0
+
+    def receiver(self, **kwargs):
+        """
+        このデバイスを読むLircReceiverを作成
+
+        Args:
+            **kwargs: LircReceiverに渡す引数（frame_gap_us, idle_timeout）
+
+        Returns:
+            LircReceiver: 受信クラス
+        """
+        return LircReceiver(device='fake', fd=self.read_fd, **kwargs)
+
+    def play(self, durations):
+        """
+        パルス/スペース列を受信したことにする（送信し終わるまでブロック）
+
+        Args:
+            durations: パルスから始まるパルス/スペース長（マイクロ秒）の配列
+
+        Returns:
+            float: 最後のサンプルを書き込んだ時刻（realtimeなら最後のパルスが終わった時刻、time.monotonic()）
+        """
+        samples = [
+            (value & LIRC_VALUE_MASK) | (LIRC_MODE2_PULSE if i % 2 == 0 else LIRC_MODE2_SPACE)
+            for i, value in enumerate(durations)
+        ]
+
+        with self._lock:
+            start = time.monotonic()
+
+            # タイムアウト通知がない場合、カーネルは前のフレームからの無信号区間を
+            # 次のパルスの立ち上がりでスペースとして通知する
+            if not self.timeout_reports and self._last_end is not None:
+                gap_us = min(int((start - self._last_end) * 1e6), LIRC_VALUE_MASK)
+                self._write([LIRC_MODE2_SPACE | gap_us])
+
+            if self.realtime:
+                # カーネルは各パルス/スペースを終わった時点で通知するので、その時刻に合わせて書き込む
+                elapsed_us = 0
+                for sample, value in zip(samples, durations):
+                    elapsed_us += value
+                    self._sleep_until(start + elapsed_us / 1e6)
+                    self._write([sample])
+                signal_end = start + elapsed_us / 1e6
+            else:
+                self._write(samples)
+                signal_end = time.monotonic()
+
+            if self.timeout_reports:
+                if self.realtime:
+                    self._sleep_until(signal_end + self.rec_timeout_us / 1e6)
+                self._write([LIRC_MODE2_TIMEOUT | self.rec_timeout_us])
+            self._last_end = signal_end
+            self.frames_played += 1
+
+        return signal_end
+
+    def play_script(self, events):
+        """
+        台本どおりに信号を流す
+
+        Args:
+            events: (前のイベントからの待ち時間（秒）, ラベル, パルス/スペース配列) のリスト
+
+        Returns:
+            list: (ラベル, 最後のパルスが終わった時刻) のリスト
+        """
+        played = []
+        for delay, label, durations in events:
+            time.sleep(delay)
+            played.append((label, self.play(durations)))
+        return played
+
+    def close(self):
+        """パイプを閉じる"""
+        for fd in (self.write_fd, self.read_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _write(self, samples):
+        os.write(self.write_fd, array.array('I', samples).tobytes())
+
+    @staticmethod
+    def _sleep_until(target):
+        remaining = target - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+class FakeTransmitter:
+    """LircTransmitterの代替。送信したパルス列を受信デバイスに折り返す"""
+
+    def __init__(self, device=None):
+        """
+        初期化
+
+        Args:
+            device: 送信信号を折り返すFakeLircDevice（Noneなら記録のみ）
+        """
+        self.device = device
+        self.sent = []
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, samples, carrier=None, duty_cycle=None):
+        """パルス列を送信したことにする（実機と同様に送信し終わるまでブロック）"""
+        self.sent.append((list(samples), carrier, duty_cycle))
+        if self.device is not None:
+            self.device.play(samples)
+        else:
+            time.sleep(sum(samples) / 1e6)
+
+
+def noise_trace(rng=None, min_edges=3, max_edges=15):
+    """
+    どのプロトコルにも一致しないノイズ（照明のちらつきなど）のパルス/スペース列
+
+    Args:
+        rng: random.Random（省略時はモジュールの乱数）
+        min_edges: 最小のパルス数
+        max_edges: 最大のパルス数
+
+    Returns:
+        list: パルス/スペース長（マイクロ秒）
+    """
+    rng = rng or random
+    edges = rng.randint(min_edges, max_edges)
+    durations = []
+    for i in range(2 * edges - 1):
+        durations.append(rng.randint(50, 400) if i % 2 == 0 else rng.randint(200, 8000))
+    return durations
+
+
+def jitter_trace(durations, rng=None, spread=80):
+    """
+    実際の受信機のばらつきを模して各長さを揺らす（パルスは伸び、スペースは縮みがち）
+
+    Args:
+        durations: パルス/スペース長（マイクロ秒）
+        rng: random.Random（省略時はモジュールの乱数）
+        spread: 揺らす幅（マイクロ秒）
+
+    Returns:
+        list: 揺らしたパルス/スペース長
+    """
+    rng = rng or random
+    return [
+        max(1, value + rng.randint(0, spread) if i % 2 == 0 else value - rng.randint(0, spread))
+        for i, value in enumerate(durations)
+    ]
@@ -0,0 +1,617 @@
+#!/usr/bin/env python3
+"""
+IR信号のエンコード/デコードモジュール
+登録済みのIRコード（スキャンコードまたは生データ）をLIRCデバイスにそのまま書き込める
+パルス/スペース配列に変換し、受信したパルス/スペース配列をスキャンコードに復号する
+対応プロトコル: NEC / 拡張NEC / 32ビットNEC / Sony SIRC / RC5 / RC6
+スキャンコードの割り当てはカーネルのrc-coreデコーダ（ir-ctl）と同じ
+"""
+
+import array
+from collections import namedtuple
+
+import numpy as np
+
+
+# 送信用にコンパイルしたパルス列
+# samples: パルスから始まりパルスで終わる長さ（マイクロ秒）のarray('I')
+# carrier: キャリア周波数（Hz）、duty_cycle: デューティ比（%）
+# gap_us: 次のフレームを送るまでに空ける無信号時間（マイクロ秒、プロトコルのフレーム周期から計算）
+PulseTrain = namedtuple('PulseTrain', ['samples', 'carrier', 'duty_cycle', 'gap_us'])
+
+# 復号した1フレーム
+# protocol: プロトコル名（'nec', 'necx', 'nec32', 'sony12', 'rc5', 'rc6_0' など）
+# scancode: スキャンコード（int、NECのリピートフレーム単体ではNone）
+# toggle: トグルビット（RC5/RC6のみ、それ以外は0）
+# is_repeat: 直前と同じボタンの押し続けによるフレームかどうか
+DecodedSignal = namedtuple('DecodedSignal', ['protocol', 'scancode', 'toggle', 'is_repeat'])
+
+DEFAULT_CARRIER = 38000
+DEFAULT_DUTY_CYCLE = 33
+
+# NECのタイミング（カーネルのir-nec-decoderと同じ値）
+NEC_UNIT = 563
+NEC_HEADER_PULSE = 16 * NEC_UNIT
+NEC_HEADER_SPACE = 8 * NEC_UNIT
+NEC_BIT_PULSE = NEC_UNIT
+NEC_BIT_0_SPACE = NEC_UNIT
+NEC_BIT_1_SPACE = 3 * NEC_UNIT
+NEC_TRAILER_PULSE = NEC_UNIT
+NEC_REPEAT_SPACE = 4 * NEC_UNIT
+
+# Sony SIRCのタイミング
+SONY_UNIT = 600
+SONY_HEADER_PULSE = 4 * SONY_UNIT
+SONY_SPACE = SONY_UNIT
+SONY_BIT_0_PULSE = SONY_UNIT
+SONY_BIT_1_PULSE = 2 * SONY_UNIT
+SONY_CARRIER = 40000
+
+# RC5のタイミング（マンチェスター符号、半ビット単位）
+RC5_UNIT = 889
+RC5_NBITS = 14
+RC5_CARRIER = 36000
+
+# RC6のタイミング（マンチェスター符号、半ビット単位。トグルビットのみ2倍幅）
+RC6_UNIT = 444
+RC6_HEADER_PULSE = 6 * RC6_UNIT
+RC6_HEADER_SPACE = 2 * RC6_UNIT
+RC6_CARRIER = 36000
+RC6_MCE_CUSTOMER_MASK = 0xffff0000
+RC6_MCE_CUSTOMER = 0x800f0000
+RC6_MCE_TOGGLE = 0x8000
+
+# これ以上のスペースをフレームの区切りとみなす（マイクロ秒）
+FRAME_GAP = 10000
+
+# 連続送信時のフレーム周期（前のフレームの開始から次のフレームの開始まで、マイクロ秒）
+FRAME_PERIOD = {
+    'nec': 108000, 'necx': 108000, 'nec32': 108000,
+    'sony12': 45000, 'sony15': 45000, 'sony20': 45000,
+    'rc5': 113778,
+    'rc6_0': 106667, 'rc6_6a_20': 106667, 'rc6_6a_24': 106667, 'rc6_6a_32': 106667, 'rc6_mce': 106667
+}
+# 生データ（プロトコル不明）の後に空ける無信号時間（マイクロ秒）
+RAW_FRAME_GAP = 40000
+
+# スキャンコードを文字列で保存する際の桁数
+SCANCODE_DIGITS = {
+    'nec': 4, 'necx': 6, 'nec32': 8,
+    'sony12': 6, 'sony15': 6, 'sony20': 6,
+    'rc5': 4,
+    'rc6_0': 4, 'rc6_6a_20': 5, 'rc6_6a_24': 6, 'rc6_6a_32': 8, 'rc6_mce': 8
+}
+
+
+def parse_raw_text(raw_data):
+    """
+    ir-ctlの受信出力（"+9000 -4500 ..." または "pulse 9000 / space 4500"）を配列に変換
+
+    Args:
+        raw_data: ir-ctl -r の出力文字列
+
+    Returns:
+        list: パルスから始まりパルスで終わる長さ（マイクロ秒）のリスト
+    """
+    durations = []
+    tokens = raw_data.replace('\n', ' ').split()
+    expect_value_for = None
+
+    for token in tokens:
+        if expect_value_for is not None:
+            kind, expect_value_for = expect_value_for, None
+            if kind in ('pulse', 'space') and token.isdigit():
+                _append_duration(durations, kind == 'pulse', int(token))
+            continue
+
+        if token in ('pulse', 'space', 'timeout', 'carrier'):
+            expect_value_for = token
+        elif token[0] in '+-' and token[1:].isdigit():
+            _append_duration(durations, token[0] == '+', int(token[1:]))
+        # それ以外（"#" コメントなど）は無視
+
+    # 末尾はパルスで終わるようにする
+    if len(durations) % 2 == 0 and durations:
+        durations.pop()
+    return durations
+
+
+def _append_duration(durations, is_pulse, value):
+    """パルス/スペースを交互になるように追加（同じ種類が続いたら結合）"""
+    if not durations:
+        if is_pulse:
+            durations.append(value)
+        return
+    last_is_pulse = len(durations) % 2 == 1
+    if last_is_pulse == is_pulse:
+        durations[-1] += value
+    else:
+        durations.append(value)
+
+
+def nec_scancode_to_raw(scancode, protocol='nec'):
+    """
+    NECスキャンコードを送信順の32ビット値に変換（ir-ctl / カーネルと同じ解釈）
+
+    protocolが'nec'の場合はir-ctlと同様に、16ビット以下はNEC、24ビット以下は拡張NEC、
+    それ以上は32ビットNECとして扱う
+
+    Args:
+        scancode: スキャンコード（int）
+        protocol: 'nec', 'necx', 'nec32' のいずれか
+
+    Returns:
+        int: 下位ビットから送信する32ビット値
+    """
+    if protocol == 'nec':
+        protocol = 'nec32' if scancode > 0xffffff else 'necx' if scancode > 0xffff else 'nec'
+
+    data = scancode & 0xff
+    if protocol == 'nec32':
+        addr_inv = (scancode >> 24) & 0xff
+        addr = (scancode >> 16) & 0xff
+        data_inv = (scancode >> 8) & 0xff
+    elif protocol == 'necx':
+        addr = (scancode >> 16) & 0xff
+        addr_inv = (scancode >> 8) & 0xff
+        data_inv = data ^ 0xff
+    else:
+        addr = (scancode >> 8) & 0xff
+        addr_inv = addr ^ 0xff
+        data_inv = data ^ 0xff
+
+    return data_inv << 24 | data << 16 | addr_inv << 8 | addr
+
+
+def encode_nec(scancode, protocol='nec'):
+    """
+    NECスキャンコードをパルス/スペース配列に変換
+
+    Args:
+        scancode: スキャンコード（int）
+        protocol: 'nec', 'necx', 'nec32' のいずれか
+
+    Returns:
+        list: パルス/スペース長（マイクロ秒）のリスト
+    """
+    raw = nec_scancode_to_raw(scancode, protocol)
+    durations = [NEC_HEADER_PULSE, NEC_HEADER_SPACE]
+    for bit in range(32):
+        durations.append(NEC_BIT_PULSE)
+        durations.append(NEC_BIT_1_SPACE if (raw >> bit) & 1 else NEC_BIT_0_SPACE)
+    durations.append(NEC_TRAILER_PULSE)
+    return durations
+
+
+def encode_sony(scancode, protocol='sony12'):
+    """
+    Sony SIRCスキャンコード（device << 16 | subdevice << 8 | function）をパルス/スペース配列に変換
+
+    Args:
+        scancode: スキャンコード（int）
+        protocol: 'sony12', 'sony15', 'sony20' のいずれか
+
+    Returns:
+        list: パルス/スペース長（マイクロ秒）のリスト
+    """
+    if protocol == 'sony12':
+        nbits, raw = 12, (scancode & 0x7f) | ((scancode & 0x1f0000) >> 9)
+    elif protocol == 'sony15':
+        nbits, raw = 15, (scancode & 0x7f) | ((scancode & 0xff0000) >> 9)
+    else:
+        nbits, raw = 20, (scancode & 0x7f) | ((scancode & 0x1f0000) >> 9) | ((scancode & 0xff00) << 4)
+
+    durations = [SONY_HEADER_PULSE]
+    for bit in range(nbits):
+        durations.append(SONY_SPACE)
+        durations.append(SONY_BIT_1_PULSE if (raw >> bit) & 1 else SONY_BIT_0_PULSE)
+    return durations
+
+
+def _manchester_to_durations(halves, unit_widths, unit):
+    """半ビットごとのレベル（1=パルス）と幅を、連続する同レベルを結合したパルス/スペース配列に変換"""
+    durations = []
+    level = None
+    for value, width in zip(halves, unit_widths):
+        if value == level:
+            durations[-1] += width * unit
+        elif value or durations:  # 先頭のスペースは送らない
+            durations.append(width * unit)
+            level = value
+    if level == 0:
+        durations.pop()  # 末尾のスペースは送らない
+    return durations
+
+
+def encode_rc5(scancode, toggle=0):
+    """
+    RC5スキャンコード（system << 8 | command、commandは7ビットでRC5拡張を含む）をパルス/スペース配列に変換
+
+    Args:
+        scancode: スキャンコード（int）
+        toggle: トグルビット
+
+    Returns:
+        list: パルス/スペース長（マイクロ秒）のリスト
+    """
+    command = scancode & 0x7f
+    system = (scancode >> 8) & 0x1f
+    bits = [1, 0 if command & 0x40 else 1, toggle & 1]
+    bits += [(system >> i) & 1 for i in range(4, -1, -1)]
+    bits += [(command >> i) & 1 for i in range(5, -1, -1)]
+
+    # RC5の「1」はスペース→パルス、「0」はパルス→スペース
+    halves = []
+    for bit in bits:
+        halves += [0, 1] if bit else [1, 0]
+    return _manchester_to_durations(halves, [1] * len(halves), RC5_UNIT)
+
+
+def encode_rc6(scancode, protocol='rc6_0', toggle=0):
+    """
+    RC6スキャンコードをパルス/スペース配列に変換
+
+    Args:
+        scancode: スキャンコード（int）
+        protocol: 'rc6_0', 'rc6_6a_20', 'rc6_6a_24', 'rc6_6a_32', 'rc6_mce' のいずれか
+        toggle: トグルビット（rc6_mceではスキャンコードの0x8000ビットとして送る）
+
+    Returns:
+        list: パルス/スペース長（マイクロ秒）のリスト
+    """
+    if protocol == 'rc6_0':
+        mode, nbits = 0, 16
+    else:
+        mode, nbits = 6, {'rc6_6a_20': 20, 'rc6_6a_24': 24}.get(protocol, 32)
+        if protocol == 'rc6_mce':
+            scancode = (scancode & ~RC6_MCE_TOGGLE) | (RC6_MCE_TOGGLE if toggle else 0)
+            toggle = 0
+
+    # スタートビット(1) + モード3ビット + トグルビット（2倍幅） + データ
+    # RC6の「1」はパルス→スペース、「0」はスペース→パルス
+    halves, widths = [], []
+    for bit in [1] + [(mode >> i) & 1 for i in range(2, -1, -1)]:
+        halves += [1, 0] if bit else [0, 1]
+        widths += [1, 1]
+    halves += [1, 0] if toggle else [0, 1]
+    widths += [2, 2]
+    for i in range(nbits - 1, -1, -1):
+        halves += [1, 0] if (scancode >> i) & 1 else [0, 1]
+        widths += [1, 1]
+
+    return [RC6_HEADER_PULSE, RC6_HEADER_SPACE] + _manchester_to_durations(halves, widths, RC6_UNIT)
+
+
+def encode_scancode(protocol, scancode, toggle=0):
+    """
+    スキャンコードをパルス/スペース配列に変換
+
+    Args:
+        protocol: プロトコル名
+        scancode: スキャンコード（int）
+        toggle: トグルビット（RC5/RC6のみ）
+
+    Returns:
+        tuple: (パルス/スペース長のリスト, キャリア周波数)
+    """
+    if protocol in ('nec', 'necx', 'nec32'):
+        return encode_nec(scancode, protocol), DEFAULT_CARRIER
+    if protocol in ('sony12', 'sony15', 'sony20'):
+        return encode_sony(scancode, protocol), SONY_CARRIER
+    if protocol == 'rc5':
+        return encode_rc5(scancode, toggle), RC5_CARRIER
+    if protocol.startswith('rc6_'):
+        return encode_rc6(scancode, protocol, toggle), RC6_CARRIER
+    raise ValueError(f"未対応のプロトコルです: {protocol}")
+
+
+def format_scancode(protocol, scancode):
+    """スキャンコードをプロトコルに応じた桁数の16進文字列に変換（例: "0x04fb08"）"""
+    return f"0x{scancode:0{SCANCODE_DIGITS.get(protocol, 8)}x}"
+
+
+# --- デコード ---
+
+def _near(values, expected, margin):
+    """許容誤差内で一致するか（配列をまとめて判定）"""
+    return np.abs(values - expected) <= margin
+
+
+def _bits_to_int(bits):
+    """下位ビットから順に並んだ0/1配列を整数に変換"""
+    return int.from_bytes(np.packbits(bits.astype(np.uint8), bitorder='little').tobytes(), 'little')
+
+
+def _decode_nec(d):
+    """NEC（拡張NEC・32ビットNEC・リピートフレーム含む）を復号"""
+    if not _near(d[0], NEC_HEADER_PULSE, 2 * NEC_UNIT):
+        return None
+
+    # リピートフレーム: 9000us + 2250us + 563us
+    if len(d) == 3:
+        if _near(d[1], NEC_REPEAT_SPACE, NEC_UNIT // 2) and _near(d[2], NEC_TRAILER_PULSE, NEC_UNIT // 2):
+            return DecodedSignal('nec', None, 0, True)
+        return None
+
+    if len(d) != 67 or not _near(d[1], NEC_HEADER_SPACE, NEC_UNIT):
+        return None
+
+    pulses = d[2::2]
+    spaces = d[3:66:2]
+    if not _near(pulses, NEC_BIT_PULSE, NEC_UNIT // 2).all():
+        return None
+    ones = _near(spaces, NEC_BIT_1_SPACE, NEC_UNIT // 2)
+    if not (ones | _near(spaces, NEC_BIT_0_SPACE, NEC_UNIT // 2)).all():
+        return None
+
+    raw = _bits_to_int(ones)
+    address = raw & 0xff
+    not_address = (raw >> 8) & 0xff
+    command = (raw >> 16) & 0xff
+    not_command = (raw >> 24) & 0xff
+
+    if command ^ not_command != 0xff:
+        return DecodedSignal('nec32', not_address << 24 | address << 16 | not_command << 8 | command, 0, False)
+    if address ^ not_address != 0xff:
+        return DecodedSignal('necx', address << 16 | not_address << 8 | command, 0, False)
+    return DecodedSignal('nec', address << 8 | command, 0, False)
+
+
+def _decode_sony(d):
+    """Sony SIRC（12/15/20ビット）を復号"""
+    nbits = (len(d) - 1) // 2
+    if nbits not in (12, 15, 20) or not _near(d[0], SONY_HEADER_PULSE, SONY_UNIT // 2):
+        return None
+
+    spaces = d[1::2]
+    pulses = d[2::2]
+    if not _near(spaces, SONY_SPACE, SONY_UNIT // 2).all():
+        return None
+    ones = _near(pulses, SONY_BIT_1_PULSE, SONY_UNIT // 2)
+    if not (ones | _near(pulses, SONY_BIT_0_PULSE, SONY_UNIT // 2)).all():
+        return None
+
+    raw = _bits_to_int(ones)
+    function = raw & 0x7f
+    if nbits == 12:
+        device, subdevice = (raw >> 7) & 0x1f, 0
+    elif nbits == 15:
+        device, subdevice = (raw >> 7) & 0xff, 0
+    else:
+        device, subdevice = (raw >> 7) & 0x1f, (raw >> 12) & 0xff
+    return DecodedSignal(f'sony{nbits}', device << 16 | subdevice << 8 | function, 0, False)
+
+
+def _to_halves(d, unit, max_units):
+    """
+    パルス/スペース配列を半ビット単位のレベル列（1=パルス、0=スペース）に展開
+
+    Returns:
+        np.ndarray or None: レベル列（各長さが単位の整数倍に収まらなければNone）
+    """
+    units = np.rint(d / unit).astype(np.int64)
+    if ((units < 1) | (units > max_units)).any() or not _near(d, units * unit, unit * 0.4).all():
+        return None
+    levels = np.arange(len(d)) % 2 == 0
+    return np.repeat(levels.astype(np.int8), units)
+
+
+def _manchester_bits(halves, one):
+    """半ビットのペアをビットに変換（oneは「1」を表すペア、逆順が「0」）"""
+    pairs = halves.reshape(-1, 2)
+    ones = (pairs[:, 0] == one[0]) & (pairs[:, 1] == one[1])
+    zeros = (pairs[:, 0] == one[1]) & (pairs[:, 1] == one[0])
+    if not (ones | zeros).all():
+        return None
+    return ones
+
+
+def _bits_msb_first(bits):
+    """上位ビットから順に並んだ0/1配列を整数に変換"""
+    return _bits_to_int(bits[::-1])
+
+
+def _decode_rc5(d):
+    """RC5（RC5拡張を含む14ビット）を復号"""
+    halves = _to_halves(d, RC5_UNIT, 2)
+    if halves is None:
+        return None
+
+    # 先頭のスタートビット「1」の前半（スペース）と末尾のスペースは受信できないので補う
+    halves = np.concatenate(([0], halves))
+    if len(halves) == 2 * RC5_NBITS - 1:
+        halves = np.concatenate((halves, [0]))
+    if len(halves) != 2 * RC5_NBITS:
+        return None
+
+    bits = _manchester_bits(halves, (0, 1))
+    if bits is None:
+        return None
+
+    value = _bits_msb_first(bits[1:])
+    command = value & 0x3f
+    system = (value >> 6) & 0x1f
+    toggle = (value >> 11) & 1
+    if not (value >> 12) & 1:
+        command += 0x40
+    return DecodedSignal('rc5', system << 8 | command, toggle, False)
+
+
+def _decode_rc6(d):
+    """RC6（モード0とモード6A）を復号"""
+    if len(d) < 3 or not _near(d[0], RC6_HEADER_PULSE, RC6_UNIT) or not _near(d[1], RC6_HEADER_SPACE, RC6_UNIT // 2):
+        return None
+
+    halves = _to_halves(d[2:], RC6_UNIT, 3)
+    if halves is None:
+        return None
+    if len(halves) % 2:
+        halves = np.concatenate((halves, [0]))  # 末尾のスペースを補う
+
+    # スタートビット + モード3ビット（8半ビット）、トグルビット（4半ビット）、データ
+    nbits = (len(halves) - 12) // 2
+    if nbits not in (16, 20, 24, 32):
+        return None
+
+    header = _manchester_bits(halves[:8], (1, 0))
+    data = _manchester_bits(halves[12:], (1, 0))
+    if header is None or data is None or not header[0]:
+        return None
+
+    toggle_halves = tuple(halves[8:12])
+    if toggle_halves == (1, 1, 0, 0):
+        toggle = 1
+    elif toggle_halves == (0, 0, 1, 1):
+        toggle = 0
+    else:
+        return None
+
+    mode = _bits_msb_first(header[1:])
+    scancode = _bits_msb_first(data)
+    if mode == 0 and nbits == 16:
+        return DecodedSignal('rc6_0', scancode, toggle, False)
+    if mode != 6 or nbits == 16:
+        return None
+    if nbits == 32 and scancode & RC6_MCE_CUSTOMER_MASK == RC6_MCE_CUSTOMER:
+        return DecodedSignal('rc6_mce', scancode & ~RC6_MCE_TOGGLE, 1 if scancode & RC6_MCE_TOGGLE else 0, False)
+    return DecodedSignal(f'rc6_6a_{nbits}', scancode, 0, False)
+
+
+# RC6のヘッダー（2664us）・スペース（888/444us）はSonyの許容範囲にも入るため、RC6を先に試す
+# （Sonyのヘッダー直後は600usのスペースなので、RC6のヘッダースペースの範囲には入らない）
+_DECODERS = (_decode_nec, _decode_rc6, _decode_sony, _decode_rc5)
+
+
+def decode_frame(durations):
+    """
+    1フレーム分のパルス/スペース配列を復号
+
+    Args:
+        durations: パルスから始まるパルス/スペース長（マイクロ秒）の配列
+
+    Returns:
+        DecodedSignal or None: 復号結果（どのプロトコルにも一致しなければNone）
+    """
+    d = np.asarray(durations, dtype=np.int64)
+    if len(d) % 2 == 0:
+        d = d[:-1]  # 末尾のスペースは使わない
+    if len(d) < 3:
+        return None
+
+    for decoder in _DECODERS:
+        result = decoder(d)
+        if result is not None:
+            return result
+    return None
+
+
+def split_frames(durations):
+    """
+    キャプチャ全体を長いスペースでフレームごとに分割
+
+    Args:
+        durations: パルスから始まるパルス/スペース長（マイクロ秒）の配列
+
+    Returns:
+        list: フレームごとのnp.ndarray
+    """
+    d = np.asarray(durations, dtype=np.int64)
+    gaps = np.flatnonzero((np.arange(len(d)) % 2 == 1) & (d >= FRAME_GAP))
+    frames = []
+    start = 0
+    for gap in gaps:
+        if gap > start:
+            frames.append(d[start:gap])
+        start = gap + 1
+    if start < len(d):
+        frames.append(d[start:])
+    return frames
+
+
+def decode(durations):
+    """
+    キャプチャ全体（複数フレームを含んでよい）を復号
+
+    NECのリピートフレームは直前のフレームのスキャンコードで補い、
+    直前と同じボタン（トグルビットも同じ）のフレームはis_repeat=Trueにする
+
+    Args:
+        durations: パルスから始まるパルス/スペース長（マイクロ秒）の配列
+
+    Returns:
+        list: フレームごとのDecodedSignal（復号できなかったフレームは含まない）
+    """
+    results = []
+    previous = None
+    for frame in split_frames(durations):
+        result = decode_frame(frame)
+        if result is None:
+            continue
+        if result.scancode is None:
+            # NECのリピートフレーム
+            if previous is None or not previous.protocol.startswith('nec'):
+                continue
+            result = previous._replace(is_repeat=True)
+        elif previous is not None and result[:3] == previous[:3]:
+            result = result._replace(is_repeat=True)
+        results.append(result)
+        previous = result
+    return results
+
+
+def inter_frame_gap(protocol, durations):
+    """
+    次のフレームを送るまでに空ける無信号時間
+
+    Args:
+        protocol: プロトコル名（生データはNone）
+        durations: このフレームのパルス/スペース長
+
+    Returns:
+        int: 無信号時間（マイクロ秒）
+    """
+    period = FRAME_PERIOD.get(protocol)
+    if period is None:
+        return RAW_FRAME_GAP
+    # 受信側でフレームの区切りと分かる長さは必ず空ける
+    return max(FRAME_GAP, period - sum(durations))
+
+
+def compile_code(code_data):
+    """
+    登録済みのIRコードを送信用のパルス列に変換
+
+    Args:
+        code_data: ir_codes.json の1エントリ
+                   （{'format': <プロトコル名>, 'scancode': ...} または {'format': 'raw', 'raw_data': ...}）
+
+    Returns:
+        PulseTrain: 送信用パルス列
+    """
+    protocol = code_data.get('format')
+    carrier = DEFAULT_CARRIER
+    if protocol == 'nec' and 'scancode' in code_data:
+        # 'nec' はir-ctlと同様にスキャンコードの大きさで種類を決める
+        scancode = code_data['scancode']
+        scancode = int(scancode, 16) if isinstance(scancode, str) else scancode
+        protocol = 'nec32' if scancode > 0xffffff else 'necx' if scancode > 0xffff else 'nec'
+    if protocol in SCANCODE_DIGITS and 'scancode' in code_data:
+        scancode = code_data['scancode']
+        if isinstance(scancode, str):
+            scancode = int(scancode, 16)
+        durations, carrier = encode_scancode(protocol, scancode, code_data.get('toggle', 0))
+    elif 'raw_data' in code_data:
+        durations = parse_raw_text(code_data['raw_data'])
+        protocol = None
+    else:
+        raise ValueError(f"送信できないIRコードです: {code_data}")
+
+    if not durations:
+        raise ValueError("IRコードが空です")
+
+    return PulseTrain(
+        array.array('I', durations),
+        code_data.get('carrier', carrier),
+        code_data.get('duty_cycle', DEFAULT_DUTY_CYCLE),
+        inter_frame_gap(protocol, durations)
+    )
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+リモコンコードの保存・索引モジュール
+複数の家電・ボタンのIRコードとマクロ（複数ボタンの連続送信）を config/ir_codes.json に保存し、
+受信したフレームを、登録済みボタンの (プロトコル, スキャンコード) をキーとする辞書で引き、
+ボタン数によらず一定時間で照合する。生データのボタンはフレーム長で候補を絞り、
+各パルス/スペースがテンプレートから許容誤差内に収まるかで照合する
+
+ボタンは "家電名:ボタン名"（例: "TV:power"）で指定する。ボタン名を省略すると電源ボタン（power）
+"""
+
+import json
+import os
+
+import numpy as np
+
+from ir_codec import compile_code, decode_frame
+
+
+CODES_VERSION = 2
+DEFAULT_BUTTON = 'power'
+
+
+# 生データ照合時の許容誤差（テンプレートの長さに対する割合と、短いパルス/スペースでの最小幅（マイクロ秒））
+RAW_TOLERANCE = 0.3
+RAW_MIN_MARGIN = 200
+
+
+def button_key(name, button=None):
+    """
+    ボタン名を "家電名:ボタン名" に正規化
+
+    Args:
+        name: 家電名（例: "TV"）または "家電名:ボタン名"
+        button: ボタン名（nameにボタン名が含まれない場合のみ使用、省略時はpower）
+
+    Returns:
+        str: "家電名:ボタン名"
+    """
+    if ':' in name:
+        return name
+    return f"{name}:{button or DEFAULT_BUTTON}"
+
+
+def split_key(key):
+    """ "家電名:ボタン名" を (家電名, ボタン名) に分割"""
+    appliance, _, button = button_key(key).partition(':')
+    return appliance, button
+
+
+class IRCodeStore:
+    """家電ごとのIRコードとマクロを保存するクラス"""
+
+    def __init__(self, config_file='config/ir_codes.json'):
+        """
+        初期化
+
+        Args:
+            config_file: IRコードを保存するJSONファイル
+        """
+        self.config_file = config_file
+        self.appliances = {}  # 家電名 -> {ボタン名 -> コード}
+        self.macros = {}      # マクロ名 -> [ステップ, ...]
+        self.migrated = False  # 旧形式から読み込んだかどうか
+
+    def load(self):
+        """
+        保存済みのIRコードを読み込み（旧形式 {"TV": {...}} は各家電の電源ボタンとして読み込む）
+
+        Returns:
+            bool: 読み込めたかどうか（ファイルがない場合もFalse）
+        """
+        self.appliances = {}
+        self.macros = {}
+        self.migrated = False
+        if not os.path.exists(self.config_file):
+            return False
+
+        with open(self.config_file, 'r') as f:
+            data = json.load(f)
+
+        if data.get('version') == CODES_VERSION:
+            for appliance, entry in data.get('appliances', {}).items():
+                self.appliances[appliance] = dict(entry.get('buttons', {}))
+            self.macros = dict(data.get('macros', {}))
+        else:
+            # 旧形式: デバイス名 -> コード
+            for appliance, code_data in data.items():
+                self.appliances[appliance] = {DEFAULT_BUTTON: code_data}
+            self.migrated = bool(data)
+        return True
+
+    def save(self):
+        """IRコードをファイルに保存"""
+        data = {
+            'version': CODES_VERSION,
+            'appliances': {
+                appliance: {'buttons': buttons} for appliance, buttons in self.appliances.items()
+            },
+            'macros': self.macros
+        }
+        with open(self.config_file, 'w') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    def get(self, key):
+        """
+        ボタンのコードを取得
+
+        Args:
+            key: "家電名:ボタン名"（ボタン名省略時はpower）
+
+        Returns:
+            dict or None: コード
+        """
+        appliance, button = split_key(key)
+        return self.appliances.get(appliance, {}).get(button)
+
+    def set(self, key, code_data):
+        """ボタンのコードを登録（保存はsave()で行う）"""
+        appliance, button = split_key(key)
+        self.appliances.setdefault(appliance, {})[button] = code_data
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def items(self):
+        """("家電名:ボタン名", コード) を順に返す"""
+        for appliance, buttons in self.appliances.items():
+            for button, code_data in buttons.items():
+                yield f"{appliance}:{button}", code_data
+
+    def macro_steps(self, name):
+        """
+        マクロのステップを正規化して取得
+
+        ステップは "家電名:ボタン名" の文字列、または
+        {"appliance": ..., "button": ..., "repeat": 送信回数, "delay": 送信前に空ける秒数} の辞書
+
+        Args:
+            name: マクロ名
+
+        Returns:
+            list: (ボタン名, 送信回数, 送信前に空ける秒数) のリスト
+
+        Raises:
+            KeyError: マクロが登録されていない場合
+        """
+        steps = []
+        for step in self.macros[name]:
+            if isinstance(step, str):
+                steps.append((button_key(step), 1, 0.0))
+            else:
+                key = button_key(step['appliance'], step.get('button'))
+                steps.append((key, max(1, int(step.get('repeat', 1))), float(step.get('delay', 0.0))))
+        return steps
+
+
+def _trim_raw(durations):
+    """生データをパルスで終わる配列にする（末尾のスペースは照合に使わない）"""
+    d = np.asarray(durations, dtype=np.int64)
+    if len(d) % 2 == 0:
+        d = d[:-1]
+    return d
+
+
+class IRCodeIndex:
+    """登録済みリモコンボタンの索引"""
+
+    def __init__(self, recorded_codes=None, tolerance=RAW_TOLERANCE, min_margin=RAW_MIN_MARGIN):
+        """
+        初期化
+
+        Args:
+            recorded_codes: ボタン名 -> コード の辞書（IRController.recorded_codes）
+            tolerance: 生データ照合時の許容誤差（テンプレートの長さに対する割合）
+            min_margin: 生データ照合時の最小の許容誤差（マイクロ秒）
+        """
+        self.tolerance = tolerance
+        self.min_margin = min_margin
+        self._by_scancode = {}
+        self._by_raw = {}
+        if recorded_codes:
+            self.load(recorded_codes)
+
+    def load(self, recorded_codes):
+        """
+        登録済みのコードから索引を作り直す
+
+        受信側と同じ解釈になるよう、各コードを一度送信用パルス列に変換してから復号したものをキーにする
+
+        Args:
+            recorded_codes: ボタン名 -> コード の辞書
+        """
+        by_scancode = {}
+        raw_by_length = {}
+        for name, code_data in recorded_codes.items():
+            try:
+                samples = compile_code(code_data).samples
+            except Exception as e:
+                print(f"⚠️  【{name}】のIRコードを照合用に変換できません: {e}")
+                continue
+
+            decoded = decode_frame(samples)
+            if decoded is not None and decoded.scancode is not None:
+                by_scancode[(decoded.protocol, decoded.scancode)] = name
+            else:
+                template = _trim_raw(samples)
+                raw_by_length.setdefault(len(template), []).append((name, template))
+
+        # フレーム長ごとに (ボタン名のリスト, テンプレートの行列, 許容誤差の行列) にまとめる
+        by_raw = {}
+        for length, entries in raw_by_length.items():
+            templates = np.array([template for _, template in entries])
+            margins = np.maximum(templates * self.tolerance, self.min_margin)
+            by_raw[length] = ([name for name, _ in entries], templates, margins)
+
+        # 監視スレッドから参照されるので、作り終えてから差し替える
+        self._by_scancode = by_scancode
+        self._by_raw = by_raw
+
+    def __len__(self):
+        """登録済みボタン数"""
+        return len(self._by_scancode) + sum(len(names) for names, _, _ in self._by_raw.values())
+
+    def match(self, durations, decoded=None):
+        """
+        受信したフレームに一致するボタンを探す
+
+        Args:
+            durations: 受信したパルス/スペース長（マイクロ秒）の配列
+            decoded: decode_frame(durations) の結果（計算済みなら渡す）
+
+        Returns:
+            str or None: 一致したボタン名
+        """
+        if decoded is None:
+            decoded = decode_frame(durations)
+        if decoded is not None:
+            if decoded.scancode is None:
+                return None  # NECのリピートフレームはボタンを特定できない
+            return self._by_scancode.get((decoded.protocol, decoded.scancode))
+        return self._match_raw(_trim_raw(durations))
+
+    def _match_raw(self, d):
+        """
+        同じフレーム長の生データのテンプレートと照合
+
+        全てのパルス/スペースが許容誤差内に収まるテンプレートのうち、ずれ（許容誤差に対する割合）の
+        最大値が最も小さいものを選ぶ
+
+        Args:
+            d: 受信したパルス/スペース長（パルスで終わる配列）
+
+        Returns:
+            str or None: 一致したボタン名
+        """
+        candidates = self._by_raw.get(len(d))
+        if candidates is None:
+            return None
+        names, templates, margins = candidates
+        worst = (np.abs(templates - d) / margins).max(axis=1)
+        best = int(np.argmin(worst))
+        if worst[best] > 1.0:
+            return None
+        return names[best]
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+リモコン信号の学習モジュール
+受信デバイスを開いたまま複数回のボタン押下を1つのストリームとして受信し、
+同じ形のフレームをそろえてエッジごとの中央値でテンプレートを作る（外れ値は除外）
+"""
+
+import time
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from ir_codec import decode_frame
+
+
+# 学習結果
+# durations: 中央値で作ったテンプレート（パルス/スペース長、マイクロ秒）
+# decoded: テンプレートを復号した結果（DecodedSignal、復号できなければNone）
+# used / rejected: テンプレートに使ったフレーム数 / 外れ値として除外したフレーム数
+# stats: エッジごとのばらつき（標準偏差の最大・平均（マイクロ秒）、相対標準偏差の最大）
+LearnedTemplate = namedtuple('LearnedTemplate', ['durations', 'decoded', 'used', 'rejected', 'stats'])
+
+
+class LearningSession:
+    """複数回のボタン押下から1つのテンプレートを学習するクラス"""
+
+    def __init__(self, receiver, num_samples=3, timeout=10.0, press_gap=0.3, tolerance=0.25):
+        """
+        初期化
+
+        Args:
+            receiver: 開いているLircReceiver
+            num_samples: 受信するボタン押下の回数
+            timeout: 各回のボタン押下を待つ最大時間（秒）
+            press_gap: これより間隔の短いフレームは同じ押下（長押しのリピート）とみなす（秒）
+            tolerance: 中央値からの相対誤差がこれを超えるエッジを含むフレームは外れ値とする
+        """
+        self.receiver = receiver
+        self.num_samples = num_samples
+        self.timeout = timeout
+        self.press_gap = press_gap
+        self.tolerance = tolerance
+
+    def capture(self, on_press=None):
+        """
+        ボタン押下をnum_samples回受信（押下ごとに最初のフレームだけを使う）
+
+        Args:
+            on_press: 押下を受信するたびに呼ばれる関数 on_press(何回目か)
+
+        Returns:
+            list: 押下ごとのパルス/スペース長のリスト（タイムアウトした場合はそれまでの分）
+        """
+        presses = []
+        last_signal_end = None
+        deadline = time.monotonic() + self.timeout
+
+        while len(presses) < self.num_samples:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            frame = self.receiver.read_frame(timeout=remaining)
+            if frame is None:
+                continue
+
+            signal_end = frame.start_time + sum(frame.durations[1:]) / 1e6
+            same_press = last_signal_end is not None and frame.start_time - last_signal_end < self.press_gap
+            last_signal_end = signal_end
+            if same_press:
+                continue
+
+            presses.append(list(frame.durations))
+            deadline = time.monotonic() + self.timeout
+            if on_press is not None:
+                on_press(len(presses))
+
+        return presses
+
+    def build_template(self, presses):
+        """
+        受信したフレームから外れ値を除いてテンプレートを作る
+
+        Args:
+            presses: 押下ごとのパルス/スペース長のリスト
+
+        Returns:
+            LearnedTemplate or None: 学習結果（使えるフレームがなければNone）
+        """
+        if not presses:
+            return None
+
+        # 復号できるものは最も多いスキャンコードに、できないものは最も多い長さにそろえる
+        keys = []
+        for durations in presses:
+            decoded = decode_frame(durations)
+            if decoded is not None and decoded.scancode is not None:
+                keys.append((decoded.protocol, decoded.scancode))
+            else:
+                keys.append(('raw', len(durations)))
+        best_key, _ = Counter(keys).most_common(1)[0]
+        candidates = [d for d, key in zip(presses, keys) if key == best_key]
+
+        # 同じプロトコルでも末尾の扱いで長さが違うことがあるので、最も多い長さにそろえる
+        length, _ = Counter(len(d) for d in candidates).most_common(1)[0]
+        frames = np.array([d for d in candidates if len(d) == length], dtype=np.float64)
+
+        # エッジごとの中央値から大きく外れるフレームを除外
+        median = np.median(frames, axis=0)
+        deviation = np.abs(frames - median) / np.maximum(median, 1.0)
+        inliers = frames[(deviation <= self.tolerance).all(axis=1)]
+        if len(inliers) == 0:
+            inliers = frames
+        median = np.median(inliers, axis=0)
+
+        std = inliers.std(axis=0) if len(inliers) > 1 else np.zeros(length)
+        stats = {
+            'max_std_us': round(float(std.max()), 1),
+            'mean_std_us': round(float(std.mean()), 1),
+            'max_rel_std': round(float((std / np.maximum(median, 1.0)).max()), 4)
+        }
+
+        template = [int(round(value)) for value in median]
+        return LearnedTemplate(
+            template,
+            decode_frame(template),
+            len(inliers),
+            len(presses) - len(inliers),
+            stats
+        )
+
+
+def format_raw(durations):
+    """パルス/スペース長をir-ctlの生データ形式（"+9000 -4500 ..."）の文字列に変換"""
+    return ' '.join(f"{'+' if i % 2 == 0 else '-'}{value}" for i, value in enumerate(durations))
@@ -2,38 +2,84 @@
 """
 IRリモコン信号監視マネージャー
 常時バックグラウンドでリモコン信号を監視し、テレビ状態を同期
+受信デバイスは起動時に1回だけ開き、ir-ctlのプロセス起動は行わない
+テレビ状態を切り替えるのは登録済みの電源ボタンと一致した信号のみ
 """
 
-import subprocess
 import threading
 import time
-from queue import Queue
+from queue import Queue, Empty
+
+from ir_codec import decode_frame, format_scancode
+from ir_codes import button_key
+from lirc import LircReceiver
 
 
 class IRMonitor:
     """IRリモコン信号を常時監視するクラス"""
 
-    def __init__(self, rx_device='/dev/lirc1', tv_state_manager=None):
+    def __init__(self, rx_device='/dev/lirc1', tv_state_manager=None, debounce_time=0.3, receiver=None,
+                 code_index=None, power_button='TV', echo_window=0.3):
         """
         初期化
 
         Args:
             rx_device: 受信用LIRCデバイス
             tv_state_manager: TVStateManagerのインスタンス
+            debounce_time: 直前のフレームからこの時間（秒）以内のフレームは同じ押下とみなして無視
+            receiver: LircReceiverのインスタンス（省略時はrx_deviceから作成）
+            code_index: IRCodeIndexのインスタンス（省略時はどの信号でもテレビ状態を切り替える）
+            power_button: テレビ状態を切り替えるボタン名（"家電名:ボタン名"、家電名のみなら電源ボタン）
+            echo_window: 自分の送信完了からこの時間（秒）以内に届いた同じ信号はエコーとして無視
         """
         self.rx_device = rx_device
         self.tv_state_manager = tv_state_manager
+        self.debounce_time = debounce_time
+        self.receiver = receiver if receiver is not None else LircReceiver(rx_device)
+        self.code_index = code_index
+        self.power_button = button_key(power_button)
+        self.echo_window = echo_window
         self.is_running = False
         self.is_paused = False  # NEW: 一時停止フラグ
         self.monitor_thread = None
         self.signal_queue = Queue()
 
+        # デバウンス用: 最後に受信したフレームの信号の終わりの時刻
+        self._last_frame_end = None
+
+        # エコー抑制用: (送信したボタン名, 送信開始時刻, 無視する期間の終わり)（time.monotonic()）
+        self._echo = None
+
+        # 計測値
+        self.frames_received = 0
+        self.frames_handled = 0
+        self.frames_debounced = 0
+        self.frames_ignored = 0  # 電源ボタン以外・未登録の信号
+        self.frames_echo = 0     # 自分の送信信号
+        self.events_delivered = 0  # メインループが受け取った状態変更の数
+        self.max_queue_depth = 0
+        self.last_delivery_latency = None  # 状態変更をキューに入れてからメインループが受け取るまで（秒）
+        self.max_delivery_latency = 0.0
+        self._delivery_latency_sum = 0.0
+        self.last_latency = None
+        self.max_latency = 0.0
+        self._latency_sum = 0.0
+        self._started_at = None
+        self._cpu_at_start = None
+        self._cpu_time = 0.0
+
     def start(self):
         """監視を開始"""
         if self.is_running:
             print("⚠️  IR監視は既に実行中です")
             return
 
+        try:
+            self.receiver.open()
+        except Exception as e:
+            print(f"✗ IR受信デバイスを開けませんでした ({self.rx_device}): {e}")
+            return
+
         self.is_running = True
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
@@ -44,6 +90,7 @@ class IRMonitor:
         self.is_running = False
         if self.monitor_thread:
             self.monitor_thread.join(timeout=2)
+        self.receiver.close()
         print("✓ IR監視を停止しました")
 
     def pause(self):
@@ -54,46 +101,105 @@ class IRMonitor:
         """監視を再開"""
         self.is_paused = False
 
+    def suppress_echo(self, button, start_time, end_time=None):
+        """
+        自分の送信信号を無視する期間を設定（IRSenderから送信前後に呼ばれる）
+
+        Args:
+            button: 送信したボタン名
+            start_time: 送信開始時刻（time.monotonic()）
+            end_time: 送信完了時刻（Noneなら送信中として完了まで無視）
+        """
+        until = float('inf') if end_time is None else end_time + self.echo_window
+        self._echo = (button_key(button), start_time, until)
+
+    def _is_echo(self, frame):
+        """受信したフレームが自分の送信信号かどうか（時刻が送信期間内で、同じボタンと一致するもの）"""
+        echo = self._echo
+        if echo is None:
+            return False
+        button, start_time, until = echo
+        if frame.end_time < start_time or frame.start_time > until:
+            return False
+        if self.code_index is None:
+            return True
+        return self.code_index.match(frame.durations) == button
+
     def _monitor_loop(self):
         """バックグラウンドでIR信号を監視するループ"""
         print(f"🔍 IR監視スレッド開始 (デバイス: {self.rx_device})")
 
-        while self.is_running:
-            # 一時停止中はスキップ
-            if self.is_paused:
-                time.sleep(0.1)
-                continue
+        self._started_at = time.monotonic()
+        self._cpu_at_start = time.thread_time()
 
+        while self.is_running:
             try:
-                # IR信号を受信（タイムアウト付き）
-                result = subprocess.run(
-                    ['ir-ctl', '-d', self.rx_device, '-r', '-1'],
-                    capture_output=True,
-                    text=True,
-                    timeout=1.0  # 1秒タイムアウト
-                )
-
-                if result.returncode == 0 and result.stdout.strip():
-                    # IR信号を受信した（一時停止中でない場合のみ処理）
-                    if not self.is_paused:
-                        raw_signal = result.stdout.strip()
-                        self._handle_ir_signal(raw_signal)
-
-            except subprocess.TimeoutExpired:
-                # タイムアウトは正常（信号がない）
-                continue
+                # 信号が届くまでpollで待機（停止要求を確認するため0.2秒ごとに戻る）
+                frame = self.receiver.read_frame(timeout=0.2)
             except Exception as e:
                 # エラーが発生しても監視を継続
+                print(f"⚠️  IR受信エラー: {e}")
                 time.sleep(0.5)
+                continue
+            finally:
+                self._cpu_time = time.thread_time() - self._cpu_at_start
+
+            if frame is None:
+                continue
+
+            self.frames_received += 1
+
+            # 信号の終わり（最初のパルス受信時刻 + 信号長）
+            # フレーム終了の検出時刻はカーネルのタイムアウト通知の有無で変わるので使わない
+            signal_end = frame.start_time + sum(frame.durations[1:]) / 1e6
+
+            # 一時停止中、または自分の送信信号は破棄
+            if self.is_paused or self._is_echo(frame):
+                if not self.is_paused:
+                    self.frames_echo += 1
+                self._last_frame_end = signal_end
+                continue
+
+            # タイムスタンプによるデバウンス（長押しのリピートや連続フレームを無視）
+            previous_end = self._last_frame_end
+            self._last_frame_end = signal_end
+            if previous_end is not None and frame.start_time - previous_end < self.debounce_time:
+                self.frames_debounced += 1
+                continue
+
+            if not self._handle_ir_signal(frame.durations):
+                self.frames_ignored += 1
+                continue
+            self.frames_handled += 1
+
+            # 受信遅延: 信号の終わりから処理完了まで
+            latency = max(0.0, time.monotonic() - signal_end)
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self._latency_sum += latency
 
     def _handle_ir_signal(self, raw_signal):
         """
         受信したIR信号を処理
 
         Args:
-            raw_signal: 生のIR信号データ
+            raw_signal: パルス/スペース長（マイクロ秒）のリスト
+
+        Returns:
+            bool: テレビ状態を切り替えたかどうか
         """
-        print(f"\n📡 リモコン信号を受信しました")
+        decoded = decode_frame(raw_signal)
+
+        # 登録済みボタンと照合し、電源ボタン以外（音量・チャンネルなど）は無視
+        if self.code_index is not None:
+            button = self.code_index.match(raw_signal, decoded)
+            if button != self.power_button:
+                return False
+
+        if decoded is not None and decoded.scancode is not None:
+            print(f"\n📡 リモコン信号を受信しました: {decoded.protocol} {format_scancode(decoded.protocol, decoded.scancode)}")
+        else:
+            print(f"\n📡 リモコン信号を受信しました")
 
         # テレビ状態をトグル
         if self.tv_state_manager:
@@ -101,31 +207,86 @@ class IRMonitor:
             status = "ON" if new_state else "OFF"
             print(f"📺 テレビ状態を切り替えました: {status}")
 
-            # シグナルキューに状態変更を通知
+            # シグナルキューに状態変更を通知（wait_signalで待っているメインループはすぐに起きる）
             self.signal_queue.put({
                 'type': 'tv_toggle',
                 'new_state': new_state,
-                'timestamp': time.time()
+                'protocol': decoded.protocol if decoded else None,
+                'scancode': decoded.scancode if decoded else None,
+                'timestamp': time.time(),
+                'queued_at': time.monotonic()
             })
-
-        # 少し待機（連続押しを防ぐ）
-        time.sleep(0.5)
+            self.max_queue_depth = max(self.max_queue_depth, self.signal_queue.qsize())
+        return True
 
     def has_signal(self):
         """
-        新しいIR信号があるかチェック
+        新しいIR信号があるかチェック（待たずに戻る）
 
         Returns:
             dict or None: 信号情報、なければNone
         """
-        if not self.signal_queue.empty():
-            return self.signal_queue.get()
-        return None
+        try:
+            return self._deliver(self.signal_queue.get_nowait())
+        except Empty:
+            return None
+
+    def wait_signal(self, timeout=None):
+        """
+        新しいIR信号が届くまで待つ（待機中はCPUを使わず、届いた時点ですぐに戻る）
+
+        Args:
+            timeout: 待つ最大時間（秒、Noneなら届くまで待つ）
+
+        Returns:
+            dict or None: 信号情報、タイムアウトした場合はNone
+        """
+        try:
+            return self._deliver(self.signal_queue.get(timeout=timeout))
+        except Empty:
+            return None
+
+    def _deliver(self, signal):
+        """キューから取り出した状態変更の受け渡し遅延を記録"""
+        latency = time.monotonic() - signal['queued_at']
+        self.events_delivered += 1
+        self.last_delivery_latency = latency
+        self.max_delivery_latency = max(self.max_delivery_latency, latency)
+        self._delivery_latency_sum += latency
+        return signal
+
+    def get_metrics(self):
+        """
+        受信の計測値を取得
+
+        Returns:
+            dict: 受信・処理・デバウンス・無視・エコーとして破棄したフレーム数、受信遅延（ミリ秒）、
+                  キューの長さ・メインループへの受け渡し遅延（ミリ秒）、監視スレッドのCPU使用率（%）
+        """
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            'frames_received': self.frames_received,
+            'frames_handled': self.frames_handled,
+            'frames_debounced': self.frames_debounced,
+            'frames_ignored': self.frames_ignored,
+            'frames_echo': self.frames_echo,
+            'overflows': self.receiver.overflow_count,
+            'last_latency_ms': round(self.last_latency * 1000, 2) if self.last_latency is not None else None,
+            'mean_latency_ms': round(self._latency_sum / self.frames_handled * 1000, 2) if self.frames_handled else None,
+            'max_latency_ms': round(self.max_latency * 1000, 2),
+            'queue_depth': self.signal_queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'events_delivered': self.events_delivered,
+            'last_delivery_latency_ms': round(self.last_delivery_latency * 1000, 2) if self.last_delivery_latency is not None else None,
+            'mean_delivery_latency_ms': round(self._delivery_latency_sum / self.events_delivered * 1000, 2) if self.events_delivered else None,
+            'max_delivery_latency_ms': round(self.max_delivery_latency * 1000, 2),
+            'cpu_percent': round(self._cpu_time / elapsed * 100, 3) if elapsed > 0 else 0.0
+        }
 
 
 if __name__ == '__main__':
     """テスト用"""
-    from tv_state_manager import TVStateManager
+    from tv_state import TVStateManager
 
     print("IR監視マネージャーテスト")
     print("リモコンボタンを押してください（Ctrl+Cで終了）\n")
@@ -137,12 +298,11 @@ if __name__ == '__main__':
         monitor.start()
 
         while True:
-            # シグナルをチェック
-            signal = monitor.has_signal()
+            # 状態変更が届くまで待機
+            signal = monitor.wait_signal(timeout=1.0)
             if signal:
                 print(f"✓ 状態変更検出: {signal}")
-
-            time.sleep(0.1)
+                print(f"  計測値: {monitor.get_metrics()}")
 
     except KeyboardInterrupt:
         print("\n終了します...")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+IR送信ワーカー
+送信要求をキューで受け取り、専用スレッドで送信する（メインループはブロックしない）
+送信時刻と送信したボタンをIRMonitorに伝え、自分の送信信号（エコー）だけを無視させる
+"""
+
+import threading
+import time
+from queue import Queue, Empty
+
+
+class IRSender:
+    """IR送信を専用スレッドで行うクラス"""
+
+    def __init__(self, ir_controller, ir_monitor=None):
+        """
+        初期化
+
+        Args:
+            ir_controller: IRControllerのインスタンス（送信はこのワーカースレッドからのみ行う）
+            ir_monitor: IRMonitorのインスタンス（エコー抑制の通知先、任意）
+        """
+        self.ir_controller = ir_controller
+        self.ir_monitor = ir_monitor
+        self.command_queue = Queue()
+        self.worker_thread = None
+        self.is_running = False
+
+        # 計測値
+        self.sent_count = 0
+        self.failed_count = 0
+        self.last_queue_delay = None  # 送信要求から送信開始まで（秒）
+        self.last_send_duration = None  # 送信開始から完了まで（秒）
+
+    def start(self):
+        """ワーカースレッドを開始"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+
+    def stop(self, timeout=3.0):
+        """
+        キューに残った送信要求を処理してからワーカースレッドを停止
+
+        Args:
+            timeout: 停止を待つ最大時間（秒）
+        """
+        if not self.is_running:
+            return
+        self.command_queue.put(None)
+        if self.worker_thread:
+            self.worker_thread.join(timeout=timeout)
+        self.is_running = False
+
+    def send(self, device_name, on_done=None):
+        """
+        送信を要求（すぐに戻る）
+
+        Args:
+            device_name: 送信するデバイス名（例: "TV"）
+            on_done: 送信後にワーカースレッドから呼ばれる関数 on_done(device_name, success)
+        """
+        self.command_queue.put(('send', device_name, on_done, time.monotonic()))
+
+    def send_macro(self, macro_name, max_duration=3.0, on_done=None):
+        """
+        マクロの送信を要求（すぐに戻る）
+
+        Args:
+            macro_name: マクロ名
+            max_duration: マクロ全体の最大時間（秒）
+            on_done: 送信後にワーカースレッドから呼ばれる関数 on_done(macro_name, success)
+        """
+        self.command_queue.put(('macro', (macro_name, max_duration), on_done, time.monotonic()))
+
+    def pending(self):
+        """未処理の送信要求数"""
+        return self.command_queue.qsize()
+
+    def _worker_loop(self):
+        """送信要求を順に処理するループ"""
+        while True:
+            try:
+                command = self.command_queue.get(timeout=1.0)
+            except Empty:
+                continue
+            if command is None:
+                break
+
+            kind, target, on_done, requested_at = command
+            start_time = time.monotonic()
+            self.last_queue_delay = start_time - requested_at
+
+            try:
+                if kind == 'macro':
+                    target, max_duration = target
+                    success = self.ir_controller.send_macro(target, max_duration, on_transmit=self._notify_echo)
+                else:
+                    # 送信中に届いた自分の信号を無視するよう、送信前に通知しておく
+                    self._notify_echo(target, start_time, None)
+                    success = self.ir_controller.send_ir_signal(target)
+                    self._notify_echo(target, start_time, time.monotonic())
+            except Exception as e:
+                print(f"✗ IR送信エラー: {e}")
+                success = False
+
+            self.last_send_duration = time.monotonic() - start_time
+
+            if success:
+                self.sent_count += 1
+            else:
+                self.failed_count += 1
+
+            if on_done is not None:
+                try:
+                    on_done(target, success)
+                except Exception as e:
+                    print(f"✗ IR送信後の処理でエラー: {e}")
+
+    def _notify_echo(self, button, start_time, end_time):
+        """送信したボタンと時刻をIRMonitorに伝える"""
+        if self.ir_monitor is not None:
+            self.ir_monitor.suppress_echo(button, start_time, end_time)
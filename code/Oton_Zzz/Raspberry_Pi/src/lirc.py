@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+LIRCデバイス（/dev/lirc*）の直接アクセスモジュール
+ir-ctlコマンドを起動せずに、カーネルのLIRCインターフェースから
+mode2形式のパルス/スペースを読み込み、パルス形式で書き込む
+"""
+
+import array
+import fcntl
+import math
+import os
+import select
+import struct
+import time
+from collections import deque, namedtuple
+
+
+# --- ioctl番号の計算（linux/lirc.h） ---
+_IOC_WRITE = 1
+_IOC_READ = 2
+_U32_SIZE = 4
+
+
+def _ioc(direction, nr):
+    """u32引数のLIRC ioctl番号（_IOR/_IOW('i', nr, __u32)）"""
+    return (direction << 30) | (_U32_SIZE << 16) | (ord('i') << 8) | nr
+
+
+LIRC_GET_FEATURES = _ioc(_IOC_READ, 0x00)
+LIRC_GET_REC_MODE = _ioc(_IOC_READ, 0x02)
+LIRC_SET_SEND_MODE = _ioc(_IOC_WRITE, 0x11)
+LIRC_SET_REC_MODE = _ioc(_IOC_WRITE, 0x12)
+LIRC_SET_SEND_CARRIER = _ioc(_IOC_WRITE, 0x13)
+LIRC_SET_SEND_DUTY_CYCLE = _ioc(_IOC_WRITE, 0x15)
+LIRC_SET_REC_TIMEOUT = _ioc(_IOC_WRITE, 0x18)
+LIRC_SET_REC_TIMEOUT_REPORTS = _ioc(_IOC_WRITE, 0x19)
+
+# モード
+LIRC_MODE_PULSE = 0x00000002
+LIRC_MODE_MODE2 = 0x00000004
+
+# 機能フラグ
+LIRC_CAN_SEND_PULSE = LIRC_MODE_PULSE
+LIRC_CAN_SET_SEND_CARRIER = 0x00000100
+LIRC_CAN_SET_SEND_DUTY_CYCLE = 0x00000200
+LIRC_CAN_REC_MODE2 = LIRC_MODE_MODE2 << 16
+LIRC_CAN_SET_REC_TIMEOUT = 0x10000000
+
+# mode2サンプルの種類
+LIRC_MODE2_MASK = 0xFF000000
+LIRC_VALUE_MASK = 0x00FFFFFF
+LIRC_MODE2_SPACE = 0x00000000
+LIRC_MODE2_PULSE = 0x01000000
+LIRC_MODE2_FREQUENCY = 0x02000000
+LIRC_MODE2_TIMEOUT = 0x03000000
+LIRC_MODE2_OVERFLOW = 0x04000000
+
+
+# 受信した1フレーム
+# durations: パルスから始まるパルス/スペース長（マイクロ秒）のリスト
+# start_time / end_time: 最初のパルスを読んだ時刻 / フレーム終了を検出した時刻（time.monotonic()）
+IRFrame = namedtuple('IRFrame', ['durations', 'start_time', 'end_time'])
+
+
+def ioctl_get_u32(fd, request):
+    """u32を返すioctl"""
+    buf = array.array('I', [0])
+    fcntl.ioctl(fd, request, buf, True)
+    return buf[0]
+
+
+def ioctl_set_u32(fd, request, value):
+    """u32を渡すioctl"""
+    fcntl.ioctl(fd, request, struct.pack('I', value))
+
+
+class LircReceiver:
+    """LIRC受信デバイスを開きっぱなしにしてフレーム単位で読み込むクラス"""
+
+    def __init__(self, device='/dev/lirc1', frame_gap_us=20000, idle_timeout=0.15, fd=None):
+        """
+        初期化
+
+        Args:
+            device: 受信用LIRCデバイス
+            frame_gap_us: これ以上のスペースをフレームの区切りとみなす（マイクロ秒）
+            idle_timeout: カーネルからタイムアウト通知が来ない場合に、最後のサンプルから
+                          この時間（秒）何も届かなければフレーム終了とみなす
+            fd: 既に開いているファイルディスクリプタ（テスト用。指定時はioctlを行わない）
+        """
+        self.device = device
+        self.frame_gap_us = frame_gap_us
+        self.idle_timeout = idle_timeout
+        self.fd = fd
+        self._owns_fd = fd is None
+
+        self._pending = b''
+        self._current = []
+        self._current_start = None
+        self._last_sample_time = None
+        self._frames = deque()
+
+        self.overflow_count = 0
+
+    def open(self):
+        """デバイスを開いてmode2受信に設定"""
+        if self.fd is not None:
+            return
+
+        self.fd = os.open(self.device, os.O_RDONLY | os.O_NONBLOCK)
+        self._owns_fd = True
+
+        features = ioctl_get_u32(self.fd, LIRC_GET_FEATURES)
+        if not features & LIRC_CAN_REC_MODE2:
+            self.close()
+            raise Exception(f"{self.device} はmode2受信に対応していません")
+
+        ioctl_set_u32(self.fd, LIRC_SET_REC_MODE, LIRC_MODE_MODE2)
+
+        # フレーム終了をカーネルからタイムアウトとして通知してもらう
+        if features & LIRC_CAN_SET_REC_TIMEOUT:
+            try:
+                ioctl_set_u32(self.fd, LIRC_SET_REC_TIMEOUT, self.frame_gap_us)
+                ioctl_set_u32(self.fd, LIRC_SET_REC_TIMEOUT_REPORTS, 1)
+            except OSError:
+                # 古いカーネルではタイムアウト通知が常に有効
+                pass
+
+    def close(self):
+        """デバイスを閉じる"""
+        if self.fd is not None and self._owns_fd:
+            os.close(self.fd)
+        self.fd = None
+
+    def fileno(self):
+        """select/poll用のファイルディスクリプタ"""
+        return self.fd
+
+    def read_frame(self, timeout=None):
+        """
+        1フレームを受信するまで待機
+
+        Args:
+            timeout: 最大待機時間（秒、Noneで無期限）
+
+        Returns:
+            IRFrame or None: 受信したフレーム（タイムアウト時はNone）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        poller = select.poll()
+        poller.register(self.fd, select.POLLIN)
+
+        while not self._frames:
+            now = time.monotonic()
+
+            # 途中のフレームがあれば、一定時間サンプルが途絶えた時点で終了とみなす
+            wait = None if deadline is None else max(0.0, deadline - now)
+            if self._current:
+                gap_deadline = self._last_sample_time + self.idle_timeout
+                if now >= gap_deadline:
+                    self._finish_frame(now)
+                    break
+                wait = gap_deadline - now if wait is None else min(wait, gap_deadline - now)
+
+            # ミリ秒未満を切り捨てると期限直前に空回りするので切り上げる
+            events = poller.poll(None if wait is None else math.ceil(wait * 1000))
+            if events:
+                data = os.read(self.fd, 4096)
+                if not data:
+                    # パイプ（テスト用）の書き込み側が閉じられた
+                    if self._current:
+                        self._finish_frame(time.monotonic())
+                    break
+                self._feed(data, time.monotonic())
+            elif deadline is not None and time.monotonic() >= deadline and not self._current:
+                break
+
+        return self._frames.popleft() if self._frames else None
+
+    def _feed(self, data, now):
+        """読み込んだバイト列をmode2サンプルとして処理"""
+        data = self._pending + data
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        if not usable:
+            return
+
+        samples = array.array('I')
+        samples.frombytes(data[:usable])
+        self._last_sample_time = now
+
+        for sample in samples:
+            kind = sample & LIRC_MODE2_MASK
+            value = sample & LIRC_VALUE_MASK
+
+            if kind == LIRC_MODE2_PULSE:
+                if not self._current:
+                    self._current_start = now
+                    self._current.append(value)
+                elif len(self._current) % 2 == 1:
+                    # パルスが連続した場合は結合
+                    self._current[-1] += value
+                else:
+                    self._current.append(value)
+
+            elif kind == LIRC_MODE2_SPACE:
+                if not self._current:
+                    continue  # フレーム前の無信号区間
+                if value >= self.frame_gap_us:
+                    self._finish_frame(now)
+                elif len(self._current) % 2 == 0:
+                    self._current[-1] += value
+                else:
+                    self._current.append(value)
+
+            elif kind == LIRC_MODE2_TIMEOUT:
+                if self._current:
+                    self._finish_frame(now)
+
+            elif kind == LIRC_MODE2_OVERFLOW:
+                # 受信バッファ溢れ: 途中のフレームは信頼できないので破棄
+                self.overflow_count += 1
+                self._current = []
+
+    def _finish_frame(self, now):
+        """組み立て中のフレームを確定"""
+        durations = self._current
+        # 末尾はパルスで終わるようにする
+        if len(durations) % 2 == 0:
+            durations = durations[:-1]
+        if durations:
+            self._frames.append(IRFrame(durations, self._current_start, now))
+        self._current = []
+        self._current_start = None
+
+
+class LircTransmitter:
+    """LIRC送信デバイスを開きっぱなしにしてパルス列を直接書き込むクラス"""
+
+    def __init__(self, device='/dev/lirc0', fd=None):
+        """
+        初期化
+
+        Args:
+            device: 送信用LIRCデバイス
+            fd: 既に開いているファイルディスクリプタ（テスト用。指定時はioctlを行わない）
+        """
+        self.device = device
+        self.fd = fd
+        self._owns_fd = fd is None
+        self._features = 0
+        self._carrier = None
+        self._duty_cycle = None
+
+    def open(self):
+        """デバイスを開いてパルス送信に設定"""
+        if self.fd is not None:
+            return
+
+        self.fd = os.open(self.device, os.O_WRONLY)
+        self._owns_fd = True
+
+        self._features = ioctl_get_u32(self.fd, LIRC_GET_FEATURES)
+        if not self._features & LIRC_CAN_SEND_PULSE:
+            self.close()
+            raise Exception(f"{self.device} はパルス送信に対応していません")
+
+        ioctl_set_u32(self.fd, LIRC_SET_SEND_MODE, LIRC_MODE_PULSE)
+
+    def close(self):
+        """デバイスを閉じる"""
+        if self.fd is not None and self._owns_fd:
+            os.close(self.fd)
+        self.fd = None
+        self._carrier = None
+        self._duty_cycle = None
+
+    def send(self, samples, carrier=None, duty_cycle=None):
+        """
+        パルス列を送信（ドライバが送信し終えるまでブロックする）
+
+        Args:
+            samples: パルスから始まりパルスで終わる長さ（マイクロ秒）のarray('I')
+            carrier: キャリア周波数（Hz、前回と同じ場合はioctlを省略）
+            duty_cycle: デューティ比（%、前回と同じ場合はioctlを省略）
+        """
+        if self.fd is None:
+            self.open()
+
+        if carrier and carrier != self._carrier and self._features & LIRC_CAN_SET_SEND_CARRIER:
+            ioctl_set_u32(self.fd, LIRC_SET_SEND_CARRIER, carrier)
+            self._carrier = carrier
+        if duty_cycle and duty_cycle != self._duty_cycle and self._features & LIRC_CAN_SET_SEND_DUTY_CYCLE:
+            ioctl_set_u32(self.fd, LIRC_SET_SEND_DUTY_CYCLE, duty_cycle)
+            self._duty_cycle = duty_cycle
+
+        os.write(self.fd, samples.tobytes())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+眠気指標モジュール
+まばたきスコアからスライディングウィンドウでPERCLOS・まばたき頻度・
+平均まばたき時間・最長閉眼時間を逐次計算する（1サンプルあたりO(1)）
+"""
+
+import json
+import os
+import time
+from collections import deque
+
+
+class DrowsinessMetrics:
+    """スライディングウィンドウ方式の眠気指標"""
+
+    def __init__(self, window_seconds=60.0, max_blink_duration=0.5, max_gap=1.0):
+        """
+        初期化
+
+        Args:
+            window_seconds: 指標を計算する時間窓（秒）
+            max_blink_duration: これより短い閉眼を「まばたき」とみなす（秒）
+            max_gap: これより間隔が空いたサンプルは時間に含めない（検出停止中など）
+        """
+        self.window_seconds = window_seconds
+        self.max_blink_duration = max_blink_duration
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        """状態をリセット"""
+        # PERCLOS用: (時刻, 区間長, 閉眼か) のリングバッファと累積値
+        self._samples = deque()
+        self._total_time = 0.0
+        self._closed_time = 0.0
+
+        # まばたき: (終了時刻, 閉眼時間) と累積値
+        self._blinks = deque()
+        self._blink_time_sum = 0.0
+
+        # 最長閉眼: 閉眼時間が単調減少になるよう保持する両端キュー
+        self._closures = deque()
+
+        # エッジ検出用の直前状態
+        self._last_time = None
+        self._last_closed = False
+        self._closure_start = None
+
+    def update(self, current_time, face_detected, eyes_closed):
+        """
+        1サンプルを取り込む
+
+        Args:
+            current_time: サンプルの時刻
+            face_detected: 顔が検出されたかどうか
+            eyes_closed: 目が閉じていると判定されたかどうか
+        """
+        closed = face_detected and eyes_closed
+
+        # 直前サンプルの状態が今回までの区間続いていたとみなす
+        if self._last_time is not None:
+            dt = current_time - self._last_time
+            if 0 < dt <= self.max_gap and face_detected:
+                self._samples.append((current_time, dt, self._last_closed))
+                self._total_time += dt
+                if self._last_closed:
+                    self._closed_time += dt
+            elif dt > self.max_gap:
+                # 長い空白は閉眼の継続とはみなさない
+                self._closure_start = None
+
+        # エッジ検出: 開→閉で閉眼開始、閉→開で閉眼終了
+        if closed and not self._last_closed:
+            self._closure_start = current_time
+        elif not closed and self._last_closed and self._closure_start is not None:
+            if face_detected:
+                self._end_closure(current_time, current_time - self._closure_start)
+            self._closure_start = None
+
+        self._last_time = current_time
+        self._last_closed = closed
+        self._evict(current_time)
+
+    def _end_closure(self, end_time, duration):
+        """閉眼の終了を記録"""
+        if duration <= self.max_blink_duration:
+            self._blinks.append((end_time, duration))
+            self._blink_time_sum += duration
+
+        while self._closures and self._closures[-1][1] <= duration:
+            self._closures.pop()
+        self._closures.append((end_time, duration))
+
+    def _evict(self, current_time):
+        """時間窓から外れたデータを先頭から取り除く"""
+        cutoff = current_time - self.window_seconds
+
+        while self._samples and self._samples[0][0] < cutoff:
+            _, dt, was_closed = self._samples.popleft()
+            self._total_time -= dt
+            if was_closed:
+                self._closed_time -= dt
+
+        while self._blinks and self._blinks[0][0] < cutoff:
+            _, duration = self._blinks.popleft()
+            self._blink_time_sum -= duration
+
+        while self._closures and self._closures[0][0] < cutoff:
+            self._closures.popleft()
+
+    @property
+    def perclos(self):
+        """時間窓内で目を閉じていた時間の割合（0.0-1.0）"""
+        if self._total_time <= 0:
+            return 0.0
+        return max(0.0, min(1.0, self._closed_time / self._total_time))
+
+    def snapshot(self, current_time=None):
+        """
+        現在の指標を取得
+
+        Args:
+            current_time: 現在時刻（省略時は最後のサンプル時刻）
+
+        Returns:
+            dict: perclos, blink_rate（回/分）, mean_blink_duration（秒）, longest_closure（秒）
+        """
+        if current_time is None:
+            current_time = self._last_time if self._last_time is not None else time.time()
+
+        blink_count = len(self._blinks)
+        mean_blink_duration = self._blink_time_sum / blink_count if blink_count else 0.0
+
+        longest_closure = self._closures[0][1] if self._closures else 0.0
+        if self._last_closed and self._closure_start is not None:
+            longest_closure = max(longest_closure, current_time - self._closure_start)
+
+        return {
+            'timestamp': current_time,
+            'window_seconds': self.window_seconds,
+            'perclos': round(self.perclos, 4),
+            'blink_rate': round(blink_count * 60.0 / self.window_seconds, 2),
+            'mean_blink_duration': round(mean_blink_duration, 3),
+            'longest_closure': round(longest_closure, 2)
+        }
+
+
+def write_snapshot(snapshot, path='data/live_metrics.json'):
+    """
+    ダッシュボード用に最新の指標をファイルへ書き出す（書きかけを読まれないよう置き換えで保存）
+
+    Args:
+        snapshot: DrowsinessMetrics.snapshot() の戻り値
+        path: 保存先
+    """
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"✗ 眠気指標の保存エラー: {e}")
+
+
+def read_snapshot(path='data/live_metrics.json', max_age=30.0):
+    """
+    書き出された最新の指標を読み込み
+
+    Args:
+        path: 保存先
+        max_age: これより古い指標は無効とする（秒）
+
+    Returns:
+        dict or None: 指標（ファイルがない・古い場合はNone）
+    """
+    try:
+        with open(path, 'r') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - snapshot.get('timestamp', 0) > max_age:
+        return None
+    return snapshot
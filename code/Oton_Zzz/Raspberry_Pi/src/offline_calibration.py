@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+録画データからのオフラインキャリブレーション
+録画済みの動画クリップやまばたきスコアの記録をまとめて処理し、
+カメラを使わずに推奨閾値を計算する
+"""
+
+import argparse
+import csv
+import gzip
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# srcディレクトリをパスに追加
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from threshold_adapter import compute_recommended_threshold
+
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+DEFAULT_MODEL_PATH = 'models/face_landmarker_v2_with_blendshapes.task'
+
+# まばたきスコアの列名（記録ファイルは blink_score、テレメトリーの書き出しは blink）
+SCORE_COLUMNS = ('blink_score', 'blink')
+
+
+def extract_blink_scores_from_video(video_path, model_path=DEFAULT_MODEL_PATH):
+    """
+    動画ファイルの全フレームからまばたきスコアを抽出
+
+    Args:
+        video_path: 動画ファイルのパス
+        model_path: Face Landmarkerモデルのパス
+
+    Returns:
+        list: 顔が検出されたフレームのまばたきスコア（左右平均）
+    """
+    # MediaPipe/OpenCVは動画を処理するワーカープロセスでのみ読み込む
+    import cv2
+    import mediapipe as mp
+
+    BaseOptions = mp.tasks.BaseOptions
+    FaceLandmarker = mp.tasks.vision.FaceLandmarker
+    FaceLandmarkerOptions = mp.tasks.vision.FaceLandmarkerOptions
+    VisionRunningMode = mp.tasks.vision.RunningMode
+
+    options = FaceLandmarkerOptions(
+        base_options=BaseOptions(model_asset_path=model_path),
+        running_mode=VisionRunningMode.VIDEO,
+        num_faces=1,
+        output_face_blendshapes=True
+    )
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"動画を開けませんでした: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    scores = []
+    frame_index = 0
+
+    try:
+        with FaceLandmarker.create_from_options(options) as landmarker:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                # 録画時と同じく左右反転してから推論
+                frame = cv2.flip(frame, 1)
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+                timestamp_ms = int(frame_index * 1000.0 / fps)
+                frame_index += 1
+
+                result = landmarker.detect_for_video(mp_image, timestamp_ms)
+                if not result.face_blendshapes:
+                    continue
+
+                blendshapes = result.face_blendshapes[0]
+                left_blink = next((s.score for s in blendshapes if s.category_name == 'eyeBlinkLeft'), 0.0)
+                right_blink = next((s.score for s in blendshapes if s.category_name == 'eyeBlinkRight'), 0.0)
+                scores.append((left_blink + right_blink) / 2.0)
+    finally:
+        cap.release()
+
+    return scores
+
+
+def _open_text(path):
+    """テキストファイルを開く（.gzなら展開しながら読む）"""
+    if path.lower().endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def _positive(value):
+    """スコアとして使える値ならfloatで返す（顔未検出の空欄・None・0はNone）"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def _score_reader(fields):
+    """
+    列名からまばたきスコアの取り出し方を決める
+
+    Args:
+        fields: 列名のリスト
+
+    Returns:
+        callable or None: 1行（列の値のリスト）からスコアを返す関数（該当する列がなければNone）
+    """
+    for name in SCORE_COLUMNS:
+        if name in fields:
+            index = fields.index(name)
+            return lambda values: values[index] if len(values) > index else None
+
+    # テレメトリーの1分・1時間の集計は合計と件数から平均を求める
+    if 'blink_sum' in fields and 'blink_samples' in fields:
+        sum_index, count_index = fields.index('blink_sum'), fields.index('blink_samples')
+
+        def mean(values):
+            try:
+                count = float(values[count_index])
+                return float(values[sum_index]) / count if count > 0 else None
+            except (IndexError, ValueError):
+                return None
+        return mean
+    return None
+
+
+def load_blink_scores(score_path):
+    """
+    記録済みのまばたきスコアを読み込み
+
+    CSV・NDJSON（ヘッダー・キーに blink_score 列、またはテレメトリーの blink 列を含む。
+    tools/db_admin.py export の出力をそのまま使える）、1行1値のテキストに対応。末尾が .gz ならgzip圧縮のまま読む
+
+    Args:
+        score_path: スコアファイルのパス
+
+    Returns:
+        list: まばたきスコア（顔未検出・スコア0は除く）
+
+    Raises:
+        ValueError: ヘッダー・キーにまばたきスコアの列がない場合
+    """
+    missing = ValueError(f"まばたきスコアの列が見つかりません: {score_path}"
+                         f"（{' / '.join(SCORE_COLUMNS)} の列が必要です）")
+    scores = []
+    with _open_text(score_path) as f:
+        first = f.readline().strip()
+        if not first:
+            return scores
+
+        if first.startswith('{'):
+            # NDJSON: 1行1オブジェクト
+            row = json.loads(first)
+            fields = list(row)
+            read = _score_reader(fields)
+            if read is None:
+                raise missing
+            rows = [[row.get(name) for name in fields]]
+            rows = itertools.chain(rows, ([json.loads(line).get(name) for name in fields] for line in f if line.strip()))
+        else:
+            fields = [c.strip() for c in next(csv.reader([first]))]
+            read = _score_reader(fields)
+            if read is None:
+                # ヘッダーなし（1行目もデータ）。数値でなければ列名が分からないので推測しない
+                try:
+                    float(fields[0])
+                except ValueError:
+                    raise missing
+                read = lambda values: values[0] if values else None
+                rows = itertools.chain([fields], csv.reader(f))
+            else:
+                rows = csv.reader(f)
+
+        for values in rows:
+            value = _positive(read(values))
+            if value is not None:
+                scores.append(value)
+
+    return scores
+
+
+def _process_clip(task):
+    """
+    1クリップ分の処理（ワーカープロセスで実行）
+
+    Args:
+        task: (ラベル, パス, モデルパス) のタプル
+
+    Returns:
+        dict: クリップごとの処理結果
+    """
+    label, path, model_path = task
+    try:
+        if path.lower().endswith(VIDEO_EXTENSIONS):
+            scores = extract_blink_scores_from_video(path, model_path)
+        else:
+            scores = load_blink_scores(path)
+        return {'label': label, 'path': path, 'scores': scores, 'error': None}
+    except Exception as e:
+        return {'label': label, 'path': path, 'scores': [], 'error': str(e)}
+
+
+def _summarize(scores):
+    """スコア分布の要約統計"""
+    if scores.size == 0:
+        return {'samples': 0, 'mean': None, 'median': None, 'stddev': None}
+    return {
+        'samples': int(scores.size),
+        'mean': round(float(scores.mean()), 4),
+        'median': round(float(np.median(scores)), 4),
+        'stddev': round(float(scores.std()), 4)
+    }
+
+
+def calibrate_from_recordings(open_clips, closed_clips, model_path=DEFAULT_MODEL_PATH,
+                              workers=None, base_params=None):
+    """
+    録画データから推奨設定を計算
+
+    Args:
+        open_clips: 開眼状態（普通に視聴中）の動画・スコアファイルのリスト
+        closed_clips: 閉眼状態の動画・スコアファイルのリスト
+        model_path: Face Landmarkerモデルのパス
+        workers: 並列処理するプロセス数（Noneで自動）
+        base_params: 現在の睡眠検出パラメータ（推奨設定のベース）
+
+    Returns:
+        dict: 分離度・推奨閾値・推奨設定を含むレポート
+    """
+    tasks = [('open', path, model_path) for path in open_clips]
+    tasks += [('closed', path, model_path) for path in closed_clips]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_process_clip, tasks))
+
+    pooled = {'open': [], 'closed': []}
+    clips = []
+    for result in results:
+        pooled[result['label']].extend(result['scores'])
+        clips.append({
+            'label': result['label'],
+            'path': result['path'],
+            'samples': len(result['scores']),
+            'error': result['error']
+        })
+
+    open_scores = np.asarray(pooled['open'], dtype=np.float64)
+    closed_scores = np.asarray(pooled['closed'], dtype=np.float64)
+
+    report = {
+        'clips': clips,
+        'open': _summarize(open_scores),
+        'closed': _summarize(closed_scores),
+        'separation': None,
+        'recommended_threshold': None,
+        'recommended_config': None
+    }
+
+    if open_scores.size == 0 or closed_scores.size == 0:
+        return report
+
+    threshold = round(compute_recommended_threshold(float(open_scores.mean()), float(closed_scores.mean())), 3)
+
+    # 分離度: d'（平均差 / プールした標準偏差）と、推奨閾値での誤判定率
+    pooled_std = np.sqrt((open_scores.var() + closed_scores.var()) / 2.0)
+    d_prime = float((closed_scores.mean() - open_scores.mean()) / pooled_std) if pooled_std > 0 else float('inf')
+    report['separation'] = {
+        'd_prime': round(d_prime, 3),
+        'open_above_threshold': round(float(np.mean(open_scores >= threshold)), 4),
+        'closed_below_threshold': round(float(np.mean(closed_scores < threshold)), 4)
+    }
+    report['recommended_threshold'] = threshold
+
+    recommended_config = dict(base_params or {})
+    recommended_config['blink_threshold'] = threshold
+    recommended_config['calibrated_blink_threshold'] = threshold
+    report['recommended_config'] = {'sleep_detection': recommended_config}
+
+    return report
+
+
+def print_report(report):
+    """レポートを表示"""
+    print("\n" + "="*60)
+    print("オフラインキャリブレーション結果")
+    print("="*60)
+
+    print("\n【クリップ】")
+    for clip in report['clips']:
+        status = f"✗ {clip['error']}" if clip['error'] else f"{clip['samples']}サンプル"
+        print(f"  [{clip['label']}] {clip['path']}: {status}")
+
+    for label, name in (('open', '開眼'), ('closed', '閉眼')):
+        summary = report[label]
+        if summary['samples'] == 0:
+            print(f"\n【{name}】サンプルなし")
+            continue
+        print(f"\n【{name}】{summary['samples']}サンプル  平均={summary['mean']:.3f}  "
+              f"中央値={summary['median']:.3f}  標準偏差={summary['stddev']:.3f}")
+
+    if report['recommended_threshold'] is None:
+        print("\n✗ 開眼・閉眼の両方のサンプルが必要です")
+        return
+
+    separation = report['separation']
+    print(f"\n【分離度】d' = {separation['d_prime']:.2f}")
+    print(f"  閾値以上になる開眼サンプル: {separation['open_above_threshold'] * 100:.1f}%")
+    print(f"  閾値未満になる閉眼サンプル: {separation['closed_below_threshold'] * 100:.1f}%")
+
+    print(f"\n推奨閾値: {report['recommended_threshold']:.3f}")
+    print("推奨設定:")
+    print(json.dumps(report['recommended_config'], indent=2, ensure_ascii=False))
+    print("="*60 + "\n")
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description='録画データからのオフラインキャリブレーション')
+    parser.add_argument('--open', nargs='+', default=[], help='開眼状態の動画またはスコアファイル')
+    parser.add_argument('--closed', nargs='+', default=[], help='閉眼状態の動画またはスコアファイル')
+    parser.add_argument('--workers', type=int, default=None, help='並列処理するプロセス数')
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help='Face Landmarkerモデルのパス')
+    parser.add_argument('--report', default=None, help='レポートを保存するJSONファイル')
+    parser.add_argument('--apply', action='store_true', help='推奨閾値を設定ファイルに反映')
+    args = parser.parse_args()
+
+    if not args.open or not args.closed:
+        parser.error("--open と --closed の両方を指定してください")
+
+    # 相対パスはプロジェクトルートへ移動する前に解決しておく
+    open_clips = [os.path.abspath(path) for path in args.open]
+    closed_clips = [os.path.abspath(path) for path in args.closed]
+    report_path = os.path.abspath(args.report) if args.report else None
+
+    # カレントディレクトリをプロジェクトルートに設定
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(project_root)
+
+    from config import ConfigManager
+    config_mgr = ConfigManager()
+
+    print(f"🎞️  {len(open_clips) + len(closed_clips)}個のクリップを処理しています...")
+    report = calibrate_from_recordings(
+        open_clips,
+        closed_clips,
+        model_path=args.model,
+        workers=args.workers,
+        base_params=config_mgr.get_sleep_detection_params()
+    )
+    print_report(report)
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✓ レポートを保存しました: {report_path}")
+
+    if args.apply and report['recommended_threshold'] is not None:
+        # 閾値のオンライン適応は calibrated_blink_threshold を基準にドリフトを制限する
+        config_mgr.update_sleep_detection_params(blink_threshold=report['recommended_threshold'],
+                                                 calibrated_blink_threshold=report['recommended_threshold'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+シャドー検出器モジュール
+本番の睡眠検出器と同じ入力（顔の有無・まばたきスコア）で別パラメータの検出器を並走させ、
+実際には動作させずに「もしこの設定ならいつStage1/Stage2になったか」を記録する
+"""
+
+import json
+import time
+
+from detector import SleepDetector
+
+
+# シャドーで上書きできるパラメータとSleepDetectorの引数の対応
+PARAM_KEYS = (
+    'blink_threshold',
+    'gauge_max',
+    'gauge_increase_rate',
+    'gauge_decrease_rate',
+    'final_confirmation_time'
+)
+
+LIVE_NAME = 'live'
+
+
+class _StageTracker:
+    """Stage1/Stage2の遷移を検出して記録する"""
+
+    def __init__(self, name):
+        """
+        初期化
+
+        Args:
+            name: 記録に使う検出器名
+        """
+        self.name = name
+        self.in_stage1 = False
+        self.in_stage2 = False
+
+    def reset(self):
+        """遷移状態をリセット"""
+        self.in_stage1 = False
+        self.in_stage2 = False
+
+    def step(self, gauge, is_stage1, is_stage2, db_manager):
+        """前回からの遷移があればデータベースに記録"""
+        if is_stage1 and not self.in_stage1:
+            db_manager.log_shadow_event(self.name, 'STAGE1', gauge=gauge)
+        elif not is_stage1 and self.in_stage1:
+            db_manager.log_shadow_event(self.name, 'RECOVERED', gauge=gauge)
+
+        if is_stage2 and not self.in_stage2:
+            db_manager.log_shadow_event(self.name, 'STAGE2', gauge=gauge)
+
+        self.in_stage1 = is_stage1
+        self.in_stage2 = is_stage2
+
+
+class ShadowEvaluator:
+    """本番と並走するシャドー検出器の管理クラス"""
+
+    def __init__(self, shadow_configs, base_params, db_manager):
+        """
+        初期化
+
+        Args:
+            shadow_configs: シャドー設定のリスト（[{'name': ..., 'sleep_detection': {...}}, ...]）
+            base_params: 本番の睡眠検出パラメータ（シャドー設定で上書きするベース）
+            db_manager: DatabaseManagerのインスタンス
+        """
+        self.db_manager = db_manager
+        self.shadows = []
+        self.live_tracker = _StageTracker(LIVE_NAME)
+
+        for index, shadow_config in enumerate(shadow_configs):
+            name = shadow_config.get('name', f'shadow{index + 1}')
+            params = {key: base_params[key] for key in PARAM_KEYS if key in base_params}
+            params.update({
+                key: value for key, value in shadow_config.get('sleep_detection', {}).items()
+                if key in PARAM_KEYS
+            })
+
+            detector = SleepDetector(**params)
+            self.shadows.append((detector, _StageTracker(name)))
+
+            # 比較時にどの設定だったか分かるよう、起動時に設定を記録
+            db_manager.log_shadow_event(name, 'CONFIG', note=json.dumps(params, ensure_ascii=False))
+            print(f"👥 シャドー検出器「{name}」を開始しました: {params}")
+
+    def __bool__(self):
+        """シャドー検出器が1つ以上あるかどうか"""
+        return bool(self.shadows)
+
+    def step(self, live_detector, live_result, current_time=None):
+        """
+        本番検出器の今回の入力をシャドーに流し、各遷移を記録
+
+        Args:
+            live_detector: 本番のSleepDetector（process_result呼び出し後）
+            live_result: 本番のprocess_resultの戻り値
+            current_time: 現在時刻（省略時はtime.time()）
+        """
+        if current_time is None:
+            current_time = time.time()
+
+        gauge, is_stage1, is_stage2, _ = live_result
+        self.live_tracker.step(gauge, is_stage1, is_stage2, self.db_manager)
+
+        face_detected = live_detector.last_face_detected
+        avg_blink = live_detector.last_avg_blink
+        for detector, tracker in self.shadows:
+            gauge, is_stage1, is_stage2, _ = detector.update(face_detected, avg_blink, current_time)
+            tracker.step(gauge, is_stage1, is_stage2, self.db_manager)
+
+    def reset(self):
+        """全シャドーの状態をリセット（本番検出器のリセットに合わせる）"""
+        self.live_tracker.reset()
+        for detector, tracker in self.shadows:
+            detector.reset()
+            tracker.reset()
+
+    def sync_time(self, current_time=None):
+        """検出を一時停止している間の経過時間をゲージに反映しないよう時刻を揃える"""
+        if current_time is None:
+            current_time = time.time()
+        for detector, _ in self.shadows:
+            detector.last_update_time = current_time
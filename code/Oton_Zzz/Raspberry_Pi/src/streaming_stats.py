@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+ストリーミング統計モジュール
+サンプルを保持せず、定数メモリで分位点などを逐次推定する
+"""
+
+
+class P2Quantile:
+    """
+    P²アルゴリズム（Jain & Chlamtac, 1985）による分位点のストリーミング推定
+
+    5個のマーカーだけを保持し、1サンプルあたりO(1)で更新する。
+    """
+
+    def __init__(self, p):
+        """
+        初期化
+
+        Args:
+            p: 推定する分位点（0.0-1.0、例: 0.5で中央値）
+        """
+        if not 0.0 < p < 1.0:
+            raise ValueError(f"分位点は0と1の間で指定してください: {p}")
+
+        self.p = p
+        self.count = 0
+
+        # マーカーの高さ・位置・理想位置・理想位置の増分
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1.0, 1.0 + 2.0 * p, 1.0 + 4.0 * p, 3.0 + 2.0 * p, 5.0]
+        self._increments = [0.0, p / 2.0, p, (1.0 + p) / 2.0, 1.0]
+
+    def add(self, x):
+        """
+        サンプルを1つ追加
+
+        Args:
+            x: 観測値
+        """
+        self.count += 1
+
+        # 最初の5サンプルはそのまま保持
+        if self.count <= 5:
+            self._heights.append(x)
+            if self.count == 5:
+                self._heights.sort()
+            return
+
+        q = self._heights
+        n = self._positions
+
+        # xが入るセルを探してマーカー位置を更新
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = max(q[4], x)
+            k = 3
+        else:
+            k = 0
+            while k < 3 and x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # 中間マーカーの高さを調整
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = self._linear(i, step)
+                q[i] = candidate
+                n[i] += step
+
+    def _parabolic(self, i, d):
+        """区分放物線（P²）補間"""
+        q = self._heights
+        n = self._positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i, d):
+        """線形補間（放物線補間が単調性を壊す場合）"""
+        q = self._heights
+        n = self._positions
+        return q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+
+    def value(self):
+        """
+        現在の推定値を取得
+
+        Returns:
+            float or None: 分位点の推定値（サンプルがなければNone）
+        """
+        if self.count == 0:
+            return None
+        if self.count < 5:
+            ordered = sorted(self._heights)
+            index = min(int(round(self.p * (len(ordered) - 1))), len(ordered) - 1)
+            return ordered[index]
+        return self._heights[2]
+
+
+class RunningStats:
+    """Welford法による平均・分散の逐次計算"""
+
+    def __init__(self):
+        """初期化"""
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, x):
+        """
+        サンプルを1つ追加
+
+        Args:
+            x: 観測値
+        """
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    def variance(self):
+        """
+        不偏分散を取得
+
+        Returns:
+            float: 分散（サンプルが2未満なら0.0）
+        """
+        if self.count < 2:
+            return 0.0
+        return self._m2 / (self.count - 1)
+
+    def stddev(self):
+        """標準偏差を取得"""
+        return self.variance() ** 0.5
+
+    def ci_half_width(self, z=1.96):
+        """
+        平均の信頼区間の半幅を取得
+
+        Args:
+            z: 信頼係数（1.96で95%）
+
+        Returns:
+            float: 半幅（サンプルが2未満なら無限大）
+        """
+        if self.count < 2:
+            return float('inf')
+        return z * self.stddev() / (self.count ** 0.5)
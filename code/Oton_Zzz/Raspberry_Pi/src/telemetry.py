@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+テレメトリー（動作中の連続値）の記録モジュール
+フレームごとのゲージ・まばたきスコア・推論時間などをメモリ上で1秒ごとにまとめ、
+1秒に1行だけDatabaseManagerのバックグラウンド書き込みに渡す（映像処理のループではDBに触れない）
+1分・1時間の集計はデータベース側のトリガーで挿入ごとに更新される
+"""
+
+
+class TelemetrySampler:
+    """フレームごとの値を1秒ごとのサンプルにまとめてデータベースへ送るクラス"""
+
+    def __init__(self, db_manager, retention_days=None, prune_interval=3600.0):
+        """
+        初期化
+
+        Args:
+            db_manager: 書き込み先のDatabaseManager（start_writer()で開始済みであること）
+            retention_days: 階層ごとの保存期間（日） {'1s': 7, '1m': 90, '1h': 730}（Noneで既定値）
+            prune_interval: 保存期間を過ぎたサンプルを削除する間隔（秒）
+        """
+        self.db_manager = db_manager
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self.last_prune = 0.0
+        self.samples_written = 0
+        self._clear(None)
+
+    def _clear(self, second):
+        """集計中の1秒を新しくする"""
+        self._second = second
+        self._frames = 0
+        self._faces = 0
+        self._gauge_sum = 0.0
+        self._blink_sum = 0.0
+        self._perclos_sum = 0.0
+        self._inference_sum = 0.0
+        self._inference_count = 0
+
+    def record(self, current_time, gauge, face_detected, blink, perclos, inference_ms=None):
+        """
+        1フレーム分の値を記録（秒が変わったら前の1秒を書き込み要求する）
+
+        Args:
+            current_time: フレームの時刻（time.time()）
+            gauge: 睡眠ゲージの値
+            face_detected: 顔を検出したかどうか
+            blink: 左右平均のまばたきスコア（顔がなければ無視）
+            perclos: 現在のPERCLOS（0.0-1.0）
+            inference_ms: このフレームで届いた検出結果の推論時間（ミリ秒、届いていなければNone）
+        """
+        second = int(current_time)
+        if second != self._second:
+            self.flush()
+            self._clear(second)
+
+        self._frames += 1
+        self._gauge_sum += gauge
+        self._perclos_sum += perclos
+        if face_detected:
+            self._faces += 1
+            self._blink_sum += blink
+        if inference_ms is not None:
+            self._inference_sum += inference_ms
+            self._inference_count += 1
+
+        if current_time - self.last_prune >= self.prune_interval:
+            self.db_manager.prune_telemetry(self.retention_days)
+            self.last_prune = current_time
+
+    def flush(self):
+        """集計中の1秒を書き込み要求する（終了時にも呼ぶ）"""
+        if self._second is None or self._frames == 0:
+            return
+        frames = self._frames
+        self.db_manager.log_telemetry(
+            self._second,
+            gauge=self._gauge_sum / frames,
+            blink=self._blink_sum / self._faces if self._faces else None,
+            face_ratio=self._faces / frames,
+            fps=frames,
+            inference_ms=self._inference_sum / self._inference_count if self._inference_count else None,
+            perclos=self._perclos_sum / frames
+        )
+        self.samples_written += 1
+        self._clear(None)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+まばたき閾値のオンライン適応モジュール
+通常動作中のまばたきスコアから開眼・閉眼の分布を逐次推定し、
+照明の変化などで古くなった閾値を少しずつ追従させる
+"""
+
+import time
+
+from streaming_stats import P2Quantile
+
+
+# 閾値の許容範囲（キャリブレーションと共通）
+MIN_THRESHOLD = 0.3
+MAX_THRESHOLD = 0.7
+
+
+def compute_recommended_threshold(open_level, closed_level):
+    """
+    開眼時・閉眼時のスコアから推奨閾値を計算
+
+    Args:
+        open_level: 開眼時の代表スコア（平均または中央値）
+        closed_level: 閉眼時の代表スコア（平均または中央値）
+
+    Returns:
+        float: 推奨閾値
+    """
+    # 開いている時と閉じている時の中間値
+    threshold = (open_level + closed_level) / 2.0
+
+    # 安全マージンを加える（中間値の80%）
+    threshold *= 0.8
+
+    # 推奨範囲内に収める
+    return max(MIN_THRESHOLD, min(MAX_THRESHOLD, threshold))
+
+
+class ThresholdAdapter:
+    """ストリーミング分位点推定による閾値の自動調整"""
+
+    def __init__(
+        self,
+        initial_threshold,
+        base_threshold=None,
+        config_mgr=None,
+        mode='propose',
+        margin=0.05,
+        max_step=0.02,
+        max_drift=0.15,
+        min_change=0.005,
+        min_samples=300,
+        update_interval=60.0,
+        persist_interval=600.0
+    ):
+        """
+        初期化
+
+        Args:
+            initial_threshold: 起動時の閾値（前回までに自動調整された値のこともある）
+            base_threshold: ドリフト上限の基準値（キャリブレーションで決めた値。Noneならinitial_threshold）
+                            自動調整の結果では置き換えないので、再起動をまたいでも基準から離れすぎない
+            config_mgr: ConfigManagerのインスタンス（Noneなら保存しない）
+            mode: 'apply'なら閾値を実際に更新、'propose'なら提案値の記録のみ
+            margin: 閾値付近の曖昧なサンプルを除外する幅
+            max_step: 1回の更新で動かせる最大幅
+            max_drift: 基準値から離れてよい最大幅
+            min_change: これより小さい変化は無視する（推定値の揺らぎによる微小な更新を防ぐ）
+            min_samples: 更新に必要な開眼・閉眼それぞれの最小サンプル数
+            update_interval: 提案値を再計算する間隔（秒）
+            persist_interval: 設定ファイルへ保存する最小間隔（秒）
+        """
+        self.mode = mode
+        self.margin = margin
+        self.max_step = max_step
+        self.max_drift = max_drift
+        self.min_change = min_change
+        self.min_samples = min_samples
+        self.update_interval = update_interval
+        self.persist_interval = persist_interval
+        self.config_mgr = config_mgr
+
+        self.base_threshold = initial_threshold if base_threshold is None else base_threshold
+        self.threshold = initial_threshold
+        self.proposed_threshold = None
+
+        # 開眼・閉眼スコアの中央値推定器（定数メモリ）
+        self.open_median = P2Quantile(0.5)
+        self.closed_median = P2Quantile(0.5)
+
+        now = time.time()
+        self.last_update_time = now
+        self.last_persist_time = now
+        self._persisted_value = initial_threshold
+
+    def observe(self, blink_score):
+        """
+        まばたきスコアを1サンプル取り込む
+
+        Args:
+            blink_score: 左右平均のまばたきスコア
+        """
+        if blink_score < self.threshold - self.margin:
+            self.open_median.add(blink_score)
+        elif blink_score >= self.threshold + self.margin:
+            self.closed_median.add(blink_score)
+
+    def poll(self, current_time=None):
+        """
+        更新間隔ごとに閾値を再計算
+
+        Args:
+            current_time: 現在時刻（省略時はtime.time()）
+
+        Returns:
+            float or None: applyモードで閾値が変わった場合は新しい閾値、それ以外はNone
+        """
+        if current_time is None:
+            current_time = time.time()
+
+        if current_time - self.last_update_time < self.update_interval:
+            return None
+        self.last_update_time = current_time
+
+        # 前回までの更新結果を一定間隔で保存
+        if current_time - self.last_persist_time >= self.persist_interval:
+            self.persist(current_time)
+
+        if (self.open_median.count < self.min_samples
+                or self.closed_median.count < self.min_samples):
+            return None
+
+        target = compute_recommended_threshold(self.open_median.value(), self.closed_median.value())
+
+        # 1回あたりの変化量と基準値からのドリフトを制限
+        # （proposeモードでは前回の提案値から段階的に追従させる）
+        reference = self.proposed_threshold if self.proposed_threshold is not None else self.threshold
+        if abs(target - reference) < self.min_change:
+            return None
+        step = max(-self.max_step, min(self.max_step, target - reference))
+        candidate = reference + step
+        lower = max(MIN_THRESHOLD, self.base_threshold - self.max_drift)
+        upper = min(MAX_THRESHOLD, self.base_threshold + self.max_drift)
+        candidate = round(max(lower, min(upper, candidate)), 3)
+        self.proposed_threshold = candidate
+
+        changed = None
+        if self.mode == 'apply' and candidate != self.threshold:
+            print(f"🎚️  まばたき閾値を自動調整: {self.threshold:.3f} → {candidate:.3f}")
+            self.threshold = candidate
+            changed = candidate
+
+        return changed
+
+    def persist(self, current_time=None):
+        """
+        現在の閾値（または提案値）を設定ファイルに保存
+
+        Args:
+            current_time: 現在時刻（省略時はtime.time()）
+        """
+        if current_time is None:
+            current_time = time.time()
+        self.last_persist_time = current_time
+
+        if self.config_mgr is None:
+            return
+
+        if self.mode == 'apply':
+            if self.threshold != self._persisted_value:
+                self.config_mgr.update_sleep_detection_params(blink_threshold=self.threshold)
+                self._persisted_value = self.threshold
+        elif self.proposed_threshold is not None and self.proposed_threshold != self._persisted_value:
+            self.config_mgr.update_sleep_detection_params(proposed_blink_threshold=self.proposed_threshold)
+            self._persisted_value = self.proposed_threshold
+
+    def get_status(self):
+        """
+        推定状況を取得
+
+        Returns:
+            dict: 現在の閾値・提案値・各分布の推定値とサンプル数
+        """
+        return {
+            'mode': self.mode,
+            'threshold': self.threshold,
+            'proposed_threshold': self.proposed_threshold,
+            'open_median': self.open_median.value(),
+            'closed_median': self.closed_median.value(),
+            'open_samples': self.open_median.count,
+            'closed_samples': self.closed_median.count
+        }
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+テレビ操作モジュール
+睡眠検出の結果（OFF / ALERT / AWAKE）をテレビ側に伝える方法を切り替えられるようにする
+- lirc:   ラズベリーパイのIR LED（/dev/lirc0）から直接送信
+- serial: M5StickC（m5stick/）にシリアルでコマンドを送り、M5StickC側のIR LEDから送信
+
+どの方法でもコマンドは専用スレッドで順に実行し、完了の応答（ack）を待ってタイムアウトを判定、
+コマンドごとの遅延を記録する
+"""
+
+import threading
+import time
+from collections import namedtuple
+from queue import Queue, Empty
+
+# シリアル通信を試みる（serialバックエンドのみ使用）
+try:
+    import serial
+    SERIAL_AVAILABLE = True
+except ImportError:
+    SERIAL_AVAILABLE = False
+
+
+COMMANDS = ('OFF', 'ALERT', 'AWAKE')
+
+# コマンドの実行結果
+# latency: 実行開始から完了の応答までの時間（秒）、queue_delay: 要求から実行開始までの時間（秒）
+CommandResult = namedtuple('CommandResult', ['command', 'success', 'timed_out', 'latency', 'queue_delay', 'detail'])
+
+
+class TVActuator:
+    """テレビ操作の共通クラス（バックエンドは_executeを実装する）"""
+
+    name = 'base'
+
+    def __init__(self, ack_timeout=3.0):
+        """
+        初期化
+
+        Args:
+            ack_timeout: コマンドの完了を待つ最大時間（秒）
+        """
+        self.ack_timeout = ack_timeout
+        self.command_queue = Queue()
+        self.worker_thread = None
+        self.is_running = False
+        self.last_result = None
+        self._stats = {
+            command: {'count': 0, 'failed': 0, 'timeouts': 0, 'latency_sum': 0.0, 'max_latency': 0.0, 'last_latency': None}
+            for command in COMMANDS
+        }
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        """デバイスを開いてワーカースレッドを開始"""
+        if self.is_running:
+            return
+        self.open()
+        self.is_running = True
+        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.worker_thread.start()
+
+    def stop(self, timeout=3.0):
+        """
+        キューに残ったコマンドを実行してからワーカースレッドを停止
+
+        Args:
+            timeout: 停止を待つ最大時間（秒）
+        """
+        if not self.is_running:
+            return
+        self.command_queue.put(None)
+        if self.worker_thread:
+            self.worker_thread.join(timeout=timeout)
+        self.is_running = False
+        self.close()
+
+    def power_off(self, on_done=None):
+        """テレビの電源を切る（Stage2）"""
+        self._submit('OFF', on_done)
+
+    def alert(self, on_done=None):
+        """眠気の警告を伝える（Stage1）"""
+        self._submit('ALERT', on_done)
+
+    def awake(self, on_done=None):
+        """警告の解除を伝える"""
+        self._submit('AWAKE', on_done)
+
+    def pending(self):
+        """未実行のコマンド数"""
+        return self.command_queue.qsize()
+
+    def open(self):
+        """デバイスを開く（必要なバックエンドのみ実装）"""
+
+    def close(self):
+        """デバイスを閉じる（必要なバックエンドのみ実装）"""
+
+    def _execute(self, command, timeout):
+        """
+        コマンドを実行して完了の応答を待つ（ワーカースレッドから呼ばれる）
+
+        Args:
+            command: 'OFF' / 'ALERT' / 'AWAKE'
+            timeout: 応答を待つ最大時間（秒）
+
+        Returns:
+            tuple: (成功したかどうか, 詳細の文字列)
+
+        Raises:
+            TimeoutError: timeout秒以内に応答がなかった場合
+        """
+        raise NotImplementedError
+
+    def _submit(self, command, on_done):
+        """
+        コマンドの実行を要求（すぐに戻る）
+
+        Args:
+            command: 'OFF' / 'ALERT' / 'AWAKE'
+            on_done: 実行後にワーカースレッドから呼ばれる関数 on_done(CommandResult)
+        """
+        if not self.is_running:
+            print(f"⚠️  テレビ操作（{self.name}）が開始されていないため、{command}を送れません")
+            return
+        self.command_queue.put((command, on_done, time.monotonic()))
+
+    def _worker_loop(self):
+        """コマンドを順に実行するループ"""
+        while True:
+            try:
+                item = self.command_queue.get(timeout=1.0)
+            except Empty:
+                continue
+            if item is None:
+                break
+
+            command, on_done, requested_at = item
+            start_time = time.monotonic()
+            timed_out = False
+            try:
+                success, detail = self._execute(command, self.ack_timeout)
+            except TimeoutError as e:
+                success, detail, timed_out = False, str(e), True
+            except Exception as e:
+                success, detail = False, str(e)
+
+            result = CommandResult(command, success, timed_out, time.monotonic() - start_time,
+                                   start_time - requested_at, detail)
+            self._record(result)
+            if not success:
+                reason = 'タイムアウト' if timed_out else '失敗'
+                print(f"✗ テレビ操作 {command}（{self.name}）{reason}: {detail}")
+
+            if on_done is not None:
+                try:
+                    on_done(result)
+                except Exception as e:
+                    print(f"✗ テレビ操作後の処理でエラー: {e}")
+
+    def _record(self, result):
+        """コマンドごとの計測値を更新"""
+        with self._stats_lock:
+            stats = self._stats[result.command]
+            stats['count'] += 1
+            if not result.success:
+                stats['failed'] += 1
+            if result.timed_out:
+                stats['timeouts'] += 1
+            stats['latency_sum'] += result.latency
+            stats['max_latency'] = max(stats['max_latency'], result.latency)
+            stats['last_latency'] = result.latency
+            self.last_result = result
+
+    def get_metrics(self):
+        """
+        コマンドごとの計測値を取得
+
+        Returns:
+            dict: バックエンド名、未実行のコマンド数、コマンドごとの実行回数・失敗数・タイムアウト数・遅延（ミリ秒）
+        """
+        with self._stats_lock:
+            commands = {}
+            for command, stats in self._stats.items():
+                count = stats['count']
+                commands[command] = {
+                    'count': count,
+                    'failed': stats['failed'],
+                    'timeouts': stats['timeouts'],
+                    'last_latency_ms': round(stats['last_latency'] * 1000, 2) if stats['last_latency'] is not None else None,
+                    'mean_latency_ms': round(stats['latency_sum'] / count * 1000, 2) if count else None,
+                    'max_latency_ms': round(stats['max_latency'] * 1000, 2)
+                }
+        return {'backend': self.name, 'pending': self.pending(), 'commands': commands}
+
+
+class LircActuator(TVActuator):
+    """ラズベリーパイのIR LEDから送信するバックエンド（送信はIRSenderに任せ、送信完了を応答とみなす）"""
+
+    name = 'lirc'
+
+    def __init__(self, ir_sender, stage2_macro=None, macro_max_duration=3.0, ack_timeout=3.0):
+        """
+        初期化
+
+        Args:
+            ir_sender: IRSenderのインスタンス（開始済みであること）
+            stage2_macro: OFFで送信するマクロ名（Noneならテレビの電源ボタンのみ）
+            macro_max_duration: マクロ全体の最大時間（秒）
+            ack_timeout: 送信完了を待つ最大時間（秒）
+        """
+        super().__init__(ack_timeout=ack_timeout)
+        self.ir_sender = ir_sender
+        self.stage2_macro = stage2_macro
+        self.macro_max_duration = macro_max_duration
+
+    def _execute(self, command, timeout):
+        if command != 'OFF':
+            # 警告・解除はラズパイ側のLED・音声で行うので、テレビには何も送らない
+            return True, '送信なし'
+
+        done = threading.Event()
+        outcome = {}
+
+        def on_done(target, success):
+            outcome['success'] = success
+            done.set()
+
+        if self.stage2_macro:
+            self.ir_sender.send_macro(self.stage2_macro, max_duration=self.macro_max_duration, on_done=on_done)
+            target = f"マクロ「{self.stage2_macro}」"
+        else:
+            self.ir_sender.send("TV", on_done=on_done)
+            target = 'TV'
+
+        # マクロは送信自体に最大macro_max_duration秒かかるので、その分も待つ
+        wait = timeout + self.macro_max_duration if self.stage2_macro else timeout
+        if not done.wait(wait):
+            raise TimeoutError(f"{target}の送信が{wait}秒以内に完了しませんでした")
+        return outcome['success'], f"{target}を送信"
+
+
+class SerialActuator(TVActuator):
+    """M5StickCにシリアルでコマンドを送るバックエンド（M5StickCの応答行を完了の応答とみなす）"""
+
+    name = 'serial'
+
+    # コマンドごとの応答（m5stick/src/main.cpp の出力に合わせる）
+    # (成功を表す行の先頭, 失敗を表す行の先頭)
+    ACKS = {
+        'OFF': (('Signal sent!', 'TV is already OFF'),
+                ('No signal registered!', 'Unsupported protocol', 'No valid signal data to send!')),
+        'ALERT': (('ALERT command received',), ()),
+        'AWAKE': (('AWAKE command received',), ())
+    }
+    UNKNOWN_COMMAND = 'Unknown command'
+
+    def __init__(self, port='/dev/ttyUSB0', baud=115200, ir_monitor=None, ack_timeout=3.0):
+        """
+        初期化
+
+        Args:
+            port: M5StickCのシリアルポート
+            baud: ボーレート（M5StickC側と一致させる）
+            ir_monitor: IRMonitorのインスタンス（M5StickCが送信した電源信号をエコーとして無視させる、任意）
+            ack_timeout: 応答を待つ最大時間（秒）
+        """
+        super().__init__(ack_timeout=ack_timeout)
+        self.port = port
+        self.baud = baud
+        self.ir_monitor = ir_monitor
+        self.ser = None
+
+    def open(self):
+        """シリアルポートを開く"""
+        if not SERIAL_AVAILABLE:
+            raise Exception("pyserialがインストールされていません（pip install pyserial）")
+        # readlineが応答待ちのタイムアウトを細かく判定できるよう、短いタイムアウトで開く
+        self.ser = serial.Serial(self.port, self.baud, timeout=0.05)
+        print(f"✓ M5StickCに接続しました: {self.port} @ {self.baud}bps")
+
+    def close(self):
+        """シリアルポートを閉じる"""
+        if self.ser is not None and self.ser.is_open:
+            self.ser.close()
+        self.ser = None
+
+    def _execute(self, command, timeout):
+        # 前のコマンドの残りやM5StickC側のボタン操作のログを読み捨てる
+        self.ser.reset_input_buffer()
+
+        start_time = time.monotonic()
+        if command == 'OFF':
+            # M5StickCが送信する電源信号を、ラズパイ側のIR監視が電源操作と誤認しないようにする
+            self._notify_echo(start_time, None)
+
+        try:
+            self.ser.write((command + "\n").encode())
+            return self._wait_ack(command, start_time + timeout)
+        finally:
+            if command == 'OFF':
+                self._notify_echo(start_time, time.monotonic())
+
+    def _wait_ack(self, command, deadline):
+        """
+        応答行を待つ
+
+        Args:
+            command: 送信したコマンド
+            deadline: 応答を待つ期限（time.monotonic()）
+
+        Returns:
+            tuple: (成功したかどうか, 応答行)
+
+        Raises:
+            TimeoutError: 期限までに応答がなかった場合
+        """
+        success_prefixes, failure_prefixes = self.ACKS[command]
+        while time.monotonic() < deadline:
+            line = self.ser.readline().decode(errors='ignore').strip()
+            if not line:
+                continue
+            if line.startswith(success_prefixes):
+                return True, line
+            if line.startswith(failure_prefixes) or line.startswith(self.UNKNOWN_COMMAND):
+                return False, line
+        # 登録モード中のM5StickCはコマンドに応答しない
+        raise TimeoutError(f"M5StickCから{command}の応答がありません（登録モード中でないか確認してください）")
+
+    def _notify_echo(self, start_time, end_time):
+        """M5StickCが送信する電源信号の時刻をIRMonitorに伝える"""
+        if self.ir_monitor is not None:
+            self.ir_monitor.suppress_echo("TV", start_time, end_time)
+
+
+def create_actuator(params, ir_sender=None, ir_monitor=None, stage2_macro=None, macro_max_duration=3.0):
+    """
+    設定に応じてテレビ操作のバックエンドを作成
+
+    Args:
+        params: ir_actuation の設定（backend, serial_port, serial_baud, ack_timeout）
+        ir_sender: IRSenderのインスタンス（lircバックエンドで使用）
+        ir_monitor: IRMonitorのインスタンス（serialバックエンドのエコー抑制に使用）
+        stage2_macro: OFFで送信するマクロ名（lircバックエンドのみ）
+        macro_max_duration: マクロ全体の最大時間（秒）
+
+    Returns:
+        TVActuator: テレビ操作のバックエンド
+
+    Raises:
+        ValueError: 未対応のバックエンドが指定された場合
+    """
+    backend = params.get('backend', 'lirc')
+    ack_timeout = params.get('ack_timeout', 3.0)
+    if backend == 'lirc':
+        return LircActuator(ir_sender, stage2_macro=stage2_macro,
+                            macro_max_duration=macro_max_duration, ack_timeout=ack_timeout)
+    if backend == 'serial':
+        return SerialActuator(port=params.get('serial_port', '/dev/ttyUSB0'),
+                              baud=params.get('serial_baud', 115200),
+                              ir_monitor=ir_monitor, ack_timeout=ack_timeout)
+    raise ValueError(f"未対応のテレビ操作バックエンドです: {backend}（lirc / serial）")
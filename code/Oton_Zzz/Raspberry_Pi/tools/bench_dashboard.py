@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Oton-Zzz ダッシュボードの規模別ベンチマーク
+tools/gen_synthetic_db.py で logs を 1万・100万・1000万行にした作業用のデータベースを作り、
+ダッシュボードが使う集計（キャッシュなし / CachedReaderのキャッシュあり）と、ページ表示
+（Flaskのテストクライアント）の遅延を計測します。
+
+使い方:
+    python tools/bench_dashboard.py                         # 10000,1000000,10000000行
+    python tools/bench_dashboard.py --sizes 10000,1000000 --calls 50
+    python tools/bench_dashboard.py --dir /mnt/sd --keep    # SDカード上で計測し、データベースを残す
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'src'))
+
+from db import CachedReader, DatabaseManager
+from gen_synthetic_db import generate
+
+
+# ダッシュボードが使う集計（名前 -> DatabaseManagerのメソッドと引数を呼ぶ関数）
+def _queries(now):
+    return {
+        'get_weekly_stats': lambda db: db.get_weekly_stats(),
+        'get_daily_stats': lambda db: db.get_daily_stats(),
+        'get_monthly_stats': lambda db: db.get_monthly_stats(),
+        'get_recent_logs': lambda db: db.get_recent_logs(20),
+        'get_energy_stats': lambda db: db.get_energy_stats(7),
+        'get_telemetry_1h': lambda db: db.get_telemetry(now - 3600, now),
+        'get_telemetry_1d': lambda db: db.get_telemetry(now - 86400, now),
+        'get_telemetry_1w': lambda db: db.get_telemetry(now - 7 * 86400, now)
+    }
+
+
+def _summarize(samples):
+    """遅延（秒）のリストをミリ秒の統計にする"""
+    values = np.array(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'max_ms': round(float(values.max()), 3)
+    }
+
+
+def _time_calls(func, calls):
+    """funcをcalls回呼んで遅延を計測"""
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return _summarize(samples)
+
+
+def bench_queries(db_path, calls):
+    """キャッシュなしの集計（読み込み専用の接続から毎回SQLを実行）"""
+    db = DatabaseManager(db_path, read_only=True)
+    try:
+        return {name: _time_calls(lambda: query(db), calls) for name, query in _queries(time.time()).items()}
+    finally:
+        db.close()
+
+
+def bench_cached(db_path, calls):
+    """CachedReader経由の集計（最初の1回はSQLを実行し、以降はメモリから返す）"""
+    reader = CachedReader(db_path)
+    results = {}
+    for name in ('get_weekly_stats', 'get_daily_stats', 'get_recent_logs'):
+        args = (20,) if name == 'get_recent_logs' else ()
+        start = time.perf_counter()
+        reader.call(name, *args)
+        first_ms = round((time.perf_counter() - start) * 1000, 3)
+        results[name] = dict(_time_calls(lambda: reader.call(name, *args), calls), first_ms=first_ms)
+    reader.db.close()
+    return results
+
+
+def bench_pages(db_path, calls):
+    """ダッシュボードのページ表示（Flaskがなければ省略）"""
+    try:
+        import flask  # noqa: F401
+    except ImportError:
+        return {'skipped': 'flaskがインストールされていないため省略'}
+
+    os.environ['DASHBOARD_DB'] = db_path
+    with contextlib.redirect_stdout(io.StringIO()):
+        import dashboard
+        dashboard.db_reader = CachedReader(db_path, energy_params=dashboard.config_mgr.get_energy_params())
+    client = dashboard.app.test_client()
+
+    results = {}
+    for name, url in (('index', '/'), ('api_telemetry_1d', '/api/telemetry?seconds=86400')):
+        start = time.perf_counter()
+        response = client.get(url)
+        first_ms = round((time.perf_counter() - start) * 1000, 3)
+        results[name] = dict(_time_calls(lambda: client.get(url), calls), first_ms=first_ms,
+                             status=response.status_code)
+    dashboard.db_reader.db.close()
+    return results
+
+
+def run_benchmark(args):
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        work_dir = args.dir if args.keep and args.dir else tmp_dir
+        for size in args.sizes:
+            db_path = os.path.join(work_dir, f'scale_{size}.db')
+            if not os.path.exists(db_path):
+                load = generate(db_path, size, days=args.days, telemetry_days=args.telemetry_days)
+            else:
+                load = {'reused': db_path}
+
+            results[size] = {
+                'load': load,
+                'queries': bench_queries(db_path, args.calls),
+                'cached': bench_cached(db_path, args.calls),
+                'pages': bench_pages(db_path, args.calls)
+            }
+            print(f"✓ {size}行の計測が完了しました", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ダッシュボードの集計・ページ表示の規模別ベンチマーク')
+    parser.add_argument('--sizes', type=lambda text: [int(value) for value in text.split(',')],
+                        default=[10000, 1000000, 10000000], help='logsの行数（カンマ区切り）')
+    parser.add_argument('--days', type=int, default=3650, help='合成データの日数')
+    parser.add_argument('--telemetry-days', type=int, default=7, help='テレメトリーを作る日数')
+    parser.add_argument('--calls', type=int, default=20, help='各集計の呼び出し回数')
+    parser.add_argument('--dir', default=None, help='データベースを作るディレクトリ（SDカード上で計測する場合に指定）')
+    parser.add_argument('--keep', action='store_true', help='--dirに作ったデータベースを残し、次回も使う')
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args), indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
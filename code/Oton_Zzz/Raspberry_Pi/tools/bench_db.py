@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Oton-Zzz データベースベンチマーク
+DatabaseManagerの各メソッドの1回あたりの遅延を、呼び出しごとに接続を開き直す従来の方式
+（ロールバックジャーナル、synchronous=FULL）と比較します。
+batched はログの書き込みをバックグラウンドスレッドでまとめて行う場合（start_writer()）です。
+--with-reader を付けると、別プロセスのダッシュボード相当の読み込みを並走させ、書き込みが待たされないかを確認します。
+
+使い方:
+    python tools/bench_db.py --calls 500
+    python tools/bench_db.py --with-reader
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'src'))
+
+from db import DatabaseManager, CachedReader
+
+
+class LegacyDatabase:
+    """呼び出しごとに接続を開いてコミット・クローズする従来の方式"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # テーブルはDatabaseManagerで作り、ジャーナルを従来のロールバックジャーナルに戻す
+        DatabaseManager(db_path).close()
+        conn = sqlite3.connect(db_path)
+        conn.execute('PRAGMA journal_mode=DELETE')
+        conn.close()
+
+    def log_event(self, event_type, duration=0, note=""):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('INSERT INTO logs (timestamp, event_type, duration, note) VALUES (?, ?, ?, ?)',
+                     (datetime.now().isoformat(), event_type, duration, note))
+        conn.commit()
+        conn.close()
+
+    def get_weekly_stats(self):
+        conn = sqlite3.connect(self.db_path)
+        since = (datetime.now() - timedelta(days=7)).isoformat()
+        result = conn.execute("SELECT COUNT(*), SUM(duration) FROM logs "
+                              "WHERE event_type = 'SLEEP_DETECTED' AND timestamp > ?", (since,)).fetchone()
+        conn.close()
+        return result
+
+    def get_daily_stats(self, days=7):
+        conn = sqlite3.connect(self.db_path)
+        today = datetime.now().date()
+        stats = []
+        for i in range(days):
+            target_date = today - timedelta(days=i)
+            stats.append(conn.execute(
+                "SELECT COUNT(*), SUM(duration) FROM logs WHERE event_type = 'SLEEP_DETECTED' "
+                "AND timestamp >= ? AND timestamp < ?",
+                (target_date.isoformat(), (target_date + timedelta(days=1)).isoformat())).fetchone())
+        conn.close()
+        return stats
+
+    def get_recent_logs(self, limit=10):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        logs = [dict(row) for row in conn.execute('SELECT * FROM logs ORDER BY id DESC LIMIT ?', (limit,))]
+        conn.close()
+        return logs
+
+
+def _reader_process(db_path, stop_event):
+    """ダッシュボードと同じ読み込み（読み込み専用の接続とキャッシュ）を繰り返す別プロセス"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        reader = CachedReader(db_path)
+        while not stop_event.is_set():
+            reader.call('get_weekly_stats')
+            reader.call('get_daily_stats')
+            reader.call('get_recent_logs', 20)
+
+
+def _summarize(samples):
+    """遅延（秒）のリストをミリ秒の統計にする"""
+    values = np.array(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'max_ms': round(float(values.max()), 3)
+    }
+
+
+def run_calls(db, calls, seed_rows):
+    """各メソッドを順に呼び出して遅延を計測"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(seed_rows):
+            db.log_event('SLEEP_DETECTED' if i % 4 == 0 else 'TV_ON', duration=5.0)
+
+        timings = {'log_event': [], 'get_weekly_stats': [], 'get_daily_stats': [], 'get_recent_logs': []}
+        for i in range(calls):
+            start = time.perf_counter()
+            db.log_event('SLEEP_DETECTED' if i % 2 == 0 else 'TV_OFF', duration=5.0, note='bench')
+            timings['log_event'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            db.get_weekly_stats()
+            timings['get_weekly_stats'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            db.get_daily_stats()
+            timings['get_daily_stats'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            db.get_recent_logs(20)
+            timings['get_recent_logs'].append(time.perf_counter() - start)
+
+    return {name: _summarize(samples) for name, samples in timings.items()}
+
+
+def _batched_database(db_path):
+    """バックグラウンドでまとめて書き込むDatabaseManager"""
+    db = DatabaseManager(db_path)
+    db.start_writer()
+    return db
+
+
+def run_benchmark(args):
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        for label, factory in (('legacy', LegacyDatabase), ('managed', DatabaseManager), ('batched', _batched_database)):
+            db_path = os.path.join(tmp_dir, f'{label}.db')
+            with contextlib.redirect_stdout(io.StringIO()):
+                db = factory(db_path)
+
+            reader = None
+            stop_event = multiprocessing.Event()
+            if args.with_reader:
+                reader = multiprocessing.Process(target=_reader_process, args=(db_path, stop_event), daemon=True)
+                reader.start()
+                time.sleep(0.5)
+
+            try:
+                results[label] = run_calls(db, args.calls, args.seed_rows)
+            except sqlite3.OperationalError as e:
+                # 従来の方式では読み込み中の書き込みがロック待ちになり、待ちきれずに失敗することがある
+                results[label] = {'error': str(e)}
+            finally:
+                writer = getattr(db, 'writer', None)
+                if writer is not None:
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        db.stop_writer()
+                    results[label]['writer'] = dict(writer.get_metrics(),
+                                                    shutdown_flush_ms=round((time.perf_counter() - start) * 1000, 3))
+                if reader is not None:
+                    stop_event.set()
+                    reader.join(timeout=5)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DatabaseManagerの呼び出しごとの遅延ベンチマーク')
+    parser.add_argument('--calls', type=int, default=300, help='各メソッドの呼び出し回数')
+    parser.add_argument('--seed-rows', type=int, default=1000, help='計測前に入れておく行数')
+    parser.add_argument('--with-reader', action='store_true', help='別プロセスの読み込みを並走させる')
+    parser.add_argument('--dir', default=None, help='データベースを作るディレクトリ（SDカード上で計測する場合に指定）')
+    args = parser.parse_args()
+
+    print(json.dumps(run_benchmark(args), indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Oton-Zzz IR受信ベンチマーク
+FakeLircDeviceに電源ボタン・音量ボタン・ノイズ・自分の送信信号（エコー）を台本どおりに流し、
+信号の終わりからテレビ状態が切り替わるまでの遅延と、取りこぼし・誤反応の数を計測します。
+ラズパイ（gpio-irオーバーレイ）なしで受信処理を比較できます。
+
+使い方:
+    python tools/bench_ir_rx.py --events 200
+    python tools/bench_ir_rx.py --no-timeout-reports   # カーネルのタイムアウト通知なし（アイドルタイムアウトで区切る）
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'src'))
+
+from detector import IRController
+from fake_lirc import FakeLircDevice, FakeTransmitter, jitter_trace, noise_trace
+from ir_codec import compile_code
+from ir_codes import IRCodeIndex
+from ir_rx import IRMonitor
+from ir_tx import IRSender
+
+
+# ベンチマーク用のリモコン
+BENCH_CODES = {
+    'TV': {'format': 'nec', 'scancode': '0x20df10ef'},
+    'VOLUME_UP': {'format': 'nec', 'scancode': '0x20df40bf'},
+    'CHANNEL_UP': {'format': 'sony12', 'scancode': '0x010010'}
+}
+
+# イベントの種類と出現比率
+EVENT_WEIGHTS = {
+    'power': 4,        # 電源ボタン（状態が切り替わるべき）
+    'power_held': 1,   # 電源ボタンの長押し（NECリピート付き、1回だけ切り替わるべき）
+    'volume': 3,       # 音量・チャンネルボタン（切り替わってはいけない）
+    'noise': 2,        # ノイズ（切り替わってはいけない）
+    'echo': 2          # 自分の送信信号（切り替わってはいけない）
+}
+
+NEC_REPEAT = [9000, 2250, 563]
+NEC_REPEAT_GAP = 96000
+
+
+class _RecordingTVState:
+    """状態が切り替わった時刻を記録するテレビ状態"""
+
+    def __init__(self):
+        self.is_on = True
+        self.toggle_times = []
+        self._lock = threading.Lock()
+
+    def toggle(self):
+        with self._lock:
+            self.toggle_times.append(time.monotonic())
+            self.is_on = not self.is_on
+            return self.is_on
+
+
+def build_script(num_events, rng, min_gap, max_gap):
+    """
+    ランダムな台本を作成
+
+    Returns:
+        list: (待ち時間, 種類) のリスト
+    """
+    kinds = list(EVENT_WEIGHTS)
+    weights = [EVENT_WEIGHTS[kind] for kind in kinds]
+    return [(rng.uniform(min_gap, max_gap), rng.choices(kinds, weights)[0]) for _ in range(num_events)]
+
+
+def run_benchmark(args):
+    """台本を流して計測"""
+    rng = random.Random(args.seed)
+    device = FakeLircDevice(timeout_reports=not args.no_timeout_reports, realtime=not args.burst)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        codes_file = os.path.join(tmp_dir, 'ir_codes.json')
+        with open(codes_file, 'w') as f:
+            json.dump(BENCH_CODES, f)
+
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log if not args.verbose else sys.stdout):
+            controller = IRController(rx_device='fake', config_file=codes_file,
+                                      transmitter=FakeTransmitter(device))
+            tv_state = _RecordingTVState()
+            monitor = IRMonitor(rx_device='fake', tv_state_manager=tv_state,
+                                receiver=device.receiver(idle_timeout=args.idle_timeout),
+                                code_index=IRCodeIndex(controller.recorded_codes), power_button='TV')
+            sender = IRSender(controller, monitor)
+            monitor.start()
+            sender.start()
+
+            # メインループ（SLEEP中）と同様に、状態変更が届くまで待って受け取る
+            consuming = threading.Event()
+            consuming.set()
+
+            def consume():
+                while consuming.is_set():
+                    monitor.wait_signal(timeout=0.1)
+
+            consumer = threading.Thread(target=consume, daemon=True)
+            consumer.start()
+
+            power = list(compile_code(BENCH_CODES['TV']).samples)
+            others = [list(compile_code(BENCH_CODES[name]).samples) for name in ('VOLUME_UP', 'CHANNEL_UP')]
+
+            expected = []   # 状態が切り替わるべき信号の終了時刻
+            counts = {kind: 0 for kind in EVENT_WEIGHTS}
+            script = build_script(args.events, rng, args.min_gap, args.max_gap)
+            started = time.monotonic()
+
+            for delay, kind in script:
+                time.sleep(delay)
+                counts[kind] += 1
+                if kind == 'power':
+                    expected.append(device.play(jitter_trace(power, rng)))
+                elif kind == 'power_held':
+                    expected.append(device.play(jitter_trace(power, rng)))
+                    for _ in range(rng.randint(1, 4)):
+                        time.sleep(NEC_REPEAT_GAP / 1e6)
+                        device.play(jitter_trace(NEC_REPEAT, rng))
+                elif kind == 'volume':
+                    device.play(jitter_trace(rng.choice(others), rng))
+                elif kind == 'noise':
+                    device.play(noise_trace(rng))
+                elif kind == 'echo':
+                    sent_before = sender.sent_count
+                    sender.send('TV')
+                    while sender.sent_count == sent_before:
+                        time.sleep(0.005)
+
+            time.sleep(0.5)  # 最後のフレームの処理を待つ
+            elapsed = time.monotonic() - started
+            consuming.clear()
+            consumer.join(timeout=1.0)
+            sender.stop()
+            monitor.stop()
+            controller.cleanup()
+        device.close()
+
+    # 期待した切り替えと実際の切り替えを時刻順に対応づける
+    toggles = list(tv_state.toggle_times)
+    latencies = []
+    missed = 0
+    for signal_end in expected:
+        match = next((t for t in toggles if signal_end <= t <= signal_end + args.match_window), None)
+        if match is None:
+            missed += 1
+        else:
+            toggles.remove(match)
+            latencies.append(match - signal_end)
+    spurious = len(toggles)
+
+    return {
+        'events': counts,
+        'elapsed_s': round(elapsed, 1),
+        'expected_toggles': len(expected),
+        'missed': missed,
+        'missed_rate': round(missed / len(expected), 4) if expected else 0.0,
+        'spurious': spurious,
+        'latency_ms': {
+            'p50': round(float(np.percentile(latencies, 50)) * 1000, 2) if latencies else None,
+            'p95': round(float(np.percentile(latencies, 95)) * 1000, 2) if latencies else None,
+            'max': round(max(latencies) * 1000, 2) if latencies else None
+        },
+        'monitor': monitor.get_metrics()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IR受信の遅延・取りこぼしベンチマーク（実機不要）')
+    parser.add_argument('--events', type=int, default=100, help='流すイベント数')
+    parser.add_argument('--seed', type=int, default=1, help='乱数シード')
+    parser.add_argument('--min-gap', type=float, default=0.4, help='イベント間隔の最小値（秒）')
+    parser.add_argument('--max-gap', type=float, default=0.8, help='イベント間隔の最大値（秒）')
+    parser.add_argument('--idle-timeout', type=float, default=0.15, help='受信側のアイドルタイムアウト（秒）')
+    parser.add_argument('--no-timeout-reports', action='store_true', help='カーネルのタイムアウト通知を送らない')
+    parser.add_argument('--burst', action='store_true', help='エッジの時刻を再現せず、フレームを一度に書き込む')
+    parser.add_argument('--match-window', type=float, default=1.0, help='切り替えを信号に対応づける最大遅延（秒）')
+    parser.add_argument('--verbose', action='store_true', help='受信ログを表示')
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
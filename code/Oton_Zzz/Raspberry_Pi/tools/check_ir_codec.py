@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Oton-Zzz IRコーデックの往復チェック
+対応する全プロトコルについて、ランダムなスキャンコード（とトグルビット）をパルス/スペース配列に
+エンコードし、decode_frame() で同じプロトコル・スキャンコードに戻るかを確かめます。
+別のプロトコルとして復号されたフレーム（学習・送信で取り違える原因）も数えます。
+
+使い方:
+    python tools/check_ir_codec.py                   # タイミングそのままで各プロトコル10000フレーム
+    python tools/check_ir_codec.py --spread 80       # 受信機のばらつきを模して各長さを揺らす
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'src'))
+
+from fake_lirc import jitter_trace
+from ir_codec import RC6_MCE_CUSTOMER, RC6_MCE_CUSTOMER_MASK, RC6_MCE_TOGGLE, decode_frame, encode_scancode
+
+
+def random_code(rng, protocol):
+    """
+    プロトコルごとに復号結果が一意になるスキャンコードとトグルビットを作る
+
+    Returns:
+        tuple: (スキャンコード, 送るトグルビット, 復号で期待するトグルビット)
+    """
+    while True:
+        toggle = rng.randint(0, 1)
+        if protocol == 'nec':
+            return rng.getrandbits(16), 0, 0
+        if protocol == 'necx':
+            # アドレスと反転アドレスが補数の関係なら通常のNECとして復号される
+            scancode = rng.getrandbits(24)
+            if ((scancode >> 16) ^ (scancode >> 8)) & 0xff != 0xff:
+                return scancode, 0, 0
+        elif protocol == 'nec32':
+            # コマンドと反転コマンドが補数の関係なら拡張NEC・NECとして復号される
+            scancode = rng.getrandbits(32)
+            if (scancode ^ (scancode >> 8)) & 0xff != 0xff:
+                return scancode, 0, 0
+        elif protocol == 'sony12':
+            return rng.getrandbits(5) << 16 | rng.getrandbits(7), 0, 0
+        elif protocol == 'sony15':
+            return rng.getrandbits(8) << 16 | rng.getrandbits(7), 0, 0
+        elif protocol == 'sony20':
+            return rng.getrandbits(5) << 16 | rng.getrandbits(8) << 8 | rng.getrandbits(7), 0, 0
+        elif protocol == 'rc5':
+            return rng.getrandbits(5) << 8 | rng.getrandbits(7), toggle, toggle
+        elif protocol == 'rc6_0':
+            return rng.getrandbits(16), toggle, toggle
+        elif protocol == 'rc6_mce':
+            return RC6_MCE_CUSTOMER | rng.getrandbits(16) & ~RC6_MCE_TOGGLE, toggle, toggle
+        else:
+            # モード6Aのトグルビットは復号しない。32ビットはMCEの顧客コードを除く
+            nbits = int(protocol.rsplit('_', 1)[1])
+            scancode = rng.getrandbits(nbits)
+            if nbits != 32 or scancode & RC6_MCE_CUSTOMER_MASK != RC6_MCE_CUSTOMER:
+                return scancode, toggle, 0
+
+
+PROTOCOLS = ('nec', 'necx', 'nec32', 'sony12', 'sony15', 'sony20', 'rc5',
+             'rc6_0', 'rc6_6a_20', 'rc6_6a_24', 'rc6_6a_32', 'rc6_mce')
+
+
+def check_protocol(rng, protocol, frames, spread):
+    """
+    1プロトコル分の往復チェック
+
+    Returns:
+        dict: 一致・不一致・復号できなかったフレーム数と、取り違えたプロトコル
+    """
+    result = {'ok': 0, 'mismatch': 0, 'undecoded': 0, 'decoded_as': {}}
+    for _ in range(frames):
+        scancode, toggle, expected_toggle = random_code(rng, protocol)
+        durations, _ = encode_scancode(protocol, scancode, toggle)
+        if spread:
+            durations = jitter_trace(durations, rng, spread)
+        decoded = decode_frame(durations)
+        if decoded is None:
+            result['undecoded'] += 1
+        elif (decoded.protocol, decoded.scancode, decoded.toggle) == (protocol, scancode, expected_toggle):
+            result['ok'] += 1
+        else:
+            result['mismatch'] += 1
+            result['decoded_as'][decoded.protocol] = result['decoded_as'].get(decoded.protocol, 0) + 1
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IRコーデックのエンコード→デコード往復チェック')
+    parser.add_argument('--frames', type=int, default=10000, help='プロトコルごとのフレーム数')
+    parser.add_argument('--spread', type=int, default=0, help='各長さを揺らす幅（マイクロ秒、0でそのまま）')
+    parser.add_argument('--seed', type=int, default=1, help='乱数シード')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = {protocol: check_protocol(rng, protocol, args.frames, args.spread) for protocol in PROTOCOLS}
+    print(json.dumps(results, indent=2))
+
+    failed = [protocol for protocol, result in results.items() if result['ok'] != args.frames]
+    if failed:
+        print(f"✗ 往復で一致しないプロトコルがあります: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+    print("✓ すべてのプロトコルが往復で一致しました", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
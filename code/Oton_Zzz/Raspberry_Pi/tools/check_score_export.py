@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Oton-Zzz テレメトリーの書き出し → オフラインキャリブレーションの往復チェック
+作業用のデータベースに既知のまばたきスコアのテレメトリーを書き込み、tools/db_admin.py export と同じ
+export() で CSV / NDJSON（gzipあり・なし）に書き出したファイルを load_blink_scores() で読み戻して、
+同じスコアが返るか（時刻などほかの列を読んでいないか）を確かめます。
+
+使い方:
+    python tools/check_score_export.py
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'src'))
+
+from db import DatabaseManager
+from export import EXPORT_FORMATS, export
+from offline_calibration import load_blink_scores
+
+
+def main():
+    rng = random.Random(1)
+    failed = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'check.db')
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(db_path)
+
+        # 顔未検出の秒（blinkがNULL）も混ぜる
+        start = 1_700_000_040  # 分の区切りから10分間
+        expected = []
+        for second in range(start, start + 600):
+            blink = round(rng.uniform(0.01, 1.0), 4) if rng.random() > 0.1 else None
+            db.log_telemetry(second, gauge=0.0, blink=blink, face_ratio=1.0 if blink is not None else 0.0,
+                             fps=14.0, inference_ms=25.0, perclos=0.1)
+            if blink is not None:
+                expected.append(blink)
+
+        for fmt in EXPORT_FORMATS:
+            for compress in (False, True):
+                path = os.path.join(tmp_dir, f'telemetry.{fmt}' + ('.gz' if compress else ''))
+                with open(path, 'wb') as f:
+                    for data in export(db, 'telemetry_1s', fmt=fmt, compress=compress):
+                        f.write(data)
+                scores = load_blink_scores(path)
+                ok = len(scores) == len(expected) and all(abs(a - b) < 1e-9 for a, b in zip(scores, expected))
+                print(f"{'✓' if ok else '✗'} telemetry_1s {os.path.basename(path)}: {len(scores)}/{len(expected)}サンプル")
+                if not ok:
+                    failed.append(path)
+
+            # 1分の集計は分ごとの平均スコアになる
+            path = os.path.join(tmp_dir, f'telemetry_1m.{fmt}')
+            with open(path, 'wb') as f:
+                for data in export(db, 'telemetry_1m', fmt=fmt):
+                    f.write(data)
+            scores = load_blink_scores(path)
+            ok = len(scores) == 10 and all(0.0 < score <= 1.0 for score in scores)
+            print(f"{'✓' if ok else '✗'} telemetry_1m {os.path.basename(path)}: {len(scores)}サンプル")
+            if not ok:
+                failed.append(path)
+
+        # スコアの列がないファイルは推測せずにエラーにする
+        path = os.path.join(tmp_dir, 'logs.csv')
+        with open(path, 'wb') as f:
+            for data in export(db, 'logs'):
+                f.write(data)
+        try:
+            load_blink_scores(path)
+            print("✗ スコアの列がないファイルを読み込んでしまいました")
+            failed.append(path)
+        except ValueError as e:
+            print(f"✓ スコアの列がないファイルはエラー: {e}")
+        db.close()
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
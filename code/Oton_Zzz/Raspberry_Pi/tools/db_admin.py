@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Oton-Zzz データベース管理コマンド
+
+使い方:
+    python tools/db_admin.py migrate          # 未適用のマイグレーションを適用
+    python tools/db_admin.py rebuild-rollup   # logsから日別集計（daily_rollup）を作り直す
+    python tools/db_admin.py rebuild-energy   # logsから日別のテレビON時間（daily_energy）を作り直す
+    python tools/db_admin.py enable-incremental-vacuum   # 既存のデータベースを auto_vacuum=INCREMENTAL に切り替える
+    python tools/db_admin.py archive --months 12                    # 12か月より前のログをアーカイブして領域を解放
+    python tools/db_admin.py archive-query --from 2024-01-01 --to 2024-04-01   # アーカイブの月別・種類別の件数
+    python tools/db_admin.py archive-query --event-type SLEEP_DETECTED --rows  # アーカイブの行をNDJSONで表示
+    python tools/db_admin.py export logs --format csv --from 2024-01-01 --gzip -o logs.csv.gz   # ログを書き出す
+    python tools/db_admin.py export telemetry_1m --format ndjson --include-archive > t.ndjson   # 標準出力へ
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'src'))
+
+from db import DatabaseManager, EXPORT_TABLES
+from archive import ARCHIVE_TABLES, read_archive
+from export import EXPORT_FORMATS, export
+
+DEFAULT_DB_PATH = os.path.join(SCRIPT_DIR, '..', 'data', 'oton_zzz.db')
+DEFAULT_ARCHIVE_DIR = os.path.join(SCRIPT_DIR, '..', 'data', 'archive')
+
+
+def cmd_migrate(db, args):
+    """マイグレーションを適用（DatabaseManagerの初期化時に適用済み）"""
+    version = db._connect().execute('PRAGMA user_version').fetchone()[0]
+    print(f"✓ スキーマのバージョン: v{version}")
+
+
+def cmd_rebuild_rollup(db, args):
+    """日別集計を作り直す"""
+    start = time.monotonic()
+    days = db.rebuild_daily_rollup()
+    print(f"✓ 日別集計を作り直しました（{days}日分、{time.monotonic() - start:.1f}秒）")
+
+
+def cmd_rebuild_energy(db, args):
+    """日別のテレビON時間を作り直す"""
+    start = time.monotonic()
+    days = db.rebuild_daily_energy()
+    print(f"✓ 日別のテレビON時間を作り直しました（{days}日分、{time.monotonic() - start:.1f}秒）")
+
+
+def cmd_enable_incremental_vacuum(db, args):
+    """既存のデータベースを auto_vacuum=INCREMENTAL に切り替える（コア・ダッシュボードを止めてから実行）"""
+    start = time.monotonic()
+    size = os.path.getsize(db.db_path)
+    try:
+        changed = db.enable_incremental_vacuum()
+    except (OSError, sqlite3.Error) as e:
+        print(f"✗ 切り替えられませんでした: {e}")
+        sys.exit(1)
+    if not changed:
+        print("✓ すでに auto_vacuum=INCREMENTAL です")
+        return
+    print(f"✓ auto_vacuum=INCREMENTAL に切り替えました（{size / 1024 / 1024:.1f}MB → "
+          f"{os.path.getsize(db.db_path) / 1024 / 1024:.1f}MB、{time.monotonic() - start:.1f}秒）")
+
+
+def cmd_archive(db, args):
+    """古いログをアーカイブして削除し、空いた領域を解放する"""
+    start = time.monotonic()
+    # ログを削除する前に、終わった日のテレビON時間を集計しておく
+    db.refresh_daily_energy()
+    archived = db.archive_old_events(args.archive_dir, args.months)
+    freed = 0
+    while True:
+        pages = db.incremental_vacuum(args.vacuum_pages)
+        if pages == 0:
+            break
+        freed += pages
+    db.checkpoint()
+    counts = '、'.join(f"{table} {count}件" for table, count in archived.items())
+    print(f"✓ アーカイブしました（{counts}、解放 {freed}ページ、{time.monotonic() - start:.1f}秒）")
+
+
+def cmd_archive_query(db, args):
+    """アーカイブを読み出す（既定は月別・種類別の件数、--rowsで行をNDJSONで表示）"""
+    counts = {}
+    for row in read_archive(args.archive_dir, args.table, start=args.start, end=args.end):
+        if args.event_type and row['event_type'] != args.event_type:
+            continue
+        if args.rows:
+            print(json.dumps(row, ensure_ascii=False))
+            continue
+        key = (row['timestamp'][:7], row['event_type'])
+        counts[key] = counts.get(key, 0) + 1
+
+    if not args.rows:
+        for (month, event_type), count in sorted(counts.items()):
+            print(f"{month}  {event_type:<16} {count}")
+
+
+def cmd_export(db, args):
+    """テーブルをCSV / NDJSONで書き出す（少しずつ書くので、何年分でもメモリは一定）"""
+    start = datetime.fromisoformat(args.start) if args.start else None
+    end = datetime.fromisoformat(args.end) if args.end else None
+    chunks = export(db, args.table, fmt=args.format, start=start, end=end, compress=args.gzip,
+                    archive_dir=args.archive_dir if args.include_archive else None)
+
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+    if args.output:
+        print(f"✓ {args.table} を {args.output} に書き出しました（{written / 1024:.0f}KB）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Oton-Zzz データベース管理')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='データベースファイルのパス')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('migrate', help='未適用のマイグレーションを適用').set_defaults(func=cmd_migrate)
+    subparsers.add_parser('rebuild-rollup', help='logsから日別集計を作り直す').set_defaults(func=cmd_rebuild_rollup)
+    subparsers.add_parser('rebuild-energy', help='logsから日別のテレビON時間を作り直す').set_defaults(func=cmd_rebuild_energy)
+    subparsers.add_parser('enable-incremental-vacuum',
+                          help='既存のデータベースを auto_vacuum=INCREMENTAL に切り替える（VACUUMで作り直す）'
+                          ).set_defaults(func=cmd_enable_incremental_vacuum)
+
+    archive_parser = subparsers.add_parser('archive', help='古いログをアーカイブして削除し、空いた領域を解放')
+    archive_parser.add_argument('--months', type=int, default=12, help='今月を含めて残す月数')
+    archive_parser.add_argument('--archive-dir', default=DEFAULT_ARCHIVE_DIR, help='アーカイブの書き出し先')
+    archive_parser.add_argument('--vacuum-pages', type=int, default=1000, help='1回のトランザクションで解放するページ数')
+    archive_parser.set_defaults(func=cmd_archive)
+
+    query_parser = subparsers.add_parser('archive-query', help='アーカイブを読み出す')
+    query_parser.add_argument('--archive-dir', default=DEFAULT_ARCHIVE_DIR, help='アーカイブのディレクトリ')
+    query_parser.add_argument('--table', choices=ARCHIVE_TABLES, default='logs', help='テーブル')
+    query_parser.add_argument('--from', dest='start', default=None, help='この時刻以降（例: 2024-01-01）')
+    query_parser.add_argument('--to', dest='end', default=None, help='この時刻より前（例: 2024-04-01）')
+    query_parser.add_argument('--event-type', default=None, help='イベントの種類で絞り込む')
+    query_parser.add_argument('--rows', action='store_true', help='件数ではなく行をNDJSONで表示')
+    query_parser.set_defaults(func=cmd_archive_query, needs_db=False)
+
+    export_parser = subparsers.add_parser('export', help='ログ・テレメトリーをCSV / NDJSONで書き出す')
+    export_parser.add_argument('table', choices=list(EXPORT_TABLES), help='テーブル')
+    export_parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv', help='形式')
+    export_parser.add_argument('--from', dest='start', default=None, help='この時刻以降（例: 2024-01-01）')
+    export_parser.add_argument('--to', dest='end', default=None, help='この時刻より前（例: 2025-01-01）')
+    export_parser.add_argument('--gzip', action='store_true', help='gzip圧縮する')
+    export_parser.add_argument('--include-archive', action='store_true', help='アーカイブ済みの行も含める（logs・shadow_events）')
+    export_parser.add_argument('--archive-dir', default=DEFAULT_ARCHIVE_DIR, help='アーカイブのディレクトリ')
+    export_parser.add_argument('-o', '--output', default=None, help='書き出し先（省略時は標準出力）')
+    export_parser.set_defaults(func=cmd_export)
+
+    args = parser.parse_args()
+    # アーカイブの読み出しはデータベースを開かない（アーカイブだけを別のマシンに移して読む場合）
+    if not getattr(args, 'needs_db', True):
+        args.func(None, args)
+        return
+
+    if not os.path.exists(args.db):
+        print(f"✗ データベースが見つかりません: {args.db}")
+        sys.exit(1)
+
+    db = DatabaseManager(args.db)
+    try:
+        args.func(db, args)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Oton-Zzz 合成データ生成
+何年分ものログ・テレメトリーを作業用のデータベースにまとめて書き込み、db.py / dashboard.py を
+実際の規模で試せるようにします（本番のデータベースには使わないでください）。
+
+毎晩の視聴を、夕方〜深夜の時間帯に「TV_ON → (CANCELLED …) → SLEEP_DETECTED または TV_OFF」の
+区間が並ぶ形で作ります。--rows を --days で割った件数が1晩のイベント数の目安です。
+直近 --telemetry-days 日分は、テレビがついている間の1秒ごとのテレメトリーも作ります。
+書き込みは --batch-rows 行ずつ executemany し、1回のトランザクションでコミットします。
+
+使い方:
+    python tools/gen_synthetic_db.py /tmp/scale.db --rows 1000000
+    python tools/gen_synthetic_db.py /tmp/scale.db --rows 10000000 --days 3650 --telemetry-days 7
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'src'))
+
+from db import DatabaseManager, SQL_INSERT_LOG, SQL_INSERT_TELEMETRY, to_epoch_ms
+
+
+# 視聴する時間帯（その日の0時からの秒数。18:00〜翌2:00）
+EVENING_START = 18 * 3600
+EVENING_LENGTH = 8 * 3600
+
+# 1区間あたりの平均イベント数（TV_ON・CANCELLED・終わりのイベント）
+EVENTS_PER_SESSION = 3.0
+
+SLEEP_RATIO = 0.35       # 区間が自動OFF（SLEEP_DETECTED）で終わる割合
+CANCEL_RATE = 1.0        # 1区間あたりのCANCELLED（警告後に起きた）の平均回数
+
+
+def night_sessions(rng, day_start, events):
+    """
+    1晩分の区間を作る
+
+    Args:
+        rng: random.Random
+        day_start: その日の0時（datetime）
+        events: この晩のイベント数の目安
+
+    Returns:
+        list: (ON時刻, [(時刻, イベントの種類, duration)], OFF時刻) のリスト（時刻順）
+    """
+    count = max(1, int(round(events / EVENTS_PER_SESSION)))
+    slot = EVENING_LENGTH / count
+    sessions = []
+    for i in range(count):
+        on_offset = EVENING_START + i * slot + rng.uniform(0, slot * 0.2)
+        length = slot * rng.uniform(0.3, 0.75)
+        on_time = day_start + timedelta(seconds=on_offset)
+        off_time = on_time + timedelta(seconds=length)
+
+        session = [(on_time, 'TV_ON', 0)]
+        cancels = sorted(rng.uniform(0.1, 0.9) for _ in range(min(int(rng.expovariate(1 / CANCEL_RATE)), 5)))
+        for position in cancels:
+            session.append((on_time + timedelta(seconds=length * position), 'CANCELLED', round(rng.uniform(1.0, 4.5), 2)))
+        if rng.random() < SLEEP_RATIO:
+            session.append((off_time, 'SLEEP_DETECTED', round(rng.uniform(5.0, 8.0), 2)))
+        else:
+            session.append((off_time, 'TV_OFF', 0))
+        sessions.append((on_time, session, off_time))
+    return sessions
+
+
+def telemetry_rows(rng, on_time, off_time):
+    """テレビがついている間の1秒ごとのテレメトリー（ゲージ・まばたきスコアはランダムウォーク）"""
+    gauge = 0.0
+    blink = 0.2
+    second = int(on_time.timestamp())
+    end = int(off_time.timestamp())
+    while second < end:
+        blink = min(1.0, max(0.0, blink + rng.gauss(0, 0.05)))
+        gauge = min(5.0, max(0.0, gauge + (1.0 if blink >= 0.5 else -1.5)))
+        face_ratio = 1.0 if rng.random() > 0.05 else 0.0
+        yield (second, gauge, blink if face_ratio else None, face_ratio,
+               float(rng.randint(13, 15)), round(rng.gauss(28.0, 3.0), 2), round(min(1.0, blink * 0.4), 4))
+        second += 1
+
+
+def generate(db_path, rows, days=3650, telemetry_days=7, batch_rows=50000, seed=0):
+    """
+    合成データを書き込む
+
+    Args:
+        db_path: 書き込み先（作業用のデータベース）
+        rows: logsに書き込むおおよその行数
+        days: 何日分にするか（昨日までのdays日）
+        telemetry_days: 直近何日分のテレメトリーを作るか
+        batch_rows: 1回のトランザクションで書き込む行数
+        seed: 乱数の種
+
+    Returns:
+        dict: 書き込んだ行数と所要時間
+    """
+    rng = random.Random(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = DatabaseManager(db_path)
+    conn = db._connect()
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    telemetry_from = today - timedelta(days=telemetry_days)
+    per_night = rows / days
+
+    logs, telemetry = [], []
+    written_logs = written_telemetry = 0
+    start = time.monotonic()
+
+    def flush(table_rows, sql):
+        with conn:
+            conn.executemany(sql, table_rows)
+        return len(table_rows)
+
+    for day_index in range(days, 0, -1):
+        day_start = today - timedelta(days=day_index)
+        # 晩ごとのイベント数は目安の前後にばらつかせる
+        events = max(1.0, rng.gauss(per_night, per_night * 0.2))
+        for on_time, session, off_time in night_sessions(rng, day_start, events):
+            for event_time, event_type, duration in session:
+                logs.append((event_time.isoformat(), to_epoch_ms(event_time), event_type, duration, 'synthetic'))
+            if on_time >= telemetry_from:
+                telemetry.extend(telemetry_rows(rng, on_time, off_time))
+
+        if len(logs) >= batch_rows:
+            written_logs += flush(logs, SQL_INSERT_LOG)
+            logs = []
+        if len(telemetry) >= batch_rows:
+            written_telemetry += flush(telemetry, SQL_INSERT_TELEMETRY)
+            telemetry = []
+
+    if logs:
+        written_logs += flush(logs, SQL_INSERT_LOG)
+    if telemetry:
+        written_telemetry += flush(telemetry, SQL_INSERT_TELEMETRY)
+    load_seconds = time.monotonic() - start
+
+    energy_start = time.monotonic()
+    db.refresh_daily_energy()
+    energy_seconds = time.monotonic() - energy_start
+    db.close()
+
+    return {
+        'logs': written_logs,
+        'telemetry_1s': written_telemetry,
+        'load_seconds': round(load_seconds, 1),
+        'logs_per_second': int(written_logs / load_seconds) if load_seconds > 0 else None,
+        'refresh_daily_energy_seconds': round(energy_seconds, 1),
+        'size_mb': round(os.path.getsize(db_path) / 1024 / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='作業用のデータベースに合成データを書き込む')
+    parser.add_argument('db', help='書き込み先（存在しなければ作る）')
+    parser.add_argument('--rows', type=int, default=1000000, help='logsに書き込むおおよその行数')
+    parser.add_argument('--days', type=int, default=3650, help='何日分にするか')
+    parser.add_argument('--telemetry-days', type=int, default=7, help='直近何日分のテレメトリーを作るか')
+    parser.add_argument('--batch-rows', type=int, default=50000, help='1回のトランザクションで書き込む行数')
+    parser.add_argument('--seed', type=int, default=0, help='乱数の種')
+    args = parser.parse_args()
+
+    if os.path.abspath(args.db) == os.path.abspath(os.path.join(SCRIPT_DIR, '..', 'data', 'oton_zzz.db')):
+        print("✗ 本番のデータベースには書き込めません。作業用のパスを指定してください")
+        sys.exit(1)
+
+    result = generate(args.db, args.rows, days=args.days, telemetry_days=args.telemetry_days,
+                      batch_rows=args.batch_rows, seed=args.seed)
+    print(f"✓ {args.db} に書き込みました: logs {result['logs']}行、telemetry_1s {result['telemetry_1s']}行"
+          f"（{result['load_seconds']}秒、{result['logs_per_second']}行/秒、{result['size_mb']}MB）")
+
+
+if __name__ == '__main__':
+    main()